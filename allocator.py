@@ -0,0 +1,104 @@
+import random
+import threading
+from collections import deque
+
+from sqlalchemy import update
+
+from models import db, ParkingSpot
+
+
+# ---------------------------- #
+#     Free-Spot Allocator      #
+# ---------------------------- #
+class SpotAllocator:
+    """Hands out free spots per lot without scanning the spots table.
+
+    Each lot keeps a FIFO of spot ids believed to be free, loaded lazily on the
+    first claim. The pool is only a hint: a spot is taken with a conditional
+    UPDATE that succeeds only while its status is still 'A', so two workers
+    racing for the same id can never both win. Stale ids are dropped and the
+    claim moves on to the next candidate.
+    """
+
+    def __init__(self, app=None):
+        self._free = {}
+        self._lock = threading.Lock()
+        self.max_retries = 8
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SPOT_CLAIM_RETRIES', 8)
+        self.max_retries = app.config['SPOT_CLAIM_RETRIES']
+        app.extensions['allocator'] = self
+
+    def _load(self, lot_id):
+        ids = db.session.query(ParkingSpot.id).filter_by(lot_id=lot_id, status='A') \
+            .order_by(ParkingSpot.id).all()
+        pool = deque(spot_id for spot_id, in ids)
+        if pool:
+            # Start each worker at a different point of the lot so that pools in
+            # separate processes rarely contend for the same spot.
+            pool.rotate(-random.randrange(len(pool)))
+        with self._lock:
+            self._free[lot_id] = pool
+        return pool
+
+    def _pool(self, lot_id):
+        with self._lock:
+            pool = self._free.get(lot_id)
+        if pool is None:
+            pool = self._load(lot_id)
+        return pool
+
+    def peek(self, lot_id):
+        """Return the id of the spot the next claim will most likely get."""
+        pool = self._pool(lot_id)
+        with self._lock:
+            if pool:
+                return pool[0]
+        pool = self._load(lot_id)
+        with self._lock:
+            return pool[0] if pool else None
+
+    def claim(self, lot_id):
+        """Mark a free spot of ``lot_id`` as occupied in the current transaction.
+
+        Returns the claimed spot id, or ``None`` if the lot is full. The caller
+        owns the commit; on rollback it must call :meth:`forget` so the
+        lot's pool is reloaded with the spot back in it.
+        """
+        for attempt in range(2):
+            if attempt:
+                # The pool ran dry or kept losing races to claims made by another
+                # process; reload it from the table before reporting a full lot.
+                self._load(lot_id)
+            pool = self._pool(lot_id)
+            for _ in range(self.max_retries):
+                with self._lock:
+                    spot_id = pool.popleft() if pool else None
+                if spot_id is None:
+                    break
+                result = db.session.execute(
+                    update(ParkingSpot)
+                    .where(ParkingSpot.id == spot_id, ParkingSpot.status == 'A')
+                    .values(status='O')
+                )
+                if result.rowcount == 1:
+                    return spot_id
+        return None
+
+    def release(self, lot_id, spot_id):
+        """Return a spot to the pool after its release has been committed."""
+        with self._lock:
+            pool = self._free.get(lot_id)
+            if pool is not None:
+                pool.append(spot_id)
+
+    def forget(self, lot_id):
+        """Drop a lot's pool so it is reloaded on the next claim."""
+        with self._lock:
+            self._free.pop(lot_id, None)
+
+
+allocator = SpotAllocator()
@@ -0,0 +1,88 @@
+import json
+
+from flask import current_app, request
+
+from occupancy import occupancy
+from pincodes import pincodes
+
+
+# ---------------------------- #
+#     JSON Availability API    #
+# ---------------------------- #
+# Served from the occupancy and pin-code indexes only, so polling the API
+# never touches the database once both are loaded.
+def parse_ids(args):
+    """Read ``ids=1,2,3`` from a query string; raises ``ValueError`` on bad input."""
+    raw = [part.strip() for part in args.get('ids', '').split(',') if part.strip()]
+    if not raw:
+        raise ValueError("ids is required, e.g. ids=1,2,3")
+    if not all(part.isdigit() for part in raw):
+        raise ValueError("ids must be comma-separated numbers")
+    limit = current_app.config['API_BATCH_LIMIT']
+    if len(raw) > limit:
+        raise ValueError(f"at most {limit} ids per request")
+    return list(dict.fromkeys(int(part) for part in raw))
+
+
+def parse_near(args):
+    """Read ``pin_code`` and an optional ``limit`` for a near lookup."""
+    pin_code = args.get('pin_code', '').strip()
+    if not pin_code.isdigit() or len(pin_code) > 6:
+        raise ValueError("pin_code must be up to 6 digits")
+    limit = args.get('limit', '10').strip()
+    if not limit.isdigit() or not 0 < int(limit) <= current_app.config['API_BATCH_LIMIT']:
+        raise ValueError(f"limit must be between 1 and {current_app.config['API_BATCH_LIMIT']}")
+    return pin_code, int(limit)
+
+
+def lot_availability(lot):
+    available, occupied = occupancy.get(lot.id)
+    return {'id': lot.id, 'name': lot.name, 'pin_code': lot.pin_code,
+            'price_per_hour': lot.price_per_hour, 'available': available, 'occupied': occupied}
+
+
+def lots_availability(lot_ids):
+    """Availability of each known lot in ``lot_ids``, and the ids that are not lots."""
+    lots, missing = [], []
+    for lot_id in lot_ids:
+        lot = pincodes.lot(lot_id)
+        if lot is None:
+            missing.append(lot_id)
+        else:
+            lots.append(lot_availability(lot))
+    return lots, missing
+
+
+def near_availability(pin_code, limit):
+    lots = pincodes.near(pin_code, lambda lot_id: occupancy.available(lot_id) > 0, limit)
+    return [lot_availability(lot) for lot in lots]
+
+
+def plain(payload, status=200):
+    """Compact JSON that must not be cached (errors, results of writes)."""
+    response = current_app.response_class(
+        json.dumps(payload, separators=(',', ':'), ensure_ascii=False),
+        status=status, mimetype='application/json',
+    )
+    response.cache_control.no_store = True
+    return response
+
+
+def error(message, status=400):
+    return plain({'error': message}, status)
+
+
+def respond(payload):
+    """Compact JSON with an ETag of its body and a short shared-cache lifetime.
+
+    Repeat polls with ``If-None-Match`` get a bodiless 304 until the
+    numbers change.
+    """
+    response = current_app.response_class(
+        json.dumps(payload, separators=(',', ':'), ensure_ascii=False),
+        mimetype='application/json',
+    )
+    response.add_etag()
+    response.cache_control.public = True
+    response.cache_control.max_age = current_app.config['API_MAX_AGE_SECONDS']
+    return response.make_conditional(request)
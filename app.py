@@ -1,32 +1,212 @@
-from flask import Flask, render_template, request, redirect, url_for, session, flash
-from models import db, create_admin, User, ParkingLot, ParkingSpot,  Reservation
+from flask import Flask, current_app, render_template, request, redirect, url_for, session, flash, abort
+from flask.cli import with_appcontext
+from models import db, create_admin, normalize_plate, User, ParkingLot, ParkingSpot,  Reservation, ReservationRollup, \
+    UserStats, UserLotStat, UserMonthStat
+from occupancy import occupancy
+from allocator import allocator
+from charts import charts
+from provisioning import provision_spots, resize_lot
+import rollups
+import user_stats
+import migrations
+import search
+import seed
+import exports
+import archive
+import api
+from querystats import querystats
+from storage import storage
+from events import availability_feed
+from versions import versions
+from fragments import fragment_cache
+from pincodes import pincodes
+from gate import active_plates
+from tariffs import tariffs, tariffs_cli
+import timeseries
+from timeseries import utilization, utilization_cli
+import gate
+from pagination import keyset_page, render_listing
+from sqlalchemy import update
+from sqlalchemy.orm import joinedload
 from datetime import datetime
-import os
+import threading
+
+import click
 
-from collections import defaultdict
 import calendar
 
-import matplotlib.pyplot as plt
 
 
 
 
+# -------------------------- #
+#     Application Factory    #
+# -------------------------- #
+class Routes:
+    """Views declared in this module, added to each app ``create_app`` builds.
+
+    ``routes.route`` takes the same arguments as ``Flask.route`` and keeps
+    the view function names as endpoint names, so ``url_for('login')`` and
+    the templates work as before.
+    """
+
+    def __init__(self):
+        self._rules = []
+
+    def route(self, rule, **options):
+        def decorator(view):
+            self._rules.append((rule, view, options))
+            return view
+        return decorator
+
+    def register(self, app):
+        for rule, view, options in self._rules:
+            app.add_url_rule(rule, view_func=view, **options)
+
+
+routes = Routes()
+
+DEFAULT_CONFIG = {
+    'SQLALCHEMY_DATABASE_URI': 'sqlite:///parking.db',
+    'SQLALCHEMY_TRACK_MODIFICATIONS': False,
+    'SECRET_KEY': 'your-secret-key',
+    'PAGE_SIZE': 50,
+    'STREAM_LISTINGS': False,
+    'SEARCH_LIMIT': 20,
+    'SEARCH_RANK_WINDOW': 1000,
+    'EXPORT_BATCH_SIZE': 2000,
+    'ARCHIVE_AFTER_DAYS': 90,
+    'ARCHIVE_BATCH_SIZE': 1000,
+    'ARCHIVE_PAUSE_SECONDS': 0.05,
+    'API_BATCH_LIMIT': 100,
+    'API_MAX_AGE_SECONDS': 5,
+    # Most queries each hot view may run, data-version reads included; see querystats.py
+    'QUERY_BUDGETS': {
+        'user_dashboard': 4,
+        'parking_history': 3,
+        'user_summary': 4,
+    },
+    # Create the schema and admin on the first request; turn off once
+    # ``flask init-db`` is part of the deploy
+    'AUTO_BOOTSTRAP': True,
+}
+
+
+def create_app(config=None):
+    """Build the app: settings, extensions, CLI commands and routes.
+
+    Settings are ``DEFAULT_CONFIG``, then ``PARKING_``-prefixed environment
+    variables (e.g. ``PARKING_STORAGE_MODE=production``), then ``config``.
+    Nothing here touches the database; see ``bootstrap``. The extensions
+    are module-level objects, so build one app per process.
+    """
+    app = Flask(__name__)
+    app.config.update(DEFAULT_CONFIG)
+    app.config.from_prefixed_env('PARKING')
+    app.config.update(config or {})
+
+    # Ahead of querystats, so the bootstrap's queries are not charged to a view
+    app.before_request(_bootstrap_on_first_request)
+    storage.init_app(app)
+    db.init_app(app)
+    occupancy.init_app(app)
+    allocator.init_app(app)
+    charts.init_app(app)
+    querystats.init_app(app)
+    availability_feed.init_app(app)
+    versions.init_app(app)
+    fragment_cache.init_app(app)
+    pincodes.init_app(app)
+    active_plates.init_app(app)
+    tariffs.init_app(app)
+    utilization.init_app(app)
+    app.cli.add_command(init_db_command)
+    app.cli.add_command(rollups.rollups_cli)
+    app.cli.add_command(user_stats.user_stats_cli)
+    app.cli.add_command(migrations.schema_cli)
+    app.cli.add_command(seed.seed_command)
+    app.cli.add_command(archive.archive_cli)
+    app.cli.add_command(tariffs_cli)
+    app.cli.add_command(utilization_cli)
+    routes.register(app)
+    return app
+
+
+_default_app = None
+
+
+def __getattr__(name):
+    # ``from app import app`` (flask --app app, asgi.py) builds the default
+    # app on first use rather than at import
+    global _default_app
+    if name != 'app':
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    if _default_app is None:
+        _default_app = create_app()
+    return _default_app
+
+
+# -------------------------- #
+#   Create Tables + Admin    #
+# -------------------------- #
+_bootstrap_lock = threading.Lock()
+
+
+def bootstrap(app):
+    """Create or upgrade the schema and search tables, the admin account and the backfills.
+
+    Safe to run again: every step skips what already exists.
+    """
+    with app.app_context():
+        db.create_all()
+        migrations.upgrade()
+        app.config['SEARCH_FTS'] = search.ensure_schema()
+        create_admin(app)
+        versions.ensure_epoch()
+        rollups.backfill_if_empty()
+        user_stats.backfill_if_empty()
+    app.extensions['bootstrapped'] = True
+
+
+def bootstrap_once(app):
+    """Run ``bootstrap`` the first time this process needs the app, if ``AUTO_BOOTSTRAP`` is on."""
+    if app.config['AUTO_BOOTSTRAP'] and not app.extensions.get('bootstrapped'):
+        with _bootstrap_lock:
+            if not app.extensions.get('bootstrapped'):
+                bootstrap(app)
+
+
+def _bootstrap_on_first_request():
+    bootstrap_once(current_app._get_current_object())
+
+
+@click.command('init-db', help="Create or upgrade the schema and create the admin account.")
+@with_appcontext
+def init_db_command():
+    bootstrap(current_app._get_current_object())
+    click.echo("Database is ready.")
 
-app = Flask(__name__)
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///parking.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.secret_key = 'your-secret-key'
 
-db.init_app(app)
+def _user_scopes():
+    return [('users',), ('user', session['user_id'])]
 
 
+def _admin_scopes(**view_args):
+    return [('global',)]
 
-@app.route('/')
+
+@routes.route('/')
 def home():
     return render_template('index.html')
 
 
-@app.route('/register', methods=['GET', 'POST'])
+def _add_user(fields):
+    """Write job: create a user account."""
+    db.session.add(User(**fields))
+    versions.bump()
+
+
+@routes.route('/register', methods=['GET', 'POST'])
 def register():
     if request.method == 'POST':
         email = request.form['mail']
@@ -40,23 +220,21 @@ def register():
             flash("Username or Email already exists.", "danger")
             return redirect(url_for('register'))
 
-        new_user = User(
+        storage.run_write(_add_user, dict(
             username=username,
             email=email,
             password=password,
             role='user',
             vehicle_number=vehicle_number,
             pin_code=pin_code
-        )
-        db.session.add(new_user)
-        db.session.commit()
+        ))
         flash("Registration successful! Please login.", "success")
         return redirect(url_for('login'))
 
     return render_template('register.html')
 
 
-@app.route('/login', methods=['GET', 'POST'])
+@routes.route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
         login_input = request.form['user_name']  # Can be username or email
@@ -80,14 +258,14 @@ def login():
     return render_template('login.html')
 
 
-@app.route('/logout')
+@routes.route('/logout')
 def logout():
     session.clear()
     flash("Logged out successfully.", "info")
     return redirect(url_for('login'))
 
 
-@app.route('/user/dashboard')
+@routes.route('/user/dashboard')
 def user_dashboard():
     if session.get('role') != 'user':
         flash("Unauthorized access!", "warning")
@@ -96,125 +274,179 @@ def user_dashboard():
     
     user_id = session['user_id']
 
-<<<<<<< HEAD
-=======
     # ---------- Parking Lot Info ----------
->>>>>>> ae3cfd5 (Updated some files and added new project files)
+    # Fragment cache versions first: a card rendered from rows read before
+    # its version must not be cached under a newer one
+    versions.preload('lot')
     lots = ParkingLot.query.all()
-    enriched_lots = []
     for lot in lots:
-        available = ParkingSpot.query.filter_by(lot_id=lot.id, status='A').count()
-        occupied = ParkingSpot.query.filter_by(lot_id=lot.id, status='O').count()
-        lot.available_spots = available
-        lot.occupied_spots = occupied
-        enriched_lots.append(lot)
-
-<<<<<<< HEAD
-    
-    active_reservations = Reservation.query.filter_by(user_id=user_id, leaving_timestamp=None).all()
-
+        lot.available_spots, lot.occupied_spots = occupancy.get(lot.id)
 
-    
-=======
     # ---------- Current Active Reservation ----------
-    active_reservations = Reservation.query.filter_by(user_id=user_id, leaving_timestamp=None).all()
+    active_reservations = Reservation.query.filter_by(user_id=user_id, leaving_timestamp=None) \
+        .options(joinedload(Reservation.spot).joinedload(ParkingSpot.lot)).all()
 
 
     # ---------- Parking Summary Chart ----------
->>>>>>> ae3cfd5 (Updated some files and added new project files)
-    data = defaultdict(int)
-    reservations = Reservation.query.filter_by(user_id=user_id).all()
-    for res in reservations:
-        if res.spot and res.spot.lot:
-            lot_name = res.spot.lot.prime_location_name
-            data[lot_name] += 1
-
-    summary_path = None
-    if data:
-        lots_list = list(data.keys())
-        counts = list(data.values())
-        plt.figure(figsize=(6, 4))
-        plt.bar(lots_list, counts, color='lightblue')
-        plt.title("Your Parking Summary")
-        plt.xlabel("Parking Lot")
-        plt.ylabel("Number of Parkings")
-        plt.tight_layout()
-
-        summary_path = f'user_summary_{user_id}.png'
-        chart_path = os.path.join('static', summary_path)
-        plt.savefig(chart_path)
-        plt.close()
-
-    # return render_template(
-    #     'user/user_dashboard.html',
-    #     lots=enriched_lots,
-    #     summary_path=summary_path,
-    #     active_reservation=active_reservation
-    # )
-    return render_template("user/user_dashboard.html", lots=lots, active_reservations=active_reservations)
-
-
-
-
-@app.route('/user/book/<int:lot_id>', methods=['GET', 'POST'])
+    summary_path, summary_version = charts.user_summary(user_id)
+
+    return render_template(
+        'user/user_dashboard.html',
+        lots=lots,
+        summary_path=summary_path,
+        summary_version=summary_version,
+        active_reservations=active_reservations
+    )
+
+
+@routes.route('/user/availability/stream')
+def availability_stream():
+    if session.get('role') != 'user':
+        abort(403)
+    # EventSource resends the last id it saw when it reconnects
+    return availability_feed.stream(request.headers.get('Last-Event-ID'))
+
+
+
+
+def _book_spot(lot_id, user_id, vehicle_number=None, parked_at=None):
+    """Write job: claim a free spot in ``lot_id`` for the user.
+
+    Returns ``(reservation_id, spot_id)``, or ``None`` if the lot is full.
+    Raises ``gate.AlreadyParked`` if the plate has an open reservation.
+    """
+    spot_id = allocator.claim(lot_id)
+    if spot_id is None:
+        return None
+    if vehicle_number:
+        # Checked after the claim, whose UPDATE holds the database's write
+        # lock: no other booking of this plate can commit in between
+        parked = gate.open_reservations([vehicle_number]).get(vehicle_number)
+        if parked is not None:
+            db.session.execute(update(ParkingSpot).where(ParkingSpot.id == spot_id).values(status='A'))
+            allocator.forget(lot_id)
+            raise gate.AlreadyParked(parked)
+    parked_at = parked_at or datetime.utcnow()
+    reservation = Reservation(spot_id=spot_id, user_id=user_id, parking_timestamp=parked_at,
+                              vehicle_number=vehicle_number)
+    db.session.add(reservation)
+    db.session.flush()
+    rollups.record_booking(lot_id, parked_at)
+    user_stats.record_booking(user_id, lot_id, parked_at)
+    versions.bump(('lot', lot_id), ('user', user_id))
+    return reservation.id, spot_id
+
+
+def _booked(lot_id, spot_id, user_id, reservation_id, vehicle_number):
+    """Bring the in-memory indexes up to date after a booking commits."""
+    occupancy.book(lot_id, spot_id=spot_id)
+    active_plates.add(vehicle_number, reservation_id)
+    fragment_cache.invalidate(lot_id)
+
+
+@routes.route('/user/book/<int:lot_id>', methods=['GET', 'POST'])
 def book_spot(lot_id):
     if session.get('role') != 'user':
         flash("Unauthorized access!", "warning")
         return redirect(url_for('login'))
 
     lot = ParkingLot.query.get_or_404(lot_id)
-    spot = ParkingSpot.query.filter_by(lot_id=lot.id, status='A').first()
-
-    if not spot:
-        flash("No available spots in this lot.", "danger")
-        return redirect(url_for('user_dashboard'))
-
     user = User.query.get(session['user_id'])
 
     if request.method == 'POST':
-        vehicle_number = request.form['vehicle_number']
-        reservation = Reservation(
-            spot_id=spot.id,
-            user_id=user.id,
-            parking_timestamp=datetime.utcnow(),
-        )
-        spot.status = 'O'
-        db.session.add(reservation)
-        db.session.commit()
+        vehicle_number = normalize_plate(request.form['vehicle_number'])
+        # A plate this process saw parked is confirmed before it is turned away
+        if vehicle_number and active_plates.get(vehicle_number) is not None \
+                and active_plates.lookup([vehicle_number]):
+            flash(f"Vehicle {vehicle_number} is already parked.", "danger")
+            return redirect(url_for('user_dashboard'))
+        try:
+            booked = storage.run_write(_book_spot, lot_id, user.id, vehicle_number)
+        except gate.AlreadyParked:
+            flash(f"Vehicle {vehicle_number} is already parked.", "danger")
+            return redirect(url_for('user_dashboard'))
+        except Exception:
+            # The claim was rolled back; reload the lot's free-spot pool
+            allocator.forget(lot_id)
+            raise
+        if booked is None:
+            flash("No available spots in this lot.", "danger")
+            return redirect(url_for('user_dashboard'))
+
+        reservation_id, spot_id = booked
+        _booked(lot_id, spot_id, user.id, reservation_id, vehicle_number)
+        spot = ParkingSpot.query.get(spot_id)
         flash(f"Spot {spot.spot_label} booked successfully!", "success")
         return redirect(url_for('user_dashboard'))
 
+    spot_id = allocator.peek(lot_id)
+    if spot_id is None:
+        flash("No available spots in this lot.", "danger")
+        return redirect(url_for('user_dashboard'))
+    spot = ParkingSpot.query.get(spot_id)
+
     return render_template('user/book_spot.html', lot=lot, spot=spot, username=user.username)
 
 
 
-@app.route('/user/release/<int:reservation_id>', methods=['GET', 'POST'])
+def _release_spot(reservation_id, left_at=None):
+    """Write job: close the reservation and free its spot.
+
+    Returns ``(lot_id, spot_id, user_id, vehicle_number, cost)``, or ``None``
+    if the reservation is already closed.
+    """
+    reservation = db.session.get(Reservation, reservation_id)
+    if reservation is None or reservation.leaving_timestamp:
+        return None
+    reservation.leaving_timestamp = max(left_at or datetime.utcnow(), reservation.parking_timestamp)
+    duration = reservation.leaving_timestamp - reservation.parking_timestamp
+
+    spot = db.session.get(ParkingSpot, reservation.spot_id)
+    # Peak/off-peak bands, daily cap and grace period of the lot; see tariffs.py
+    reservation.parking_cost = tariffs.quote(spot.lot_id, reservation.parking_timestamp,
+                                             reservation.leaving_timestamp)
+
+    # Free the spot
+    spot.status = 'A'
+    rollups.record_release(spot.lot_id, reservation.parking_timestamp, reservation.parking_cost)
+    user_stats.record_release(reservation.user_id, duration, reservation.parking_cost)
+    versions.bump(('lot', spot.lot_id), ('user', reservation.user_id))
+    return spot.lot_id, spot.id, reservation.user_id, reservation.vehicle_number, reservation.parking_cost
+
+
+def _released(reservation_id, lot_id, spot_id, user_id, vehicle_number):
+    """Bring the in-memory indexes up to date after a release commits."""
+    occupancy.release(lot_id, spot_id=spot_id)
+    allocator.release(lot_id, spot_id)
+    active_plates.discard(vehicle_number, reservation_id)
+    fragment_cache.invalidate(lot_id)
+
+
+@routes.route('/user/release/<int:reservation_id>', methods=['GET', 'POST'])
 def release_spot(reservation_id):
     if session.get('role') != 'user':
         flash("Unauthorized access!", "warning")
         return redirect(url_for('login'))
 
-    reservation = Reservation.query.get_or_404(reservation_id)
+    # Long-closed stays may have moved to the archive; those are shown read-only
+    reservation = archive.get_reservation(reservation_id)
+    if reservation is None:
+        abort(404)
 
     duration_display = None
     leaving_timestamp = None
     parking_cost = None
 
+    released = None
     if request.method == 'POST' and not reservation.leaving_timestamp:
-        # Set leaving time and compute cost
-        reservation.leaving_timestamp = datetime.utcnow()
-        duration = reservation.leaving_timestamp - reservation.parking_timestamp
-        total_hours = duration.total_seconds() / 3600
+        released = storage.run_write(_release_spot, reservation_id)
 
-        spot = ParkingSpot.query.get(reservation.spot_id)
-        price = spot.lot.price_per_hour
-        reservation.parking_cost = round(total_hours * price, 2)
-
-        # Free the spot
-        spot.status = 'A'
-        db.session.commit()
+    if released:
+        lot_id, spot_id, user_id, vehicle_number, _ = released
+        _released(reservation_id, lot_id, spot_id, user_id, vehicle_number)
 
         # Calculate display values
+        duration = reservation.leaving_timestamp - reservation.parking_timestamp
         leaving_timestamp = reservation.leaving_timestamp.strftime('%Y-%m-%d %H:%M')
         duration_minutes = int(duration.total_seconds() // 60)
         hours = duration_minutes // 60
@@ -245,39 +477,40 @@ def release_spot(reservation_id):
 
 
 
-@app.route('/user/summary')
+@routes.route('/user/summary')
+@versions.conditional('user', _user_scopes)
 def user_summary():
     if session.get('role') != 'user':
         flash("Unauthorized access!", "warning")
         return redirect(url_for('login'))
 
     user_id = session['user_id']
-    reservations = Reservation.query.filter_by(user_id=user_id).all()
+    stats = UserStats.query.get(user_id) or UserStats(bookings=0, total_minutes=0, total_cost=0)
 
     # Total stats
-    total_bookings = len(reservations)
-    total_cost = sum(r.parking_cost or 0 for r in reservations)
-    total_time_minutes = sum(
-        int((r.leaving_timestamp - r.parking_timestamp).total_seconds() // 60)
-        for r in reservations if r.leaving_timestamp
-    )
-    hours = total_time_minutes // 60
-    minutes = total_time_minutes % 60
+    total_bookings = stats.bookings
+    total_cost = stats.total_cost
+    hours = stats.total_minutes // 60
+    minutes = stats.total_minutes % 60
     total_time = f"{hours} hr {minutes} min"
 
     # Bookings per location
-    location_data = defaultdict(int)
-    for r in reservations:
-        if r.spot and r.spot.lot:
-            location_data[r.spot.lot.prime_location_name] += 1
+    from sqlalchemy import func
+    location_data = dict(
+        db.session.query(ParkingLot.prime_location_name, func.sum(UserLotStat.bookings))
+        .join(UserLotStat, UserLotStat.lot_id == ParkingLot.id)
+        .filter(UserLotStat.user_id == user_id)
+        .group_by(ParkingLot.prime_location_name)
+        .all()
+    )
 
     visited_places = list(location_data.keys())   # ← ADD THIS LINE
 
     # Monthly bookings
-    monthly_data = defaultdict(int)
-    for r in reservations:
-        month = r.parking_timestamp.strftime('%b')
-        monthly_data[month] += 1
+    monthly_data = {}
+    for month_stat in UserMonthStat.query.filter_by(user_id=user_id) \
+            .order_by(UserMonthStat.year, UserMonthStat.month):
+        monthly_data[f"{calendar.month_abbr[month_stat.month]} {month_stat.year}"] = month_stat.bookings
 
     pie_labels = list(location_data.keys())
     pie_values = list(location_data.values())
@@ -297,18 +530,19 @@ def user_summary():
 
 
 
-@app.route('/user/history')
+@routes.route('/user/history')
+@versions.conditional('user', _user_scopes)
 def parking_history():
     if session.get('role') != 'user':
         flash("Unauthorized access!", "warning")
         return redirect(url_for('login'))
 
     user_id = session['user_id']
-    reservations = Reservation.query.filter_by(user_id=user_id).order_by(Reservation.parking_timestamp.desc()).all()
-    return render_template('user/parking_history.html', reservations=reservations)
+    reservations = archive.history_page(user_id, cursor=request.args.get('after'))
+    return render_listing('user/parking_history.html', reservations=reservations)
 
 
-@app.route('/user/edit_profile', methods=['GET', 'POST'])
+@routes.route('/user/edit_profile', methods=['GET', 'POST'])
 def edit_profile():
     if session.get('role') != 'user':
         flash("Unauthorized access!", "warning")
@@ -321,6 +555,7 @@ def edit_profile():
         user.email = request.form['email']
         user.phone = request.form['phone']
         user.vehicle_number = request.form['vehicle_number']
+        versions.bump(('user', user.id))
         db.session.commit()
         flash("Profile updated successfully!", "success")
         return redirect(url_for('user_dashboard'))
@@ -329,7 +564,8 @@ def edit_profile():
 
 
 
-@app.route('/admin/dashboard')
+@routes.route('/admin/dashboard')
+@versions.conditional('admin', _admin_scopes)
 def admin_dashboard():
     if session.get('role') != 'admin':
         flash("Unauthorized access!", "warning")
@@ -338,16 +574,18 @@ def admin_dashboard():
     return render_template('admin/admin_dashboard.html', lots=lots)
 
 
-@app.route('/admin/lots')
+@routes.route('/admin/lots')
+@versions.conditional('admin', _admin_scopes)
 def manage_lots():
     if session.get('role') != 'admin':
         flash("Unauthorized access!", "warning")
         return redirect(url_for('login'))
+    versions.preload('lot')  # before the rows, see user_dashboard
     lots = ParkingLot.query.all()
     return render_template('admin/manage_lots.html', lots=lots)
 
 
-@app.route('/admin/lots/add', methods=['GET', 'POST'])
+@routes.route('/admin/lots/add', methods=['GET', 'POST'])
 def add_lot():
     if session.get('role') != 'admin':
         flash("Unauthorized access!", "warning")
@@ -362,12 +600,16 @@ def add_lot():
         lot = ParkingLot(prime_location_name=name, address=address, pin_code=pin_code,
                          price_per_hour=price, max_spots=max_spots)
         db.session.add(lot)
-        db.session.commit()
+        db.session.flush()
+        lot_id = lot.id
 
-        for i in range(1, max_spots + 1):
-            spot = ParkingSpot(lot_id=lot.id, status='A', spot_label=f"Spot-{i}")
-            db.session.add(spot)
+        provision_spots(lot_id, 1, max_spots)
+        versions.bump(('lot', lot_id))
         db.session.commit()
+        occupancy.set_lot(lot_id, max_spots)
+        allocator.forget(lot_id)
+        pincodes.invalidate()
+        tariffs.invalidate()
 
         flash("Parking lot added successfully.", "success")
         return redirect(url_for('manage_lots'))
@@ -375,7 +617,7 @@ def add_lot():
     return render_template('admin/add_lot.html')
 
 
-# @app.route('/admin/lots/edit/<int:lot_id>', methods=['GET', 'POST'])
+# @routes.route('/admin/lots/edit/<int:lot_id>', methods=['GET', 'POST'])
 # def edit_lot(lot_id):
 #     if session.get('role') != 'admin':
 #         flash("Unauthorized access!", "warning")
@@ -394,7 +636,7 @@ def add_lot():
 #     return render_template('admin/edit_lot.html', lot=lot)
 
 
-@app.route('/admin/lots/edit/<int:lot_id>', methods=['GET', 'POST'])
+@routes.route('/admin/lots/edit/<int:lot_id>', methods=['GET', 'POST'])
 def edit_lot(lot_id):
     if session.get('role') != 'admin':
         flash("Unauthorized access!", "warning")
@@ -408,33 +650,26 @@ def edit_lot(lot_id):
         lot.pin_code = request.form['pin_code']
         lot.price_per_hour = float(request.form['price_per_hour'])
 
-        new_max_spots = int(request.form['max_spots'])
-        current_spots = ParkingSpot.query.filter_by(lot_id=lot.id).all()
-        current_count = len(current_spots)
-
-        # Update max_spots field
-        lot.max_spots = new_max_spots
-
-        # Case 1: Add spots
-        if new_max_spots > current_count:
-            for i in range(current_count + 1, new_max_spots + 1):
-                new_spot = ParkingSpot(
-                    lot_id=lot.id,
-                    status='A',
-                    spot_label=f"Spot {i}"
-                )
-                db.session.add(new_spot)
-
-        # Case 2: Remove extra spots (only if they are not occupied)
-        elif new_max_spots < current_count:
-            spots_to_remove = current_spots[new_max_spots:]
-            for spot in spots_to_remove:
-                if spot.status == 'A':
-                    db.session.delete(spot)
-                else:
-                    flash(f"Cannot delete spot {spot.spot_label} as it is currently occupied.", "danger")
+        new_max_spots = max(int(request.form['max_spots']), 0)
+        added, removed, blocked = resize_lot(lot_id, new_max_spots)
+
+        # Occupied spots that stand in the way of a shrink are kept
+        lot.max_spots = new_max_spots + len(blocked)
+        if blocked:
+            flash(f"Cannot delete occupied spots: {', '.join(blocked)}.", "danger")
+        if removed:
+            # Removed spots take their reservations with them
+            rollups.rebuild(lot_id)
+            user_stats.rebuild_lot_users(lot_id)
 
+        # Users' history and summaries show the lot's name and, after a shrink, lose stays
+        versions.bump(('lot', lot_id), ('users',))
         db.session.commit()
+        occupancy.adjust(lot_id, available=added - removed)
+        allocator.forget(lot_id)
+        fragment_cache.invalidate(lot_id)
+        pincodes.invalidate()
+        tariffs.invalidate()
         flash("Parking lot updated successfully.", "success")
         return redirect(url_for('manage_lots'))
 
@@ -444,7 +679,7 @@ def edit_lot(lot_id):
 
 
 
-@app.route('/admin/lots/delete/<int:lot_id>')
+@routes.route('/admin/lots/delete/<int:lot_id>')
 def delete_lot(lot_id):
     if session.get('role') != 'admin':
         flash("Unauthorized access!", "warning")
@@ -454,92 +689,139 @@ def delete_lot(lot_id):
     if occupied:
         flash("Cannot delete lot with occupied spots.", "danger")
     else:
+        archive.drop_lot(lot_id)
+        tariffs.drop_lot(lot_id)
         db.session.delete(lot)
+        db.session.flush()
+        rollups.drop_lot(lot_id)
+        user_stats.rebuild_lot_users(lot_id)
+        versions.bump(('lot', lot_id), ('users',))
         db.session.commit()
+        occupancy.remove_lot(lot_id)
+        allocator.forget(lot_id)
+        fragment_cache.invalidate(lot_id)
+        pincodes.invalidate()
+        tariffs.invalidate()
         flash("Parking lot deleted successfully.", "success")
     return redirect(url_for('manage_lots'))
 
 
-@app.route('/admin/spots/<int:lot_id>')
+@routes.route('/admin/spots/<int:lot_id>')
+@versions.conditional('admin', lambda lot_id: [('lot', lot_id)])
 def view_spots(lot_id):
     if session.get('role') != 'admin':
         flash("Unauthorized access!", "warning")
         return redirect(url_for('login'))
+    versions.preload('lot')  # before the rows, see user_dashboard
     lot = ParkingLot.query.get_or_404(lot_id)
-    spots = ParkingSpot.query.filter_by(lot_id=lot_id).all()
-    return render_template('admin/view_spots.html', lot=lot, spots=spots)
+    spots = keyset_page(
+        ParkingSpot.query.filter_by(lot_id=lot_id),
+        [ParkingSpot.id],
+        cursor=request.args.get('after')
+    )
+    available, occupied = occupancy.get(lot_id)
+    return render_listing('admin/view_spots.html', lot=lot, spots=spots,
+                          occupied=occupied, total_spots=available + occupied)
 
 
-@app.route('/admin/users')
+@routes.route('/admin/users')
 def view_users():
     if session.get('role') != 'admin':
         flash("Unauthorized access!", "warning")
         return redirect(url_for('login'))
-    users = User.query.filter_by(role='user').all()
-    return render_template('admin/view_users.html', users=users)
-
-
+    users = keyset_page(
+        User.query.filter_by(role='user'),
+        [User.id],
+        cursor=request.args.get('after')
+    )
+    return render_listing('admin/view_users.html', users=users)
+
+
+
+def _summary_queries():
+    """The admin summary's statements, all answered from the rollups.
+
+    Run by admin_summary here and by the async read path in asgi.py; feed
+    the rows of each to :func:`_summary_context`.
+    """
+    from sqlalchemy import func, select
+
+    return {
+        'total_users': select(func.count(User.id)),
+        'totals': select(
+            func.coalesce(func.sum(ReservationRollup.bookings), 0),
+            func.coalesce(func.sum(ReservationRollup.revenue), 0.0)
+        ),
+        'total_lots': select(func.count(ParkingLot.id)),
+        # Monthly Revenue (Bar Chart)
+        'revenue': select(
+            ReservationRollup.year,
+            ReservationRollup.month,
+            func.sum(ReservationRollup.revenue)
+        ).group_by(ReservationRollup.year, ReservationRollup.month)
+         .order_by(ReservationRollup.year, ReservationRollup.month),
+        # Lot-wise Bookings (Pie Chart)
+        'lots': select(
+            ParkingLot.prime_location_name,
+            func.sum(ReservationRollup.bookings)
+        ).join(ReservationRollup, ParkingLot.id == ReservationRollup.lot_id)
+         .group_by(ParkingLot.prime_location_name)
+         .having(func.sum(ReservationRollup.bookings) > 0),
+        # Peak Parking Hours (Bar Chart)
+        'peak_hours': select(
+            ReservationRollup.hour,
+            func.sum(ReservationRollup.bookings)
+        ).group_by(ReservationRollup.hour)
+         .having(func.sum(ReservationRollup.bookings) > 0)
+         .order_by(ReservationRollup.hour),
+    }
+
+
+def _summary_context(rows):
+    """Template context of the admin summary from ``{name: rows}`` of :func:`_summary_queries`."""
+    total_reservations, total_revenue = rows['totals'][0]
 
-@app.route('/admin/summary')
-def admin_summary():
-    from sqlalchemy import extract, func
-
-    total_users = User.query.count()
-    total_reservations = Reservation.query.count()
-    total_revenue = db.session.query(func.sum(Reservation.parking_cost)).scalar() or 0
-    active_reservations = Reservation.query.filter(Reservation.leaving_timestamp.is_(None)).count()
-   
-    total_lots = ParkingLot.query.count()
-
-    # Monthly Revenue (Bar Chart)
-    revenue_data = db.session.query(
-        extract('month', Reservation.parking_timestamp).label('month'),
-        func.sum(Reservation.parking_cost)
-    ).group_by('month').all()
-
-    month_names = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun',
-                   'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
     months = []
     revenues = []
-    for month, revenue in revenue_data:
-        months.append(month_names[int(month) - 1])
-        revenues.append(float(revenue or 0))
-
-    # Lot-wise Bookings (Pie Chart)
-    lot_data = db.session.query(
-        ParkingLot.prime_location_name,
-        func.count(Reservation.id)
-    ).join(ParkingSpot, ParkingLot.id == ParkingSpot.lot_id)\
-     .join(Reservation, ParkingSpot.id == Reservation.spot_id)\
-     .group_by(ParkingLot.prime_location_name).all()
-    lot_labels = [name for name, _ in lot_data]
-    lot_counts = [count for _, count in lot_data]
-
-    # Peak Parking Hours (Bar Chart)
-    peak_hours_data = db.session.query(
-        extract('hour', Reservation.parking_timestamp).label('hour'),
-        func.count(Reservation.id)
-    ).group_by('hour').order_by('hour').all()
-    peak_hours = [f"{int(hour):02d}:00" for hour, _ in peak_hours_data]
-    peak_counts = [count for _, count in peak_hours_data]
-
-    return render_template("admin/summary.html",
-                           total_users=total_users,
-                           total_reservations=total_reservations,
-                           total_revenue=total_revenue,
-                           active_reservations=active_reservations,
-                           total_lots=total_lots,
-                           months=months,
-                           revenues=revenues,
-                           lot_labels=lot_labels,
-                           lot_counts=lot_counts,
-                           peak_hours=peak_hours,
-                           peak_counts=peak_counts)
-
-
-
-
-# @app.route('/admin/search')
+    for year, month, revenue in rows['revenue']:
+        months.append(f"{calendar.month_abbr[month]} {year}")
+        revenues.append(round(float(revenue or 0), 2))
+
+    return dict(total_users=rows['total_users'][0][0],
+                total_reservations=total_reservations,
+                total_revenue=round(total_revenue, 2),
+                active_reservations=occupancy.totals()[1],
+                total_lots=rows['total_lots'][0][0],
+                months=months,
+                revenues=revenues,
+                lot_labels=[name for name, _ in rows['lots']],
+                lot_counts=[count for _, count in rows['lots']],
+                peak_hours=[f"{int(hour):02d}:00" for hour, _ in rows['peak_hours']],
+                peak_counts=[count for _, count in rows['peak_hours']])
+
+
+@routes.route('/admin/summary')
+@versions.conditional('admin', _admin_scopes)
+def admin_summary():
+    rows = {name: db.session.execute(statement).all() for name, statement in _summary_queries().items()}
+    return render_template("admin/summary.html", **_summary_context(rows))
+
+
+@routes.route('/admin/utilization.json')
+def admin_utilization():
+    """Lot utilization over a range, for the summary chart (see ``timeseries.parse_query``)."""
+    if session.get('role') != 'admin':
+        return api.error("admin sign-in required", 403)
+    try:
+        lot_ids, start, end, resolution = timeseries.parse_query(request.args)
+        return api.plain(timeseries.chart_feed(lot_ids, start, end, resolution))
+    except ValueError as exc:
+        return api.error(str(exc))
+
+
+
+
+# @routes.route('/admin/search')
 # def admin_search():
 #     if session.get('role') != 'admin':
 #         flash("Unauthorized access!", "danger")
@@ -557,7 +839,7 @@ def admin_summary():
 
 #     return render_template('admin/search_results.html', query=query, lots=lots, users=users)
 
-@app.route('/admin/search')
+@routes.route('/admin/search')
 def admin_search():
     if session.get('role') != 'admin':
         flash("Unauthorized access!", "danger")
@@ -565,26 +847,139 @@ def admin_search():
 
     query = request.args.get('q', '').strip()
 
-    print("Search Query:", query)  # 🔍 DEBUG: Check what's captured
-
     lots = []
     users = []
 
     if query:
-        lots = ParkingLot.query.filter(
-            ParkingLot.prime_location_name.ilike(f"%{query}%")
-        ).all()
-
-        users = User.query.filter(
-            (User.username.ilike(f"%{query}%")) |
-            (User.email.ilike(f"%{query}%"))
-        ).all()
+        lots = search.search_lots(query)
+        users = search.search_users(query)
 
     return render_template('admin/search_results.html', query=query, lots=lots, users=users)
 
 
 
-@app.route('/admin/edit_profile', methods=['GET', 'POST'])
+@routes.route('/admin/export/<kind>.<fmt>')
+def admin_export(kind, fmt):
+    if session.get('role') != 'admin':
+        flash("Unauthorized access!", "danger")
+        return redirect(url_for('login'))
+
+    queries = {
+        'reservations': (exports.reservations_query, exports.RESERVATION_COLUMNS),
+        'revenue': (exports.revenue_query, exports.REVENUE_COLUMNS),
+    }
+    if kind not in queries or fmt not in exports.FORMATS:
+        abort(404)
+    try:
+        filters = exports.parse_filters(request.args)
+    except ValueError as exc:
+        abort(400, description=str(exc))
+
+    build_query, columns = queries[kind]
+    return exports.stream(build_query(**filters), columns, fmt, exports.filename(kind, fmt, **filters))
+
+
+
+# -------------------------- #
+#   JSON Availability API    #
+# -------------------------- #
+@routes.route('/api/lots/<int:lot_id>/availability')
+def api_lot_availability(lot_id):
+    lot = pincodes.lot(lot_id)
+    if lot is None:
+        return api.error("no such lot", 404)
+    return api.respond(api.lot_availability(lot))
+
+
+@routes.route('/api/availability')
+def api_availability():
+    try:
+        lot_ids = api.parse_ids(request.args)
+    except ValueError as exc:
+        return api.error(str(exc))
+    lots, missing = api.lots_availability(lot_ids)
+    return api.respond({'lots': lots, 'missing': missing})
+
+
+@routes.route('/api/availability/near')
+def api_availability_near():
+    try:
+        pin_code, limit = api.parse_near(request.args)
+    except ValueError as exc:
+        return api.error(str(exc))
+    return api.respond({'pin_code': pin_code, 'lots': api.near_availability(pin_code, limit)})
+
+
+def _gate_batch(events):
+    """Write job: apply a batch of gate plate reads, in order, in one transaction.
+
+    Parked plates and the users behind entering plates are looked up once
+    for the whole batch. Returns a result per event and the index updates
+    (``_booked``/``_released`` calls) to make once the batch has committed.
+    """
+    parked = active_plates.lookup({plate for _, plate, _, _ in events})
+    users = gate.resolve_users({plate for kind, plate, _, _ in events if kind == 'entry'})
+    results, effects = [], []
+    for kind, plate, lot_id, at in events:
+        if kind == 'entry':
+            if plate in parked:
+                result = {'status': 'already_parked', 'reservation_id': parked[plate]}
+            elif plate not in users:
+                result = {'status': 'unknown_vehicle'}
+            elif pincodes.lot(lot_id) is None:
+                result = {'status': 'unknown_lot'}
+            else:
+                try:
+                    booked = _book_spot(lot_id, users[plate], plate, at)
+                except gate.AlreadyParked as exc:
+                    # Parked through another worker since the lookup
+                    parked[plate] = exc.reservation_id
+                    booked = False
+                if booked is False:
+                    result = {'status': 'already_parked', 'reservation_id': parked[plate]}
+                elif booked is None:
+                    result = {'status': 'lot_full'}
+                else:
+                    reservation_id, spot_id = booked
+                    parked[plate] = reservation_id
+                    effects.append((_booked, (lot_id, spot_id, users[plate], reservation_id, plate)))
+                    result = {'status': 'parked', 'reservation_id': reservation_id, 'spot_id': spot_id}
+        else:
+            reservation_id = parked.pop(plate, None)
+            released = _release_spot(reservation_id, at) if reservation_id else None
+            if released is None:
+                result = {'status': 'not_parked'}
+            else:
+                lot_id, spot_id, user_id, _, cost = released
+                effects.append((_released, (reservation_id, lot_id, spot_id, user_id, plate)))
+                result = {'status': 'left', 'reservation_id': reservation_id, 'cost': cost}
+        results.append({'plate': plate, 'type': kind, **result})
+    return results, effects
+
+
+@routes.route('/api/gate/events', methods=['POST'])
+def api_gate_events():
+    if not gate.authorized(request.headers.get('X-Gate-Key')):
+        return api.error("missing or invalid X-Gate-Key", 403)
+    try:
+        events = gate.parse_events(request.get_json(silent=True))
+    except ValueError as exc:
+        return api.error(str(exc))
+
+    try:
+        results, effects = storage.run_write(_gate_batch, events)
+    except Exception:
+        # Claims made by the batch were rolled back; reload those lots' free-spot pools
+        for lot_id in {lot_id for kind, _, lot_id, _ in events if kind == 'entry'}:
+            allocator.forget(lot_id)
+        raise
+    for hook, args in effects:
+        hook(*args)
+    return api.plain({'results': results})
+
+
+
+@routes.route('/admin/edit_profile', methods=['GET', 'POST'])
 def admin_edit_profile():
     if session.get('role') != 'admin':
         flash("Unauthorized access!", "danger")
@@ -597,6 +992,7 @@ def admin_edit_profile():
         admin.username = request.form['username']
         admin.email = request.form['email']
         admin.vehicle_number = request.form.get('vehicle_number', None)
+        versions.bump()
         db.session.commit()
         flash("Profile updated successfully!", "success")
         return redirect(url_for('admin_dashboard'))
@@ -607,15 +1003,10 @@ def admin_edit_profile():
 
 
 
-# -------------------------- #
-#   Create Tables + Admin    #
-# -------------------------- #
-with app.app_context():
-    db.create_all()
-    create_admin(app)
-
 # -------------------------- #
 #         Run App            #
 # -------------------------- #
 if __name__ == '__main__':
+    app = create_app()
+    bootstrap(app)
     app.run(debug=True)
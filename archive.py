@@ -0,0 +1,155 @@
+import time
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import delete, func, insert, select, union_all
+from sqlalchemy.orm import joinedload
+
+from models import db, ArchivedReservation, ParkingSpot, Reservation
+from pagination import Page, encode_cursor, keyset_page
+from storage import storage
+
+
+# ---------------------------- #
+#   Hot/Cold Reservation Split #
+# ---------------------------- #
+# Reservations closed more than ARCHIVE_AFTER_DAYS ago are moved, in small
+# batches, from `reservations` into `reservations_archive`. The hot table then
+# only holds open and recently closed stays, so the queries behind bookings
+# and dashboards stay proportional to recent activity. Anything that needs
+# the full history reads both tables through the helpers below.
+ARCHIVED_COLUMNS = ['id', 'spot_id', 'lot_id', 'user_id', 'parking_timestamp', 'leaving_timestamp', 'parking_cost',
+                    'vehicle_number']
+
+
+def all_reservations():
+    """Subquery over hot and archived reservations, with each row's lot_id."""
+    hot = select(
+        Reservation.id, Reservation.spot_id, ParkingSpot.lot_id, Reservation.user_id,
+        Reservation.parking_timestamp, Reservation.leaving_timestamp, Reservation.parking_cost,
+        Reservation.vehicle_number,
+    ).join(ParkingSpot, ParkingSpot.id == Reservation.spot_id)
+    cold = select(*(getattr(ArchivedReservation, name) for name in ARCHIVED_COLUMNS))
+    return union_all(hot, cold).subquery('all_reservations')
+
+
+def history_page(user_id, cursor=None, per_page=None):
+    """One page of a user's reservations across both stores, newest first.
+
+    Each store is keyset-paginated on its own ``(parking_timestamp, id)``
+    index and the two pages are merged, so a page costs two index range
+    scans however much history has been archived.
+    """
+    per_page = per_page or current_app.config['PAGE_SIZE']
+    pages = [
+        keyset_page(
+            model.query.filter_by(user_id=user_id)
+            .options(joinedload(model.spot).joinedload(ParkingSpot.lot)),
+            [model.parking_timestamp, model.id],
+            cursor=cursor, per_page=per_page, descending=True,
+        )
+        for model in (Reservation, ArchivedReservation)
+    ]
+    merged = sorted(pages[0].items + pages[1].items,
+                    key=lambda r: (r.parking_timestamp, r.id), reverse=True)
+    items = merged[:per_page]
+    more = len(merged) > per_page or any(page.has_next for page in pages)
+    next_cursor = encode_cursor([items[-1].parking_timestamp, items[-1].id]) if more and items else None
+    return Page(items, next_cursor)
+
+
+def get_reservation(reservation_id):
+    """A reservation by id from whichever store holds it, or ``None``."""
+    return db.session.get(Reservation, reservation_id) or db.session.get(ArchivedReservation, reservation_id)
+
+
+def drop_lot(lot_id):
+    db.session.execute(delete(ArchivedReservation).where(ArchivedReservation.lot_id == lot_id))
+
+
+# ---------------------------- #
+#         Archive Job          #
+# ---------------------------- #
+def archive_batch(cutoff, batch_size):
+    """Move up to ``batch_size`` reservations closed before ``cutoff``; returns how many.
+
+    Runs inside the caller's transaction (a write job).
+    """
+    ids = [reservation_id for reservation_id, in db.session.execute(
+        select(Reservation.id)
+        .where(Reservation.leaving_timestamp < cutoff)
+        .order_by(Reservation.id)
+        .limit(batch_size)
+    )]
+    if not ids:
+        return 0
+    db.session.execute(insert(ArchivedReservation).from_select(
+        ARCHIVED_COLUMNS,
+        select(
+            Reservation.id, Reservation.spot_id, ParkingSpot.lot_id, Reservation.user_id,
+            Reservation.parking_timestamp, Reservation.leaving_timestamp, Reservation.parking_cost,
+            Reservation.vehicle_number,
+        ).join(ParkingSpot, ParkingSpot.id == Reservation.spot_id).where(Reservation.id.in_(ids))
+    ))
+    db.session.execute(
+        delete(Reservation).where(Reservation.id.in_(ids)),
+        execution_options={'synchronize_session': False}
+    )
+    return len(ids)
+
+
+def run(days=None, batch_size=None, pause=None, max_batches=None):
+    """Archive everything closed more than ``days`` ago, one short transaction per batch.
+
+    Each batch is a write job, so with the write queue it interleaves with
+    bookings instead of holding the write lock for the whole run. Returns
+    the number of reservations moved.
+    """
+    config = current_app.config
+    days = config['ARCHIVE_AFTER_DAYS'] if days is None else days
+    batch_size = batch_size or config['ARCHIVE_BATCH_SIZE']
+    pause = config['ARCHIVE_PAUSE_SECONDS'] if pause is None else pause
+    cutoff = datetime.utcnow() - timedelta(days=days)
+
+    moved = batches = 0
+    while max_batches is None or batches < max_batches:
+        count = storage.run_write(archive_batch, cutoff, batch_size)
+        moved += count
+        batches += 1
+        if count < batch_size:
+            break
+        if pause:
+            time.sleep(pause)
+    return moved
+
+
+def counts():
+    hot = db.session.query(func.count(Reservation.id)).scalar()
+    open_ = db.session.query(func.count(Reservation.id)).filter(Reservation.leaving_timestamp.is_(None)).scalar()
+    cold = db.session.query(func.count(ArchivedReservation.id)).scalar()
+    return hot, open_, cold
+
+
+# ---------------------------- #
+#         CLI Commands         #
+# ---------------------------- #
+archive_cli = AppGroup('archive', help="Move old closed reservations to the archive table.")
+
+
+@archive_cli.command('run')
+@click.option('--days', type=int, default=None, help="Archive stays closed more than this many days ago.")
+@click.option('--batch-size', type=int, default=None, help="Reservations moved per transaction.")
+@click.option('--pause', type=float, default=None, help="Seconds to wait between batches.")
+@click.option('--max-batches', type=int, default=None, help="Stop after this many batches.")
+def run_command(days, batch_size, pause, max_batches):
+    started = time.perf_counter()
+    moved = run(days, batch_size, pause, max_batches)
+    click.echo(f"Archived {moved:,} reservation(s) in {time.perf_counter() - started:.1f}s.")
+
+
+@archive_cli.command('status')
+def status_command():
+    hot, open_, cold = counts()
+    click.echo(f"hot: {hot:,} reservation(s), {open_:,} open; archived: {cold:,}")
@@ -0,0 +1,244 @@
+"""ASGI entry point: async read paths in front of the Flask app.
+
+    uvicorn asgi:application --workers 1
+
+The user dashboard, the admin spot grid and summary, and the JSON
+availability API are served on the event loop, with their queries on an
+aiosqlite engine, so a request waiting on SQLite no longer holds a thread.
+Every other route, and any request the async views decline (wrong role,
+pending flash messages, non-GET methods), goes to the unchanged Flask app
+through a WSGI adapter and its thread pool; writes and the write queue work
+exactly as under ``python app.py``.
+
+Calls into the in-memory indexes (occupancy, pin codes, chart cache) run
+on the thread pool too: each reloads from the database with the sync
+engine when its refresh interval is up, which must not stall the loop.
+So do the data-version reads behind ETags and fragment cache keys.
+
+Needs ``starlette``, ``uvicorn``, ``aiosqlite``, ``a2wsgi`` and ``greenlet``,
+all in requirements.txt.
+"""
+import io
+from contextlib import asynccontextmanager
+
+from a2wsgi import WSGIMiddleware
+from a2wsgi.wsgi import build_environ
+from flask import abort, render_template, request, session
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import joinedload
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import Response
+from starlette.routing import Mount, Route
+from werkzeug.exceptions import HTTPException
+
+from app import app as flask_app, bootstrap_once, _admin_scopes, _summary_context, _summary_queries
+from models import db, ParkingLot, ParkingSpot, Reservation, UserStats
+from occupancy import occupancy
+from charts import charts
+from pincodes import pincodes
+from storage import storage
+from versions import versions
+from pagination import keyset_query, keyset_result
+
+
+flask_app.config.setdefault('ASGI_DB_POOL_SIZE', 10)
+flask_app.config.setdefault('ASGI_WSGI_THREADS', 32)
+
+# Set up in lifespan(), once the Flask engine's URL is known
+Session = None
+
+
+def _read_only(dbapi_connection, connection_record):
+    # The async engine only reads: make that a guarantee, and share the
+    # production-mode tuning (journal_mode is a property of the file, set
+    # by the Flask engine's connections)
+    cursor = dbapi_connection.cursor()
+    for pragma in storage.pragmas:
+        if 'journal_mode' not in pragma:
+            cursor.execute(pragma)
+    cursor.execute('PRAGMA query_only=ON')
+    cursor.close()
+
+
+def _warm():
+    # The async views skip Flask's before_request hooks, so bootstrap here;
+    # and the in-memory indexes load on first use with the sync engine: do
+    # it here, off the event loop, rather than inside the first request
+    bootstrap_once(flask_app)
+    with flask_app.app_context():
+        occupancy.totals()
+        pincodes.lot(0)
+
+
+@asynccontextmanager
+async def lifespan(application):
+    global Session
+    with flask_app.app_context():
+        url = db.engine.url.set(drivername='sqlite+aiosqlite')
+    engine = create_async_engine(url, pool_size=flask_app.config['ASGI_DB_POOL_SIZE'], max_overflow=0)
+    event.listen(engine.sync_engine, 'connect', _read_only)
+    Session = async_sessionmaker(engine, expire_on_commit=False)
+    await run_in_threadpool(_warm)
+    yield
+    await engine.dispose()
+
+
+# ---------------------------- #
+#       Async Read Views       #
+# ---------------------------- #
+class FastPath:
+    """Serve GETs of one Flask route from an async view; hand everything else to Flask.
+
+    The view runs inside a Flask request context built from the ASGI scope,
+    so ``session``, ``request``, ``url_for`` and templates behave as they do
+    in the Flask route. It returns ``None`` to let the Flask route answer.
+    """
+
+    def __init__(self, view, fallback):
+        self.view = view
+        self.fallback = fallback
+
+    async def __call__(self, scope, receive, send):
+        if scope['method'] in ('GET', 'HEAD'):
+            with flask_app.request_context(build_environ(scope, io.BytesIO())):
+                try:
+                    response = await self.view(**scope['path_params'])
+                except HTTPException as exc:
+                    response = _response(exc.get_response())
+            if response is not None:
+                await response(scope, receive, send)
+                return
+        await self.fallback(scope, receive, send)
+
+
+def _signed_in(role):
+    # Pages with flash messages to show (or to consume) are left to Flask,
+    # which writes the emptied session back
+    return session.get('role') == role and '_flashes' not in session
+
+
+def _response(flask_response):
+    return Response(flask_response.get_data(), status_code=flask_response.status_code,
+                    headers=dict(flask_response.headers))
+
+
+def _page(html, tag=None):
+    headers = {'Vary': 'Cookie'}
+    if tag is not None:
+        headers['ETag'] = f'W/"{tag}"'
+        headers['Cache-Control'] = 'private, no-cache'
+    return Response(html, media_type='text/html', headers=headers)
+
+
+def _not_modified(tag):
+    return Response(status_code=304, headers={'ETag': f'W/"{tag}"', 'Cache-Control': 'private, no-cache'})
+
+
+def _etag(scopes):
+    """``(tag, matched)`` for a conditional page, as versions.conditional computes them.
+
+    Reads the versions with the sync engine: run it on the thread pool.
+    """
+    if not flask_app.config['CONDITIONAL_GET']:
+        return None, False
+    tag = versions.etag(scopes)
+    return tag, request.if_none_match.contains_weak(tag)
+
+
+async def user_dashboard():
+    if not _signed_in('user'):
+        return None
+    user_id = session['user_id']
+    await run_in_threadpool(versions.preload, 'lot')  # before the rows, see app.user_dashboard
+    async with Session() as s:
+        lots = (await s.scalars(select(ParkingLot))).all()
+        active_reservations = (await s.scalars(
+            select(Reservation).filter_by(user_id=user_id, leaving_timestamp=None)
+            .options(joinedload(Reservation.spot).joinedload(ParkingSpot.lot))
+        )).unique().all()
+        bookings = await s.scalar(select(UserStats.bookings).filter_by(user_id=user_id))
+
+    def indexes():
+        for lot in lots:
+            lot.available_spots, lot.occupied_spots = occupancy.get(lot.id)
+        return charts.user_summary(user_id, (bookings or 0,))
+    summary_path, summary_version = await run_in_threadpool(indexes)
+    return _page(render_template(
+        'user/user_dashboard.html',
+        lots=lots,
+        summary_path=summary_path,
+        summary_version=summary_version,
+        active_reservations=active_reservations
+    ))
+
+
+async def view_spots(lot_id):
+    # Streamed listings (?stream=1) stay on the Flask route
+    if not _signed_in('admin') or request.args.get('stream', type=int) or flask_app.config['STREAM_LISTINGS']:
+        return None
+    def versions_first():
+        versions.preload('lot')  # before the rows, see app.user_dashboard
+        return _etag([('lot', lot_id)])
+    tag, matched = await run_in_threadpool(versions_first)
+    if matched:
+        return _not_modified(tag)
+
+    columns = [ParkingSpot.id]
+    async with Session() as s:
+        lot = await s.get(ParkingLot, lot_id)
+        if lot is None:
+            abort(404)
+        rows = (await s.scalars(keyset_query(
+            select(ParkingSpot).filter_by(lot_id=lot_id), columns, cursor=request.args.get('after')
+        ))).all()
+
+    available, occupied = await run_in_threadpool(occupancy.get, lot_id)
+    return _page(render_template('admin/view_spots.html', lot=lot, spots=keyset_result(rows, columns),
+                                 occupied=occupied, total_spots=available + occupied), tag)
+
+
+async def admin_summary():
+    if not _signed_in('admin'):
+        return None
+    tag, matched = await run_in_threadpool(_etag, _admin_scopes())
+    if matched:
+        return _not_modified(tag)
+
+    async with Session() as s:
+        rows = {name: (await s.execute(statement)).all() for name, statement in _summary_queries().items()}
+    return _page(render_template('admin/summary.html', **_summary_context(rows)), tag)
+
+
+def in_memory(endpoint):
+    """Async view running a Flask view that only reads in-memory indexes.
+
+    The availability API reads the occupancy and pin-code indexes, which
+    reload from the database now and then, so it runs on the thread pool
+    (context and all) but skips the WSGI adapter and Flask's dispatch.
+    """
+    view = flask_app.view_functions[endpoint]
+
+    async def run(**view_args):
+        return _response(await run_in_threadpool(lambda: flask_app.make_response(view(**view_args))))
+    return run
+
+
+# ---------------------------- #
+#         Application          #
+# ---------------------------- #
+wsgi = WSGIMiddleware(flask_app, workers=flask_app.config['ASGI_WSGI_THREADS'])
+
+application = Starlette(
+    routes=[
+        Route('/user/dashboard', FastPath(user_dashboard, wsgi)),
+        Route('/admin/spots/{lot_id:int}', FastPath(view_spots, wsgi)),
+        Route('/admin/summary', FastPath(admin_summary, wsgi)),
+        Route('/api/lots/{lot_id:int}/availability', FastPath(in_memory('api_lot_availability'), wsgi)),
+        Route('/api/availability', FastPath(in_memory('api_availability'), wsgi)),
+        Route('/api/availability/near', FastPath(in_memory('api_availability_near'), wsgi)),
+        Mount('/', app=wsgi),
+    ],
+    lifespan=lifespan,
+)
@@ -0,0 +1,33 @@
+"""Set-up shared by the benchmarks that drive the whole app.
+
+``throwaway_app`` builds the app from this checkout with ``create_app``
+against a fresh SQLite file in a temporary directory, and points the files
+the app writes at run time (summary charts, utilization rings) there too,
+so a benchmark run leaves the checkout untouched.
+"""
+import logging
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def throwaway_app(name, **config):
+    """A bootstrapped app on an empty database; ``config`` overrides settings.
+
+    ``name`` prefixes the temporary directory, e.g. ``'gate-bench'``.
+    """
+    from app import bootstrap, create_app
+    workdir = tempfile.mkdtemp(prefix=f'{name}-')
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(workdir, 'parking.db')}",
+        'UTILIZATION_PATH': os.path.join(workdir, 'utilization.npz'),
+        **config,
+    })
+    app.static_folder = os.path.join(workdir, 'static')
+    os.makedirs(app.static_folder)
+    bootstrap(app)
+    app.logger.setLevel(logging.ERROR)
+    return app
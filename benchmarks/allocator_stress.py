@@ -0,0 +1,140 @@
+"""Concurrent booking stress test for the spot allocator.
+
+Creates a throwaway SQLite database, provisions one lot per requested size and
+fires concurrent claims at it from a thread pool. Every claim commits a
+reservation, exactly like ``book_spot``. Claims are spread over several
+allocator instances with independent pools, standing in for separate worker
+processes, so the conditional-update conflict path is exercised too.
+Afterwards the database is checked for double bookings and per-claim latency
+is reported for each lot size.
+
+    python benchmarks/allocator_stress.py --sizes 100 1000 10000 --bookings 500 --threads 16 --workers 4
+
+Exits non-zero if any spot ends up with more than one open reservation.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from sqlalchemy import func
+
+from models import db, User, ParkingLot, ParkingSpot, Reservation
+from allocator import SpotAllocator
+from provisioning import provision_spots
+
+
+def make_app(path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{path}'
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'connect_args': {'timeout': 60}}
+    db.init_app(app)
+    return app
+
+
+def provision(size):
+    lot = ParkingLot(prime_location_name=f'Stress {size}', address='-', pin_code='000000',
+                     price_per_hour=10, max_spots=size)
+    db.session.add(lot)
+    db.session.flush()
+    provision_spots(lot.id, 1, size)
+    db.session.commit()
+    return lot.id
+
+
+def run_size(app, allocators, size, bookings, threads, user_id):
+    with app.app_context():
+        lot_id = provision(size)
+        for allocator in allocators:
+            allocator.peek(lot_id)  # warm the pools so the load is not timed
+
+    latencies = []
+    lock = threading.Lock()
+
+    def book(i):
+        allocator = allocators[i % len(allocators)]
+        with app.app_context():
+            start = time.perf_counter()
+            spot_id = allocator.claim(lot_id)
+            if spot_id is not None:
+                db.session.add(Reservation(spot_id=spot_id, user_id=user_id,
+                                           parking_timestamp=datetime.utcnow()))
+                try:
+                    db.session.commit()
+                except Exception:
+                    db.session.rollback()
+                    allocator.forget(lot_id)
+                    raise
+            elapsed = time.perf_counter() - start
+            db.session.remove()
+        with lock:
+            latencies.append(elapsed)
+        return spot_id
+
+    count = min(bookings, size)
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        claimed = [spot_id for spot_id in pool.map(book, range(count)) if spot_id is not None]
+
+    with app.app_context():
+        doubles = db.session.query(Reservation.spot_id).join(ParkingSpot) \
+            .filter(ParkingSpot.lot_id == lot_id, Reservation.leaving_timestamp.is_(None)) \
+            .group_by(Reservation.spot_id).having(func.count(Reservation.id) > 1).count()
+        occupied = ParkingSpot.query.filter_by(lot_id=lot_id, status='O').count()
+
+    latencies.sort()
+    return {
+        'size': size,
+        'claims': count,
+        'claimed': len(claimed),
+        'unique': len(set(claimed)),
+        'occupied': occupied,
+        'double_bookings': doubles,
+        'mean_ms': statistics.mean(latencies) * 1000,
+        'p95_ms': latencies[int(len(latencies) * 0.95) - 1] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000])
+    parser.add_argument('--bookings', type=int, default=500)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--workers', type=int, default=4,
+                        help="independent allocator pools competing for the same spots")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='allocator-stress-')
+    app = make_app(os.path.join(workdir, 'stress.db'))
+    allocators = [SpotAllocator(app) for _ in range(args.workers)]
+    with app.app_context():
+        db.create_all()
+        user = User(username='stress', email='stress@example.com', password='x')
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+
+    print(f"{'spots':>7} {'claims':>7} {'claimed':>8} {'unique':>7} {'doubles':>8} {'mean ms':>9} {'p95 ms':>8}")
+    failed = False
+    for size in args.sizes:
+        r = run_size(app, allocators, size, args.bookings, args.threads, user_id)
+        print(f"{r['size']:>7} {r['claims']:>7} {r['claimed']:>8} {r['unique']:>7} {r['double_bookings']:>8} "
+              f"{r['mean_ms']:>9.2f} {r['p95_ms']:>8.2f}")
+        if r['double_bookings'] or r['unique'] != r['claimed'] or r['occupied'] != r['claimed']:
+            failed = True
+
+    if failed:
+        print("FAIL: double bookings detected")
+        sys.exit(1)
+    print("OK: no double bookings")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""JSON availability API vs. scraping the user dashboard.
+
+Seeds a throwaway database with ``--lots`` lots and measures, through
+the Flask test client, requests per second and the queries each request
+runs for: the HTML dashboard (what kiosks used to scrape), one lot, a batch
+of ``--batch`` lots, a near-pin-code lookup, and a repeat poll answered
+with 304.
+
+    python benchmarks/api_bench.py --lots 2000
+"""
+import argparse
+import random
+import time
+
+from _harness import throwaway_app
+
+
+def measure(client, paths, seconds, headers=None):
+    done = queries = 0
+    deadline = time.perf_counter() + seconds
+    started = time.perf_counter()
+    while time.perf_counter() < deadline:
+        response = client.get(paths[done % len(paths)], headers=headers or {})
+        assert response.status_code in (200, 304), response.status_code
+        queries += int(response.headers.get('X-Query-Count', 0))
+        done += 1
+    return done / (time.perf_counter() - started), queries / done
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--lots', type=int, default=2000)
+    parser.add_argument('--batch', type=int, default=50)
+    parser.add_argument('--seconds', type=float, default=3)
+    args = parser.parse_args()
+
+    app = throwaway_app('api-bench')
+    import seed
+    from models import db, ParkingLot, User
+
+    with app.app_context():
+        seed.generate(users=100, lots=args.lots, spots_per_lot=50, reservations=args.lots * 10,
+                      seed=1, echo=lambda line: None)
+        username = User.query.filter_by(role='user').first().username
+        lot_ids, pin_codes = zip(*db.session.query(ParkingLot.id, ParkingLot.pin_code))
+
+    rng = random.Random(1)
+    viewer = app.test_client()
+    viewer.post('/login', data={'user_name': username, 'pwd': 'password'})
+    viewer.get('/user/dashboard')
+    client = app.test_client()
+    one = [f'/api/lots/{lot_id}/availability' for lot_id in rng.sample(lot_ids, 200)]
+    batch = ['/api/availability?ids=' + ','.join(map(str, rng.sample(lot_ids, args.batch))) for _ in range(50)]
+    near = [f'/api/availability/near?pin_code={pin_code}&limit=10' for pin_code in rng.sample(pin_codes, 200)]
+    etag = client.get(one[0]).headers['ETag']
+
+    print(f"{'request':<24} {'req/s':>10} {'queries':>8}")
+    for label, c, paths, headers in (
+        ('dashboard (scrape)', viewer, ['/user/dashboard'], None),
+        ('one lot', client, one, None),
+        (f'batch of {args.batch}', client, batch, None),
+        ('near pin code', client, near, None),
+        ('repeat poll (304)', client, one[:1], {'If-None-Match': etag}),
+    ):
+        rate, queries = measure(c, paths, args.seconds, headers)
+        print(f"{label:<24} {rate:>10,.0f} {queries:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
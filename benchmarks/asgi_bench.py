@@ -0,0 +1,177 @@
+"""Concurrent read throughput: the threaded WSGI server vs. the ASGI entry point.
+
+Seeds one throwaway database, copies it into two throwaway copies of the
+app, and starts ``flask run --with-threads`` on one and ``uvicorn
+asgi:application`` on the other. Then, for each ``--concurrency`` level,
+that many clients (each logged in on its own session) hit the read paths
+the ASGI mode serves asynchronously (user dashboard, admin spot grid, admin
+summary, availability API) for ``--seconds`` and the script reports
+requests/s and p50/p95 latency per server.
+
+    python benchmarks/asgi_bench.py --concurrency 8,32,128
+"""
+import argparse
+import http.cookiejar
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def throwaway_copy(database=None):
+    workdir = os.path.join(tempfile.mkdtemp(prefix='asgi-bench-'), 'app')
+    shutil.copytree(ROOT, workdir, ignore=shutil.ignore_patterns(
+        '.git', 'instance', '__pycache__', 'benchmarks', 'user_summary_*.png'))
+    if database:
+        shutil.copy(database, os.path.join(workdir, 'parking.db'))
+    return workdir, f"sqlite:///{os.path.join(workdir, 'parking.db')}"
+
+
+def seed_database(args):
+    workdir, database_uri = throwaway_copy()
+    env = dict(os.environ, PARKING_SQLALCHEMY_DATABASE_URI=database_uri)
+    subprocess.run([sys.executable, '-m', 'flask', '--app', 'app', 'init-db'],
+                   cwd=workdir, env=env, check=True, stdout=subprocess.DEVNULL)
+    subprocess.run(
+        [sys.executable, '-m', 'flask', '--app', 'app', 'seed', '--users', str(args.users), '--lots', str(args.lots),
+         '--reservations', str(args.reservations), '--seed', '1'],
+        cwd=workdir, env=env, check=True, stdout=subprocess.DEVNULL,
+    )
+    return os.path.join(workdir, 'parking.db')
+
+
+def start(command, database, storage_mode):
+    workdir, database_uri = throwaway_copy(database)
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    env = dict(os.environ, PARKING_SQLALCHEMY_DATABASE_URI=database_uri, PARKING_STORAGE_MODE=storage_mode)
+    server = subprocess.Popen(command + ['--port', str(port)], cwd=workdir, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f'http://127.0.0.1:{port}'
+    for _ in range(300):
+        try:
+            urllib.request.urlopen(url + '/login', timeout=1).close()
+            return server, url
+        except OSError:
+            time.sleep(0.1)
+    server.kill()
+    sys.exit(f"{command[2]} did not start")
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+def session(url, username, password):
+    opener = urllib.request.build_opener(
+        urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _NoRedirect())
+    body = urllib.parse.urlencode({'user_name': username, 'pwd': password}).encode()
+    try:
+        opener.open(url + '/login', data=body, timeout=30).close()
+    except urllib.error.HTTPError:
+        pass  # the 302 after logging in
+    # Show (and so clear) the login flash, as a browser would
+    opener.open(url + ('/admin/dashboard' if username == 'admin' else '/user/dashboard'), timeout=30).close()
+    return opener
+
+
+def measure(url, usernames, lot_ids, concurrency, seconds, warmup):
+    rng = random.Random(1)
+    clients = []
+    for n in range(concurrency):
+        if n % 4 == 3:
+            paths = [f'/admin/spots/{rng.choice(lot_ids)}', '/admin/summary']
+            clients.append((session(url, 'admin', 'admin'), paths))
+        else:
+            paths = ['/user/dashboard', f'/api/availability?ids={",".join(map(str, rng.sample(lot_ids, 20)))}']
+            clients.append((session(url, rng.choice(usernames), 'password'), paths))
+
+    # Let the summary charts the first dashboard visits queued finish rendering
+    time.sleep(warmup)
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def work(opener, paths):
+        # Like a browser cache: revalidate with the last ETag of each page
+        mine, failed, n, etags = [], 0, 0, {}
+        while time.perf_counter() < deadline:
+            path = paths[n % len(paths)]
+            began = time.perf_counter()
+            try:
+                request = urllib.request.Request(url + path)
+                if path in etags:
+                    request.add_header('If-None-Match', etags[path])
+                with opener.open(request, timeout=60) as response:
+                    response.read()
+                    if response.headers.get('ETag'):
+                        etags[path] = response.headers['ETag']
+            except urllib.error.HTTPError as exc:
+                failed += exc.code != 304
+            except OSError:
+                failed += 1
+            mine.append(time.perf_counter() - began)
+            n += 1
+        with lock:
+            latencies.extend(mine)
+            errors[0] += failed
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=work, args=client) for client in clients]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    pick = lambda pct: latencies[min(len(latencies) - 1, int(len(latencies) * pct))] * 1000
+    return len(latencies) / elapsed, pick(0.50), pick(0.95), errors[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--lots', type=int, default=200)
+    parser.add_argument('--reservations', type=int, default=200000)
+    parser.add_argument('--concurrency', default='8,32,128')
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--warmup', type=float, default=5)
+    parser.add_argument('--storage-mode', choices=['simple', 'production'], default='production')
+    args = parser.parse_args()
+
+    database = seed_database(args)
+    import sqlite3
+    with sqlite3.connect(database) as conn:
+        usernames = [name for name, in conn.execute("SELECT username FROM users WHERE role = 'user' LIMIT 500")]
+        lot_ids = [lot_id for lot_id, in conn.execute("SELECT id FROM parking_lots")]
+
+    servers = {
+        'wsgi (flask run)': [sys.executable, '-m', 'flask', '--app', 'app', 'run', '--with-threads'],
+        'asgi (uvicorn)': [sys.executable, '-m', 'uvicorn', 'asgi:application', '--log-level', 'warning'],
+    }
+    print(f"{'server':<18} {'clients':>8} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'errors':>7}")
+    for label, command in servers.items():
+        server, url = start(command, database, args.storage_mode)
+        try:
+            for concurrency in map(int, args.concurrency.split(',')):
+                rate, p50, p95, errors = measure(url, usernames, lot_ids, concurrency, args.seconds, args.warmup)
+                print(f"{label:<18} {concurrency:>8} {rate:>8,.0f} {p50:>8.1f} {p95:>8.1f} {errors:>7}")
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""Streaming export vs. a naive ``.all()`` export of reservations.
+
+Seeds a throwaway database with ``seed.generate`` and exports every
+reservation as CSV twice: once through ``exports`` (streaming cursor,
+batches encoded and yielded as they arrive) and once the naive way (load all
+ORM rows with ``.all()``, build the whole file in memory). Reports rows/s and
+the peak Python memory of each, measured with tracemalloc in a second pass.
+
+    python benchmarks/export_bench.py --reservations 1000000
+"""
+import argparse
+import csv
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from sqlalchemy.orm import joinedload
+
+from models import db, ParkingSpot, Reservation
+import exports
+import seed
+
+
+def streaming_export(fmt):
+    size = rows = 0
+    query = exports.reservations_query()
+    for chunk in exports.iter_chunks(query, exports.RESERVATION_COLUMNS, fmt, batch_size=2000):
+        size += len(chunk)
+        rows += chunk.count('\n')
+    return rows - (fmt == 'csv'), size
+
+
+def naive_export(fmt):
+    reservations = Reservation.query.options(
+        joinedload(Reservation.spot).joinedload(ParkingSpot.lot),
+        joinedload(Reservation.user),
+    ).order_by(Reservation.parking_timestamp, Reservation.id).all()
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(exports.RESERVATION_COLUMNS)
+    for r in reservations:
+        writer.writerow([r.id, r.spot.lot.id, r.spot.lot.prime_location_name, r.spot.id, r.spot.spot_label,
+                         r.user.id, r.user.username, r.user.vehicle_number, r.parking_timestamp,
+                         r.leaving_timestamp, r.parking_cost])
+    body = buffer.getvalue()
+    db.session.remove()
+    return len(reservations), len(body)
+
+
+def measure(fn, fmt):
+    started = time.perf_counter()
+    rows, size = fn(fmt)
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    fn(fmt)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return rows, size, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=20000)
+    parser.add_argument('--lots', type=int, default=50)
+    parser.add_argument('--reservations', type=int, default=1000000)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(prefix='export-bench-'), 'bench.db')
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{path}'
+    app.config['EXPORT_BATCH_SIZE'] = 2000
+    db.init_app(app)
+
+    with app.app_context():
+        db.create_all()
+        seed.generate(users=args.users, lots=args.lots, reservations=args.reservations, seed=1,
+                      echo=lambda line: None)
+        print(f"{'export':<12} {'rows':>10} {'MB out':>8} {'seconds':>8} {'rows/s':>10} {'peak MB':>8}")
+        for label, fn in (('streaming', streaming_export), ('naive .all', naive_export)):
+            rows, size, elapsed, peak = measure(fn, 'csv')
+            print(f"{label:<12} {rows:>10,} {size / 2**20:>8.1f} {elapsed:>8.2f} "
+                  f"{rows / elapsed:>10,.0f} {peak / 2**20:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""Template fragment cache: dashboard render time with and without it.
+
+Seeds a throwaway database with ``--lots`` lots, logs a user and the
+admin in, and times ``user_dashboard``, ``manage_lots`` and ``view_spots``
+with the fragment cache off and on (warm). Between the cached rounds a few
+bookings land, as they would in production, so the hit ratio shows how
+much of each page is still re-rendered.
+
+    python benchmarks/fragment_bench.py --lots 500
+"""
+import argparse
+import statistics
+import time
+
+from _harness import throwaway_app
+
+
+def timed(client, path, rounds):
+    samples = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        response = client.get(path)
+        samples.append(time.perf_counter() - started)
+        assert response.status_code == 200, (path, response.status_code)
+    return statistics.median(samples) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--lots', type=int, default=500)
+    parser.add_argument('--spots-per-lot', type=int, default=200)
+    parser.add_argument('--rounds', type=int, default=30)
+    args = parser.parse_args()
+
+    app = throwaway_app('fragment-bench', CONDITIONAL_GET=False)  # time the render, not the 304 path
+    import seed
+    from fragments import fragment_cache
+    from models import User
+
+    with app.app_context():
+        seed.generate(users=100, lots=args.lots, spots_per_lot=args.spots_per_lot,
+                      reservations=args.lots * 20, seed=1, echo=lambda line: None)
+        viewer, booker = (u.username for u in User.query.filter_by(role='user').limit(2))
+
+    # Bookings come from a second user, so the viewer's summary chart is not
+    # re-rendered in the background while pages are being timed
+    user, admin, other = app.test_client(), app.test_client(), app.test_client()
+    user.post('/login', data={'user_name': viewer, 'pwd': 'password'})
+    other.post('/login', data={'user_name': booker, 'pwd': 'password'})
+    admin.post('/login', data={'user_name': 'admin', 'pwd': 'admin'})
+    for client, path in ((user, '/user/dashboard'), (admin, '/admin/lots')):
+        client.get(path)  # consume the login flash
+
+    pages = [(user, '/user/dashboard'), (admin, '/admin/lots'), (admin, '/admin/spots/1')]
+    print(f"{'page':<18} {'uncached ms':>12} {'cached ms':>10} {'hit ratio':>10}")
+    for client, path in pages:
+        fragment_cache.enabled = False
+        uncached = timed(client, path, args.rounds)
+
+        fragment_cache.enabled = True
+        client.get(path)
+        hits, misses = fragment_cache.hits, fragment_cache.misses
+        cached = []
+        for lot_id in range(1, args.rounds + 1):
+            other.post(f'/user/book/{lot_id}', data={'vehicle_number': 'BENCH'})
+            cached.append(timed(client, path, 1))
+        hits, misses = fragment_cache.hits - hits, fragment_cache.misses - misses
+        print(f"{path:<18} {uncached:>12.2f} {statistics.median(cached):>10.2f} "
+              f"{hits / max(hits + misses, 1):>10.1%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""Gate API throughput: plate reads per second by batch size.
+
+Seeds a throwaway database, then drives ``/api/gate/events`` with
+batches of entries followed by batches of exits for seeded users' plates,
+and reports plates/s, per-batch latency and queries per batch for each
+``--batch-sizes`` value. ``--storage-mode production`` runs the batches
+through the write queue as a deployment would.
+
+    python benchmarks/gate_bench.py --batch-sizes 1,50,200,500
+"""
+import argparse
+import random
+import statistics
+import time
+
+from _harness import throwaway_app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=20000)
+    parser.add_argument('--lots', type=int, default=20)
+    parser.add_argument('--spots-per-lot', type=int, default=500)
+    parser.add_argument('--batch-sizes', default='1,50,200,500')
+    parser.add_argument('--plates', type=int, default=2000, help="Plates per batch size (half enter, half leave).")
+    parser.add_argument('--storage-mode', choices=['simple', 'production'])
+    args = parser.parse_args()
+
+    storage = {'STORAGE_MODE': args.storage_mode} if args.storage_mode else {}
+    app = throwaway_app('gate-bench', GATE_API_KEY='bench', **storage)
+    app.config['GATE_BATCH_LIMIT'] = max(int(size) for size in args.batch_sizes.split(','))
+    import seed
+    from models import db, User
+
+    with app.app_context():
+        seed.generate(users=args.users, lots=args.lots, spots_per_lot=args.spots_per_lot,
+                      reservations=args.users, seed=1, echo=lambda line: None)
+        plates = [plate for plate, in db.session.query(User.vehicle_number).filter(User.role == 'user')]
+
+    rng = random.Random(1)
+    client = app.test_client()
+    headers = {'X-Gate-Key': 'bench'}
+    print(f"{'batch':>6} {'plates/s':>10} {'ms/batch p50':>13} {'queries/batch':>14}")
+    for size in map(int, args.batch_sizes.split(',')):
+        cars = rng.sample(plates, args.plates // 2)
+        batches = [[{'type': 'entry', 'plate': plate, 'lot_id': rng.randrange(1, args.lots + 1)}
+                    for plate in cars[i:i + size]] for i in range(0, len(cars), size)]
+        batches += [[{'type': 'exit', 'plate': plate} for plate in cars[i:i + size]]
+                    for i in range(0, len(cars), size)]
+        latencies, queries = [], 0
+        started = time.perf_counter()
+        for events in batches:
+            began = time.perf_counter()
+            response = client.post('/api/gate/events', json={'events': events}, headers=headers)
+            latencies.append(time.perf_counter() - began)
+            assert response.status_code == 200, response.get_data(as_text=True)
+            queries += int(response.headers.get('X-Query-Count', 0))
+        elapsed = time.perf_counter() - started
+        total = sum(len(events) for events in batches)
+        print(f"{size:>6} {total / elapsed:>10,.0f} {statistics.median(latencies) * 1000:>13.1f} "
+              f"{queries / len(batches):>14.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+"""Before/after benchmark for the schema index set.
+
+Seeds a throwaway database (a million reservations by default), then runs the
+queries behind each hot route twice: once with the secondary indexes dropped,
+and once after ``migrations.upgrade()`` has put them back. For every query it
+prints the EXPLAIN QUERY PLAN and the median latency of both runs.
+
+    python benchmarks/index_bench.py --reservations 1000000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from sqlalchemy import text
+
+from models import db
+import migrations
+
+
+# Representative statements for each route, with the parameters they bind
+QUERIES = [
+    ('user_dashboard: active reservations',
+     "SELECT id, spot_id FROM reservations WHERE user_id = :user_id AND leaving_timestamp IS NULL"),
+    ('user_dashboard: chart version',
+     "SELECT count(id), max(id) FROM reservations WHERE user_id = :user_id"),
+    ('parking_history: first page',
+     "SELECT id, spot_id, parking_timestamp FROM reservations WHERE user_id = :user_id "
+     "ORDER BY parking_timestamp DESC, id DESC LIMIT 51"),
+    ('occupancy index: per-lot counts',
+     "SELECT lot_id, status, count(id) FROM parking_spots GROUP BY lot_id, status"),
+    ('book_spot: free-spot pool',
+     "SELECT id FROM parking_spots WHERE lot_id = :lot_id AND status = 'A' ORDER BY id"),
+    ('view_spots: first page',
+     "SELECT id, status, spot_label FROM parking_spots WHERE lot_id = :lot_id ORDER BY id LIMIT 51"),
+    ('delete_lot: occupied check',
+     "SELECT id FROM parking_spots WHERE lot_id = :lot_id AND status = 'O' LIMIT 1"),
+    ('view_users: first page',
+     "SELECT id, username, email FROM users WHERE role = 'user' ORDER BY id LIMIT 51"),
+    ('edit_lot: rollup rebuild for one lot',
+     "SELECT count(r.id) FROM reservations r JOIN parking_spots s ON s.id = r.spot_id WHERE s.lot_id = :lot_id"),
+    ('reports: reservations in one day',
+     "SELECT count(id) FROM reservations WHERE parking_timestamp >= :day_start AND parking_timestamp < :day_end"),
+]
+
+
+def seed(path, users, lots, spots_per_lot, reservations):
+    con = sqlite3.connect(path)
+    con.execute('PRAGMA journal_mode=OFF')
+    con.execute('PRAGMA synchronous=OFF')
+    rng = random.Random(42)
+
+    con.execute("INSERT INTO users (id, username, password, email, role) VALUES (1, 'admin', 'admin', 'admin@gmail.com', 'admin')")
+    con.executemany(
+        "INSERT INTO users (id, username, password, email, role) VALUES (?, ?, 'x', ?, 'user')",
+        ((i, f'user{i}', f'user{i}@example.com') for i in range(2, users + 2))
+    )
+    con.executemany(
+        "INSERT INTO parking_lots (id, prime_location_name, price_per_hour, address, pin_code, max_spots) "
+        "VALUES (?, ?, ?, '-', ?, ?)",
+        ((i, f'Lot {i}', rng.choice([20, 30, 40, 50]), f'{600000 + i:06d}', spots_per_lot)
+         for i in range(1, lots + 1))
+    )
+    con.executemany(
+        "INSERT INTO parking_spots (lot_id, status, spot_label) VALUES (?, ?, ?)",
+        ((lot, 'O' if n <= spots_per_lot // 10 else 'A', f'Spot-{n}')
+         for lot in range(1, lots + 1) for n in range(1, spots_per_lot + 1))
+    )
+
+    total_spots = lots * spots_per_lot
+    start = datetime(2024, 1, 1)
+
+    def rows():
+        for i in range(reservations):
+            parked = start + timedelta(minutes=rng.randrange(0, 2 * 365 * 24 * 60))
+            stay = timedelta(minutes=rng.randrange(15, 600))
+            active = i >= reservations - total_spots // 10
+            yield (rng.randrange(1, total_spots + 1), rng.randrange(2, users + 2),
+                   parked.isoformat(' '), None if active else (parked + stay).isoformat(' '),
+                   None if active else round(stay.total_seconds() / 3600 * 30, 2))
+
+    con.executemany(
+        "INSERT INTO reservations (spot_id, user_id, parking_timestamp, leaving_timestamp, parking_cost) "
+        "VALUES (?, ?, ?, ?, ?)", rows()
+    )
+    con.commit()
+    con.close()
+
+
+def measure(conn, sql, params, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        conn.execute(text(sql), params).fetchall()
+        timings.append(time.perf_counter() - start)
+    plan = [row[3] for row in conn.execute(text(f'EXPLAIN QUERY PLAN {sql}'), params)]
+    return statistics.median(timings) * 1000, plan
+
+
+def run_all(params, repeat):
+    results = {}
+    with db.engine.connect() as conn:
+        for label, sql in QUERIES:
+            results[label] = measure(conn, sql, params, repeat)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=50000)
+    parser.add_argument('--lots', type=int, default=200)
+    parser.add_argument('--spots-per-lot', type=int, default=100)
+    parser.add_argument('--reservations', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(prefix='index-bench-'), 'bench.db')
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{path}'
+    db.init_app(app)
+
+    with app.app_context():
+        db.create_all()
+        index_names = [ix.name for table in db.metadata.sorted_tables for ix in table.indexes]
+        with db.engine.begin() as conn:
+            for name in index_names:
+                conn.execute(text(f'DROP INDEX IF EXISTS {name}'))
+
+        started = time.perf_counter()
+        seed(path, args.users, args.lots, args.spots_per_lot, args.reservations)
+        print(f"seeded {args.reservations:,} reservations in {time.perf_counter() - started:.1f}s")
+
+        params = {'user_id': args.users // 2, 'lot_id': args.lots // 2,
+                  'day_start': '2024-06-01 00:00:00', 'day_end': '2024-06-02 00:00:00'}
+        before = run_all(params, args.repeat)
+
+        started = time.perf_counter()
+        applied = migrations.upgrade()
+        print(f"migration applied {len(applied)} index(es) in {time.perf_counter() - started:.1f}s\n")
+        after = run_all(params, args.repeat)
+
+    for label, _ in QUERIES:
+        before_ms, before_plan = before[label]
+        after_ms, after_plan = after[label]
+        speedup = before_ms / after_ms if after_ms else float('inf')
+        print(f"{label}\n  before {before_ms:9.3f} ms  {' | '.join(before_plan)}"
+              f"\n  after  {after_ms:9.3f} ms  {' | '.join(after_plan)}\n  speedup x{speedup:.1f}\n")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,359 @@
+"""Load test for the booking lifecycle, driving the real Flask app.
+
+Simulated users each go through register -> login -> user_dashboard ->
+book_spot -> release_spot -> user_summary, while simulated admins keep
+polling admin_summary and view_spots. Requests run either in process through
+the Flask test client or over HTTP against a local server, and every route
+gets throughput, p50/p95/p99 latency and the mean of the ``X-Query-Count``
+header the app reports.
+
+    # in process, against a throwaway database
+    python benchmarks/loadtest.py --users 2000 --concurrency 64
+
+    # against a server started here on a throwaway database
+    python benchmarks/loadtest.py --spawn --users 2000 --concurrency 64
+
+    # against a server that is already running
+    python benchmarks/loadtest.py --url http://127.0.0.1:5000 --users 500
+
+Results are written as JSON (``--output``), tagged with the current commit.
+``--compare old.json`` prints the change per route and exits non-zero when
+p95 latency or throughput regressed by more than ``--tolerance`` percent.
+"""
+import argparse
+import http.cookiejar
+import json
+import os
+import platform
+import re
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ADMIN = {'user_name': 'admin', 'pwd': 'admin'}
+
+
+# ---------------------------- #
+#           Clients            #
+# ---------------------------- #
+class InProcessClient:
+    """One browser session against the app via the Flask test client."""
+
+    def __init__(self, app):
+        self._client = app.test_client()
+
+    def request(self, method, path, data=None):
+        response = self._client.open(path, method=method, data=data)
+        return response.status_code, response.headers, response.get_data(as_text=True)
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HttpClient:
+    """One browser session over HTTP, with its own cookie jar.
+
+    Redirects are not followed, so every route is timed on its own, just like
+    with the test client.
+    """
+
+    def __init__(self, base_url):
+        self._base = base_url.rstrip('/')
+        self._opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _NoRedirect()
+        )
+
+    def request(self, method, path, data=None):
+        body = urllib.parse.urlencode(data).encode() if data is not None else None
+        req = urllib.request.Request(self._base + path, data=body, method=method)
+        try:
+            with self._opener.open(req, timeout=60) as response:
+                return response.status, response.headers, response.read().decode()
+        except urllib.error.HTTPError as response:
+            return response.code, response.headers, response.read().decode()
+
+
+# ---------------------------- #
+#          Recording           #
+# ---------------------------- #
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = defaultdict(list)
+        self.queries = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def call(self, client, route, method, path, data=None):
+        start = time.perf_counter()
+        try:
+            status, headers, body = client.request(method, path, data)
+        except Exception:
+            status, headers, body = None, {}, ''
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.samples[route].append(elapsed)
+            if headers.get('X-Query-Count') is not None:
+                self.queries[route].append(int(headers['X-Query-Count']))
+            if status not in (200, 302, 304):
+                self.errors[route] += 1
+        return body
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(recorder, wall_seconds):
+    routes = {}
+    for route, samples in sorted(recorder.samples.items()):
+        samples = sorted(samples)
+        queries = recorder.queries.get(route) or []
+        routes[route] = {
+            'requests': len(samples),
+            'errors': recorder.errors.get(route, 0),
+            'throughput_rps': round(len(samples) / wall_seconds, 2),
+            'p50_ms': round(percentile(samples, 50) * 1000, 2),
+            'p95_ms': round(percentile(samples, 95) * 1000, 2),
+            'p99_ms': round(percentile(samples, 99) * 1000, 2),
+            'mean_queries': round(sum(queries) / len(queries), 2) if queries else None,
+        }
+    return routes
+
+
+# ---------------------------- #
+#          Scenarios           #
+# ---------------------------- #
+def setup_lots(client, lots, spots_per_lot):
+    client.request('POST', '/login', ADMIN)
+    for i in range(lots):
+        client.request('POST', '/admin/lots/add', {
+            'prime_location_name': f'Load Test Lot {i + 1}', 'address': f'{i + 1} Bench Street',
+            'pin_code': f'{600000 + i:06d}', 'price_per_hour': '40', 'max_spots': str(spots_per_lot),
+        })
+    _, _, body = client.request('GET', '/admin/lots')
+    ids = sorted({int(lot_id) for lot_id in re.findall(r'/admin/spots/(\d+)', body)})
+    return ids[-lots:]
+
+
+def user_flow(client, recorder, n, lot_id, tag):
+    name = f'load{tag}_{n}'
+    recorder.call(client, 'register', 'POST', '/register', {
+        'mail': f'{name}@example.com', 'user_name': name, 'pwd': 'pw',
+        'vehicle_number': f'TN{n % 100:02d}LT{n:05d}', 'pin_code': '600001',
+    })
+    recorder.call(client, 'login', 'POST', '/login', {'user_name': name, 'pwd': 'pw'})
+    recorder.call(client, 'user_dashboard', 'GET', '/user/dashboard')
+    recorder.call(client, 'book_spot', 'GET', f'/user/book/{lot_id}')
+    recorder.call(client, 'book_spot', 'POST', f'/user/book/{lot_id}', {'vehicle_number': f'TN{n:05d}'})
+    body = recorder.call(client, 'user_dashboard', 'GET', '/user/dashboard')
+    for reservation_id in re.findall(r'/user/release/(\d+)', body):
+        recorder.call(client, 'release_spot', 'POST', f'/user/release/{reservation_id}')
+    recorder.call(client, 'user_summary', 'GET', '/user/summary')
+    recorder.call(client, 'logout', 'GET', '/logout')
+
+
+def admin_flow(client, recorder, lot_ids, stop):
+    client.request('POST', '/login', ADMIN)
+    i = 0
+    while not stop.is_set():
+        recorder.call(client, 'admin_summary', 'GET', '/admin/summary')
+        recorder.call(client, 'view_spots', 'GET', f'/admin/spots/{lot_ids[i % len(lot_ids)]}')
+        i += 1
+
+
+def run(make_client, args):
+    setup = make_client()
+    lot_ids = setup_lots(setup, args.lots, args.spots_per_lot)
+    if not lot_ids:
+        sys.exit("Could not create the load-test lots (is the admin login admin/admin?)")
+
+    recorder = Recorder()
+    tag = str(int(time.time()))
+    stop = threading.Event()
+    admins = [threading.Thread(target=admin_flow, args=(make_client(), recorder, lot_ids, stop), daemon=True)
+              for _ in range(args.admins)]
+
+    started = time.perf_counter()
+    for thread in admins:
+        thread.start()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        for n in range(args.users):
+            pool.submit(user_flow, make_client(), recorder, n, lot_ids[n % len(lot_ids)], tag)
+    stop.set()
+    for thread in admins:
+        thread.join()
+    wall = time.perf_counter() - started
+    return wall, summarize(recorder, wall)
+
+
+# ---------------------------- #
+#           Targets            #
+# ---------------------------- #
+def throwaway_copy():
+    """Copy the app to a scratch directory, so the database and the summary
+    charts it renders under static/ never touch the working tree."""
+    workdir = os.path.join(tempfile.mkdtemp(prefix='loadtest-'), 'app')
+    shutil.copytree(ROOT, workdir, ignore=shutil.ignore_patterns(
+        '.git', 'instance', '__pycache__', 'benchmarks', 'user_summary_*.png'))
+    return workdir, f"sqlite:///{os.path.join(workdir, 'parking.db')}"
+
+
+def in_process_app(storage_mode):
+    workdir, database_uri = throwaway_copy()
+    os.environ['PARKING_SQLALCHEMY_DATABASE_URI'] = database_uri
+    if storage_mode:
+        os.environ['PARKING_STORAGE_MODE'] = storage_mode
+    sys.path.insert(0, workdir)
+    import logging
+    from app import bootstrap, create_app
+    app = create_app()
+    bootstrap(app)
+    app.logger.setLevel(logging.ERROR)
+    return app
+
+
+def spawn_server(storage_mode):
+    workdir, database_uri = throwaway_copy()
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    env = dict(os.environ, PARKING_SQLALCHEMY_DATABASE_URI=database_uri)
+    if storage_mode:
+        env['PARKING_STORAGE_MODE'] = storage_mode
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'flask', '--app', 'app', 'run', '--with-threads', '--port', str(port)],
+        cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    url = f'http://127.0.0.1:{port}'
+    for _ in range(300):
+        try:
+            urllib.request.urlopen(url + '/login', timeout=1).close()
+            return server, url
+        except OSError:
+            time.sleep(0.1)
+    server.kill()
+    sys.exit("Server did not start")
+
+
+# ---------------------------- #
+#           Reports            #
+# ---------------------------- #
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_routes(routes):
+    print(f"{'route':<16} {'reqs':>6} {'err':>4} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'queries':>8}")
+    for route, r in routes.items():
+        queries = '-' if r['mean_queries'] is None else f"{r['mean_queries']:.1f}"
+        print(f"{route:<16} {r['requests']:>6} {r['errors']:>4} {r['throughput_rps']:>8.1f} "
+              f"{r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} {r['p99_ms']:>8.1f} {queries:>8}")
+
+
+def compare(baseline, current, tolerance):
+    """Print per-route changes against ``baseline``; return the regressed routes."""
+    print(f"\ncompared with {baseline.get('commit') or baseline['started_at']}")
+    print(f"{'route':<16} {'p95 ms':>18} {'req/s':>18} {'queries':>12}")
+    regressed = []
+    for route, now in current['routes'].items():
+        before = baseline['routes'].get(route)
+        if before is None:
+            continue
+        p95_change = (now['p95_ms'] - before['p95_ms']) / before['p95_ms'] * 100 if before['p95_ms'] else 0.0
+        rps_change = (now['throughput_rps'] - before['throughput_rps']) / before['throughput_rps'] * 100 \
+            if before['throughput_rps'] else 0.0
+        flag = ''
+        if p95_change > tolerance or rps_change < -tolerance:
+            regressed.append(route)
+            flag = '  REGRESSED'
+        print(f"{route:<16} {before['p95_ms']:>7.1f} -> {now['p95_ms']:>7.1f} "
+              f"{before['throughput_rps']:>7.1f} -> {now['throughput_rps']:>7.1f} "
+              f"{before['mean_queries']!s:>5} -> {now['mean_queries']!s:<5}{flag}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument('--url', help="base URL of a running server (default: run in process)")
+    target.add_argument('--spawn', action='store_true', help="start a local server on a throwaway database")
+    parser.add_argument('--users', type=int, default=1000, help="simulated users, one lifecycle each")
+    parser.add_argument('--concurrency', type=int, default=32, help="users in flight at once")
+    parser.add_argument('--admins', type=int, default=2, help="admins polling summary and spot views")
+    parser.add_argument('--lots', type=int, default=10)
+    parser.add_argument('--spots-per-lot', type=int, default=200)
+    parser.add_argument('--storage-mode', choices=['simple', 'production'],
+                        help="STORAGE_MODE for in-process and spawned targets")
+    parser.add_argument('--output', help="where to write the JSON results")
+    parser.add_argument('--compare', help="earlier JSON results to compare against")
+    parser.add_argument('--tolerance', type=float, default=20.0, help="allowed regression, in percent")
+    args = parser.parse_args()
+
+    server = None
+    if args.url:
+        mode = 'http'
+        make_client = lambda: HttpClient(args.url)
+    elif args.spawn:
+        mode = 'http'
+        server, url = spawn_server(args.storage_mode)
+        make_client = lambda: HttpClient(url)
+    else:
+        mode = 'in-process'
+        app = in_process_app(args.storage_mode)
+        make_client = lambda: InProcessClient(app)
+
+    started_at = datetime.now(timezone.utc).isoformat(timespec='seconds')
+    try:
+        wall, routes = run(make_client, args)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    results = {
+        'commit': git_commit(),
+        'started_at': started_at,
+        'mode': mode,
+        'python': platform.python_version(),
+        'config': {k: v for k, v in vars(args).items() if k not in ('output', 'compare')},
+        'wall_seconds': round(wall, 2),
+        'flows_per_second': round(args.users / wall, 2),
+        'routes': routes,
+    }
+    print(f"{args.users} user flows in {wall:.1f}s ({results['flows_per_second']:.1f} flows/s, {mode})\n")
+    print_routes(routes)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nresults written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(baseline, results, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""Latency benchmark for the FTS5-backed admin search.
+
+Seeds a throwaway database with many users and lots, builds the search
+indexes and times a mix of exact, prefix, multi-word and misspelt queries.
+
+    python benchmarks/search_bench.py --users 1000000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from sqlalchemy import text
+
+from models import db
+import search
+
+
+FIRST = ['arjun', 'priya', 'rahul', 'sneha', 'vikram', 'ananya', 'rohan', 'kavya', 'aditya', 'meera']
+LAST = ['sharma', 'iyer', 'patel', 'reddy', 'khan', 'singh', 'nair', 'gupta', 'das', 'menon']
+CITIES = ['Mumbai', 'Delhi', 'Chennai', 'Kolkata', 'Bengaluru', 'Hyderabad', 'Pune', 'Jaipur']
+
+
+def seed(path, users, lots):
+    rng = random.Random(7)
+    con = sqlite3.connect(path)
+    con.execute('PRAGMA journal_mode=OFF')
+    con.execute('PRAGMA synchronous=OFF')
+    con.executemany(
+        "INSERT INTO users (id, username, password, email, role, vehicle_number) VALUES (?, ?, 'x', ?, 'user', ?)",
+        ((i, f'{rng.choice(FIRST)}{rng.choice(LAST)}{i}', f'user{i}@example.com',
+          f'TN{rng.randrange(1, 99):02d}AB{i % 10000:04d}') for i in range(1, users + 1))
+    )
+    con.executemany(
+        "INSERT INTO parking_lots (id, prime_location_name, price_per_hour, address, pin_code, max_spots) "
+        "VALUES (?, ?, 20, ?, ?, 10)",
+        ((i, f'{rng.choice(CITIES)} Central {i}', f'{i} Station Road', f'{600000 + i:06d}')
+         for i in range(1, lots + 1))
+    )
+    con.commit()
+    con.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=1000000)
+    parser.add_argument('--lots', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(prefix='search-bench-'), 'bench.db')
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{path}'
+    app.config['SEARCH_LIMIT'] = 20
+    app.config['SEARCH_RANK_WINDOW'] = 1000
+    db.init_app(app)
+
+    with app.app_context():
+        db.create_all()
+        started = time.perf_counter()
+        seed(path, args.users, args.lots)
+        print(f"seeded {args.users:,} users in {time.perf_counter() - started:.1f}s")
+        started = time.perf_counter()
+        app.config['SEARCH_FTS'] = search.ensure_schema()
+        print(f"built FTS indexes in {time.perf_counter() - started:.1f}s\n")
+
+        sample = db.session.execute(
+            text('SELECT username FROM users WHERE id = :id'), {'id': args.users // 2}).scalar()
+        cases = [
+            ('users', 'exact username', sample),
+            ('users', 'prefix', 'priyash'),
+            ('users', 'short prefix', 'ar'),
+            ('users', 'email', f'user{args.users // 3}@example'),
+            ('users', 'vehicle', 'TN07AB12'),
+            ('users', 'two words', 'rahul user12'),
+            ('users', 'typo', 'snehq'),
+            ('users', 'no match', 'qqqqzzzz'),
+            ('lots', 'lot name', 'chennai central'),
+            ('lots', 'pin code', '600123'),
+            ('lots', 'lot typo', 'hyderbad'),
+        ]
+        print(f"{'target':<6} {'case':<15} {'query':<26} {'hits':>5} {'p50 ms':>8} {'p95 ms':>8}")
+        for target, label, query in cases:
+            fn = search.search_users if target == 'users' else search.search_lots
+            timings = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                hits = fn(query)
+                timings.append((time.perf_counter() - start) * 1000)
+                db.session.remove()
+            timings.sort()
+            print(f"{target:<6} {label:<15} {query:<26} {len(hits):>5} "
+                  f"{statistics.median(timings):>8.2f} {timings[int(len(timings) * 0.95) - 1]:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""Shared-memory occupancy table: size, rebuild time, read latency, cross-process writes.
+
+Seeds a throwaway database with ``--lots`` lots of ``--spots-per-lot``
+spots, builds the shared table from the database and reports its size per
+spot, then times a lot's availability read three ways: a COUNT against
+SQLite (what a worker without an index does), the per-process in-memory
+index, and the shared table. Finally ``--workers`` forked processes book
+and release disjoint spots through the shared table while reading it, and
+the script checks the totals end where they began.
+
+    python benchmarks/shm_occupancy_bench.py --lots 500 --spots-per-lot 2000 --workers 4
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import time
+
+from _harness import throwaway_app
+
+
+def per_read(read, lot_ids, n):
+    started = time.perf_counter()
+    for i in range(n):
+        read(lot_ids[i % len(lot_ids)])
+    return (time.perf_counter() - started) / n * 1e6
+
+
+def worker(app, spots, flips, results):
+    from occupancy import occupancy
+    with app.app_context():
+        rng = random.Random(os.getpid())
+        started = time.perf_counter()
+        for _ in range(flips):
+            lot_id, spot_id = rng.choice(spots)
+            occupancy.book(lot_id, spot_id=spot_id)
+            occupancy.get(lot_id)
+            occupancy.release(lot_id, spot_id=spot_id)
+        results.put(flips * 2 / (time.perf_counter() - started))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--lots', type=int, default=500)
+    parser.add_argument('--spots-per-lot', type=int, default=2000)
+    parser.add_argument('--reads', type=int, default=20000)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--flips', type=int, default=5000)
+    args = parser.parse_args()
+
+    app = throwaway_app('shm-bench', OCCUPANCY_BACKEND='shared')
+    import seed
+    from sqlalchemy import func
+    from models import db, ParkingSpot
+    from occupancy import occupancy, OccupancyIndex
+
+    with app.app_context():
+        seed.generate(users=100, lots=args.lots, spots_per_lot=args.spots_per_lot, reservations=0,
+                      seed=1, echo=lambda line: None)
+        spots = args.lots * args.spots_per_lot
+        # Occupy a third of the spots so there is something to count
+        db.session.execute(ParkingSpot.__table__.update().where(ParkingSpot.id % 3 == 0).values(status='O'))
+        db.session.commit()
+
+        started = time.perf_counter()
+        occupancy.reconcile()
+        rebuilt = time.perf_counter() - started
+        size = os.path.getsize(occupancy._shared.path)
+        print(f"{spots:,} spots in {args.lots} lots: table {size:,} bytes "
+              f"({size * 8 / spots:.2f} bits/spot), built from the database in {rebuilt * 1000:.0f} ms")
+
+        lot_ids = list(occupancy.snapshot())
+        local = OccupancyIndex()
+        local.reconcile()
+
+        def count(lot_id):
+            return db.session.query(ParkingSpot.status, func.count()).filter_by(lot_id=lot_id) \
+                .group_by(ParkingSpot.status).all()
+
+        print(f"{'availability read':<24} {'us/read':>10}")
+        for label, read, n in [('SQLite COUNT', count, max(args.reads // 100, 50)),
+                               ('in-process index', local.get, args.reads),
+                               ('shared table', occupancy.get, args.reads)]:
+            print(f"{label:<24} {per_read(read, lot_ids, n):>10.2f}")
+        before = occupancy.totals()
+        rows = db.session.query(ParkingSpot.lot_id, ParkingSpot.id).filter_by(status='A').all()
+
+    # Each worker books and releases its own spots, so the totals end where they began
+    rng = random.Random(1)
+    rng.shuffle(rows)
+    results = multiprocessing.get_context('fork').Queue()
+    processes = [multiprocessing.get_context('fork').Process(
+        target=worker, args=(app, rows[n::args.workers], args.flips, results)) for n in range(args.workers)]
+    for process in processes:
+        process.start()
+    outcomes = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    with app.app_context():
+        after = occupancy.totals()
+    print(f"{args.workers} workers: {sum(outcomes):,.0f} book/release updates/s in total; "
+          f"totals {before} -> {after}")
+    assert after == before
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""Fan-out latency of the live availability feed.
+
+Starts ``--subscribers`` threads that follow ``AvailabilityFeed`` the way an
+open event stream does (wait, read what is new, coalesce) while one thread
+publishes ``--events`` occupancy changes. Reports how long each change took
+to reach the subscribers (p50/p99/max) and the publish rate. Compare with
+polling, where every subscriber would re-render the dashboard per refresh.
+
+    python benchmarks/sse_fanout.py --subscribers 200 --events 2000
+"""
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+from collections import deque
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from events import AvailabilityFeed
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--subscribers', type=int, default=200)
+    parser.add_argument('--events', type=int, default=2000)
+    parser.add_argument('--lots', type=int, default=50)
+    parser.add_argument('--rate', type=float, default=2000, help="Publishes per second.")
+    args = parser.parse_args()
+
+    feed = AvailabilityFeed()
+    feed._events = deque(maxlen=args.events)  # keep every event so nobody falls behind
+    published = {}
+    latencies = []
+    latencies_lock = threading.Lock()
+    ready = threading.Barrier(args.subscribers + 1)
+
+    def subscriber():
+        last_id, seen = 0, []
+        ready.wait()
+        while last_id < args.events:
+            events = feed.wait(last_id, 1.0)
+            now = time.perf_counter()
+            if events:
+                last_id = events[-1][0]
+                seen.append(now - published[last_id])
+        with latencies_lock:
+            latencies.extend(seen)
+
+    threads = [threading.Thread(target=subscriber, daemon=True) for _ in range(args.subscribers)]
+    for thread in threads:
+        thread.start()
+    ready.wait()
+
+    started = time.perf_counter()
+    for seq in range(1, args.events + 1):
+        published[seq] = time.perf_counter()
+        feed.publish(seq % args.lots, (seq % 7, 7 - seq % 7))
+        time.sleep(max(0.0, started + seq / args.rate - time.perf_counter()))
+    elapsed = time.perf_counter() - started
+    for thread in threads:
+        thread.join()
+
+    ms = [value * 1000 for value in latencies]
+    print(f"{args.subscribers:,} subscribers, {args.events:,} events in {elapsed:.2f}s "
+          f"({args.events / elapsed:,.0f}/s published)")
+    print(f"deliveries: {len(ms):,} (coalesced from {args.subscribers * args.events:,})")
+    print(f"latency ms: p50 {statistics.median(ms):.2f}  p99 {percentile(ms, 99):.2f}  max {max(ms):.2f}")
+
+
+if __name__ == '__main__':
+    main()
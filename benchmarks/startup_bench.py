@@ -0,0 +1,105 @@
+"""Worker startup cost: import time, app build, and time to the first response.
+
+Copies the app into a throwaway directory, runs ``flask init-db`` and a
+small seed there, then in ``--runs`` fresh interpreters each measures the
+``import app``, ``create_app()`` and the first test-client response
+(``/login``) with ``AUTO_BOOTSTRAP`` off (the database was set up by
+``init-db``) and on (the first request checks the schema and admin). It
+also times a ``flask run`` process from spawn to its first HTTP answer,
+and lists the heavy modules (numpy, matplotlib) loaded by then. Reports
+medians in milliseconds.
+
+    python benchmarks/startup_bench.py --runs 7
+"""
+import argparse
+import json
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = '''
+import json, sys, time
+started = time.perf_counter()
+import app as module
+imported = time.perf_counter()
+app = module.create_app()
+created = time.perf_counter()
+response = app.test_client().get('/login')
+answered = time.perf_counter()
+assert response.status_code == 200, response.status_code
+print(json.dumps({
+    'import': (imported - started) * 1000,
+    'create_app': (created - imported) * 1000,
+    'first response': (answered - created) * 1000,
+    'total': (answered - started) * 1000,
+    'heavy': sorted(name for name in ('numpy', 'matplotlib', 'matplotlib.pyplot') if name in sys.modules),
+}))
+'''
+
+
+def throwaway_copy():
+    workdir = os.path.join(tempfile.mkdtemp(prefix='startup-bench-'), 'app')
+    shutil.copytree(ROOT, workdir, ignore=shutil.ignore_patterns(
+        '.git', 'instance', '__pycache__', 'benchmarks', 'user_summary_*.png'))
+    env = dict(os.environ, PARKING_SQLALCHEMY_DATABASE_URI=f"sqlite:///{os.path.join(workdir, 'parking.db')}")
+    for command in (['init-db'], ['seed', '--users', '1000', '--lots', '20', '--reservations', '20000', '--seed', '1']):
+        subprocess.run([sys.executable, '-m', 'flask', '--app', 'app'] + command,
+                       cwd=workdir, env=env, check=True, stdout=subprocess.DEVNULL)
+    return workdir, env
+
+
+def in_process(workdir, env, auto_bootstrap):
+    env = dict(env, PARKING_AUTO_BOOTSTRAP=str(auto_bootstrap).lower())
+    output = subprocess.run([sys.executable, '-c', CHILD], cwd=workdir, env=env, check=True,
+                            capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def served(workdir, env):
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    started = time.perf_counter()
+    server = subprocess.Popen([sys.executable, '-m', 'flask', '--app', 'app', 'run', '--port', str(port)],
+                              cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while True:
+            try:
+                urllib.request.urlopen(f'http://127.0.0.1:{port}/login', timeout=1).close()
+                return (time.perf_counter() - started) * 1000
+            except OSError:
+                if server.poll() is not None:
+                    sys.exit("flask run exited")
+                time.sleep(0.005)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=7)
+    args = parser.parse_args()
+
+    workdir, env = throwaway_copy()
+    print(f"{'measure':<40} {'median ms':>10}")
+    for auto_bootstrap in (False, True):
+        runs = [in_process(workdir, env, auto_bootstrap) for _ in range(args.runs)]
+        for key in ('import', 'create_app', 'first response', 'total'):
+            label = f"{key} (AUTO_BOOTSTRAP={'on' if auto_bootstrap else 'off'})"
+            print(f"{label:<40} {statistics.median(run[key] for run in runs):>10.1f}")
+    print(f"{'flask run, spawn to first answer':<40} "
+          f"{statistics.median(served(workdir, env) for _ in range(args.runs)):>10.1f}")
+    print(f"heavy modules loaded by the first response: {', '.join(runs[-1]['heavy']) or 'none'}")
+
+
+if __name__ == '__main__':
+    main()
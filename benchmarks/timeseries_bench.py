@@ -0,0 +1,89 @@
+"""Utilization history: "how full was lot X last month" from the rings vs. a reservations scan.
+
+Seeds a throwaway database with ``--lots`` lots and
+``--reservations`` stays, backfills ``--days`` days of history from them
+and reports the backfill time and the saved file's size. Then answers the
+same question for random lots both ways: summing each overlapping stay's
+minutes in SQL (over reservations and the archive), and reading the hour
+ring. Also times one live sample of every lot, which the sampler thread
+pays each ``UTILIZATION_SAMPLE_SECONDS``.
+
+    python benchmarks/timeseries_bench.py --lots 200 --reservations 500000
+"""
+import argparse
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+from _harness import throwaway_app
+
+
+def per_call(call, lot_ids, n):
+    started = time.perf_counter()
+    for i in range(n):
+        call(lot_ids[i % len(lot_ids)])
+    return (time.perf_counter() - started) / n * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--lots', type=int, default=200)
+    parser.add_argument('--reservations', type=int, default=500000)
+    parser.add_argument('--days', type=int, default=100)
+    parser.add_argument('--queries', type=int, default=200)
+    args = parser.parse_args()
+
+    app = throwaway_app('timeseries-bench', UTILIZATION_SAMPLING=False)
+    import seed
+    from sqlalchemy import func, select, text
+    from models import db, ArchivedReservation, ParkingSpot
+    from timeseries import backfill, utilization
+
+    with app.app_context():
+        seed.generate(users=args.users, lots=args.lots, spots_per_lot=50, reservations=args.reservations,
+                      seed=1, echo=lambda line: None)
+        started = time.perf_counter()
+        backfill(args.days)
+        filled = time.perf_counter() - started
+        utilization.save()
+        print(f"backfilled {args.days} days of {args.lots} lots from {args.reservations:,} stays "
+              f"in {filled:.1f}s; file {os.path.getsize(utilization.path):,} bytes")
+
+        end = datetime.utcnow()
+        start = end - timedelta(days=30)
+        spots = dict(db.session.query(ParkingSpot.lot_id, func.count(ParkingSpot.id)).group_by(ParkingSpot.lot_id))
+        window = (end - start).total_seconds() / 86400
+        overlap = ("(julianday(min(coalesce({leave}, :end), :end)) - julianday(max({park}, :start)))")
+
+        def scan(lot_id):
+            hot = db.session.execute(text(
+                f"SELECT total({overlap.format(leave='r.leaving_timestamp', park='r.parking_timestamp')}) "
+                "FROM reservations r JOIN parking_spots s ON s.id = r.spot_id "
+                "WHERE s.lot_id = :lot AND r.parking_timestamp < :end "
+                "AND (r.leaving_timestamp IS NULL OR r.leaving_timestamp > :start)"),
+                {'lot': lot_id, 'start': start, 'end': end}).scalar()
+            archived = db.session.execute(
+                select(func.total(func.julianday(func.min(ArchivedReservation.leaving_timestamp, end))
+                                  - func.julianday(func.max(ArchivedReservation.parking_timestamp, start))))
+                .where(ArchivedReservation.lot_id == lot_id, ArchivedReservation.parking_timestamp < end,
+                       ArchivedReservation.leaving_timestamp > start)).scalar()
+            return (hot + archived) / (spots[lot_id] * window)
+
+        def rings(lot_id):
+            return utilization.summary(lot_id, start, end, 'hour')[0]
+
+        lot_ids = list(spots)
+        random.Random(1).shuffle(lot_ids)
+        lot_id = lot_ids[0]
+        print(f"lot {lot_id}, last 30 days: scan {scan(lot_id):.2%}, rings {rings(lot_id):.2%}")
+        print(f"{'how full was a lot last month':<32} {'ms/query':>10}")
+        for label, call, n in [('reservations scan', scan, max(args.queries // 20, 5)),
+                               ('hour ring', rings, args.queries)]:
+            print(f"{label:<32} {per_call(call, lot_ids, n):>10.3f}")
+        print(f"{'one sample of every lot':<32} {per_call(lambda _: utilization.sample(), lot_ids, 50):>10.3f}")
+
+
+if __name__ == '__main__':
+    main()
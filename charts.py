@@ -0,0 +1,127 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+from models import db, ParkingLot, UserLotStat, UserStats
+
+
+# ---------------------------- #
+#   Background Chart Renderer  #
+# ---------------------------- #
+class ChartRenderer:
+    """Renders per-user summary charts on a worker pool, off the request path.
+
+    Charts are keyed by the user's reservation version, so a chart is only
+    re-rendered after the user books again. Both the version and the chart
+    data come from the per-user stats tables, which cover archived
+    reservations as well. matplotlib is imported by the
+    worker on first use and only its object-oriented Figure API is used, which
+    keeps rendering free of pyplot's global state.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._executor = None
+        self._rendered = {}
+        self._pending = {}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('CHART_WORKERS', 2)
+        self.app = app
+        app.extensions['charts'] = self
+
+    def _submit(self, fn, *args):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.app.config['CHART_WORKERS'],
+                thread_name_prefix='chart-render'
+            )
+        self._executor.submit(fn, *args)
+
+    # ---------- Versions ----------
+    @staticmethod
+    def reservation_version(user_id):
+        bookings = db.session.query(UserStats.bookings).filter_by(user_id=user_id).scalar()
+        return (bookings or 0,)
+
+    # ---------- User Summary ----------
+    @staticmethod
+    def user_summary_filename(user_id):
+        return f'user_summary_{user_id}.png'
+
+    def user_summary(self, user_id, version=None):
+        """Return ``(static filename, version tag)`` of the user's summary chart.
+
+        Schedules a render when the chart is missing or out of date and never
+        waits for it; until the new image is ready the previous one is served.
+        Returns ``(None, None)`` while no chart has been rendered yet.
+        ``version`` is :meth:`reservation_version` if the caller already has it.
+        """
+        version = version or self.reservation_version(user_id)
+        if not version[0]:
+            return None, None
+
+        with self._lock:
+            rendered_version, filename = self._rendered.get(user_id, (None, None))
+            if rendered_version != version and self._pending.get(user_id) != version:
+                self._pending[user_id] = version
+                self._submit(self._render_user_summary, user_id, version)
+
+        if filename is None:
+            return None, None
+        return filename, '-'.join(map(str, rendered_version))
+
+    def _render_user_summary(self, user_id, version):
+        try:
+            with self.app.app_context():
+                data = db.session.query(
+                    ParkingLot.prime_location_name,
+                    UserLotStat.bookings
+                ).join(UserLotStat, UserLotStat.lot_id == ParkingLot.id) \
+                 .filter(UserLotStat.user_id == user_id, UserLotStat.bookings > 0) \
+                 .order_by(ParkingLot.prime_location_name).all()
+
+                filename = None
+                if data:
+                    filename = self.user_summary_filename(user_id)
+                    path = os.path.join(current_app.static_folder, filename)
+                    self._draw_bar_chart(
+                        path,
+                        [name for name, _ in data],
+                        [count for _, count in data],
+                        title="Your Parking Summary",
+                        xlabel="Parking Lot",
+                        ylabel="Number of Parkings",
+                    )
+            with self._lock:
+                self._rendered[user_id] = (version, filename)
+        except Exception:
+            self.app.logger.exception("Rendering summary chart for user %s failed", user_id)
+        finally:
+            with self._lock:
+                if self._pending.get(user_id) == version:
+                    del self._pending[user_id]
+
+    @staticmethod
+    def _draw_bar_chart(path, labels, values, title, xlabel, ylabel):
+        from matplotlib.figure import Figure
+
+        fig = Figure(figsize=(6, 4))
+        ax = fig.subplots()
+        ax.bar(labels, values, color='lightblue')
+        ax.set_title(title)
+        ax.set_xlabel(xlabel)
+        ax.set_ylabel(ylabel)
+        fig.tight_layout()
+
+        # Write to a temporary file first so a request never sees a half-written PNG.
+        tmp_path = f'{path}.tmp'
+        fig.savefig(tmp_path, format='png')
+        os.replace(tmp_path, path)
+
+
+charts = ChartRenderer()
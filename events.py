@@ -0,0 +1,181 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from itertools import islice
+
+from flask import current_app
+
+from occupancy import occupancy
+
+
+# ---------------------------- #
+#    Live Availability Feed    #
+# ---------------------------- #
+class AvailabilityFeed:
+    """Fans per-lot availability changes out to Server-Sent Events subscribers.
+
+    Every change to the occupancy index is published once, under a sequence
+    number, into a bounded backlog; subscribers block on a shared condition
+    and read from that backlog, so one publish wakes every open stream
+    without any per-subscriber queue. A client reconnecting with
+    ``Last-Event-ID`` gets only what it missed, coalesced to the latest
+    counts per lot, or a full snapshot if the backlog has moved past it.
+    Event ids carry a per-process epoch, so an id handed out before a restart
+    is never mistaken for a position in the new sequence.
+
+    The occupancy listeners only hear of this process's changes. With the
+    shared occupancy backend, bookings made by other workers must reach
+    this process's streams too, so instead of listening the feed polls the
+    shared table every AVAILABILITY_POLL_SECONDS (from the first stream
+    on) and publishes the lots whose counts moved.
+    """
+
+    def __init__(self, app=None):
+        self._events = deque()
+        self._seq = 0
+        self._epoch = os.urandom(4).hex()
+        self._cond = threading.Condition()
+        self._listening = False
+        self._poller = None
+        self.poll_interval = 1.0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('AVAILABILITY_BACKLOG', 1024)
+        app.config.setdefault('AVAILABILITY_HEARTBEAT_SECONDS', 15)
+        app.config.setdefault('AVAILABILITY_STREAM_SECONDS', 300)
+        app.config.setdefault('AVAILABILITY_RETRY_MS', 2000)
+        app.config.setdefault('AVAILABILITY_POLL_SECONDS', 1.0)
+        self.poll_interval = app.config['AVAILABILITY_POLL_SECONDS']
+        with self._cond:
+            self._events = deque(self._events, maxlen=app.config['AVAILABILITY_BACKLOG'])
+        if not self._listening and occupancy.backend != 'shared':
+            occupancy.add_listener(self.publish)
+            self._listening = True
+        app.extensions['availability_feed'] = self
+
+    # ---------- Publishing ----------
+    def publish(self, lot_id, counts):
+        """Record a lot's new ``(available, occupied)``, or ``None`` if it was removed."""
+        with self._cond:
+            self._seq += 1
+            self._events.append((self._seq, lot_id, counts))
+            self._cond.notify_all()
+
+    def _poll(self, app, seen):
+        """Publish the shared table's changes, whichever worker made them."""
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                with app.app_context():
+                    counts = occupancy.snapshot()
+            except Exception:
+                app.logger.exception("Polling the shared occupancy table failed")
+                continue
+            for lot_id in set(seen) | set(counts):
+                if seen.get(lot_id) != counts.get(lot_id):
+                    self.publish(lot_id, counts.get(lot_id))
+            seen = counts
+
+    def _start_polling(self):
+        if self._poller is not None:
+            return
+        # Counts taken before the caller's opening snapshot, so the poller
+        # publishes whatever changes after it
+        seen = occupancy.snapshot()
+        with self._cond:
+            if self._poller is None:
+                self._poller = threading.Thread(target=self._poll, args=(current_app._get_current_object(), seen),
+                                                name='availability-poller', daemon=True)
+                self._poller.start()
+
+    @property
+    def last_id(self):
+        with self._cond:
+            return self._seq
+
+    # ---------- Reading ----------
+    def since(self, last_id):
+        """Events after ``last_id``, or ``None`` if some have already left the backlog."""
+        with self._cond:
+            return self._since(last_id)
+
+    def _since(self, last_id):
+        first = self._events[0][0] if self._events else self._seq + 1
+        if last_id + 1 < first:
+            return None
+        return list(islice(self._events, last_id + 1 - first, None))
+
+    def wait(self, last_id, timeout):
+        """Block until there are events after ``last_id`` or ``timeout`` passes."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._seq > last_id, timeout)
+            return self._since(last_id)
+
+    # ---------- Streaming ----------
+    def _parse_id(self, event_id):
+        epoch, _, seq = (event_id or '').partition('-')
+        if epoch != self._epoch or not seq.isdigit() or int(seq) > self.last_id:
+            return None
+        return int(seq)
+
+    def _format(self, event, seq, changes):
+        lots = {str(lot_id): list(counts) if counts else None for lot_id, counts in changes}
+        data = json.dumps({'lots': lots}, separators=(',', ':'))
+        return f"event: {event}\nid: {self._epoch}-{seq}\ndata: {data}\n\n"
+
+    def _coalesce(self, events):
+        latest = {}
+        for _, lot_id, counts in events:
+            latest[lot_id] = counts
+        return self._format('availability', events[-1][0], latest.items())
+
+    def stream(self, last_event_id=None):
+        """A ``text/event-stream`` response for one subscriber.
+
+        The opening snapshot or replay is built here, inside the request;
+        the generator that follows only touches the feed, so an open stream
+        holds no database connection. Streams end after
+        AVAILABILITY_STREAM_SECONDS and the browser reconnects with its
+        last id, which keeps long-lived connections from pinning workers
+        indefinitely.
+        """
+        config = current_app.config
+        heartbeat = config['AVAILABILITY_HEARTBEAT_SECONDS']
+        lifetime = config['AVAILABILITY_STREAM_SECONDS']
+        if occupancy.backend == 'shared':
+            self._start_polling()
+
+        last_id = self._parse_id(last_event_id)
+        backlog = self.since(last_id) if last_id is not None else None
+        opening = f"retry: {config['AVAILABILITY_RETRY_MS']}\n\n"
+        if backlog is None:
+            last_id = self.last_id
+            opening += self._format('snapshot', last_id, occupancy.snapshot().items())
+        elif backlog:
+            last_id = backlog[-1][0]
+            opening += self._coalesce(backlog)
+
+        def generate(last_id):
+            yield opening
+            deadline = time.monotonic() + lifetime
+            while (remaining := deadline - time.monotonic()) > 0:
+                events = self.wait(last_id, min(heartbeat, remaining))
+                if events is None:
+                    return  # fell behind the backlog; the reconnect gets a snapshot
+                if events:
+                    last_id = events[-1][0]
+                    yield self._coalesce(events)
+                else:
+                    yield ': keep-alive\n\n'
+
+        response = current_app.response_class(generate(last_id), mimetype='text/event-stream')
+        response.headers['Cache-Control'] = 'no-cache'
+        response.headers['X-Accel-Buffering'] = 'no'
+        return response
+
+
+availability_feed = AvailabilityFeed()
@@ -0,0 +1,184 @@
+import csv
+import heapq
+import io
+import json
+from collections import namedtuple
+from contextlib import ExitStack
+from datetime import date, datetime, timedelta
+from itertools import islice
+from operator import itemgetter
+
+from flask import current_app, stream_with_context
+from sqlalchemy import func, select
+
+from models import db, ArchivedReservation, ParkingLot, ParkingSpot, Reservation, ReservationRollup, User
+
+
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+# ---------------------------- #
+#           Filters            #
+# ---------------------------- #
+def parse_filters(args):
+    """Read ``start``/``end`` (YYYY-MM-DD, both inclusive) and ``lot_id`` from a query string.
+
+    Raises ``ValueError`` with a readable message on bad input.
+    """
+    filters = {'start': None, 'end': None, 'lot_id': None}
+    for key in ('start', 'end'):
+        value = args.get(key, '').strip()
+        if value:
+            try:
+                filters[key] = date.fromisoformat(value)
+            except ValueError:
+                raise ValueError(f"{key} must be a date like 2024-01-31") from None
+    if filters['start'] and filters['end'] and filters['start'] > filters['end']:
+        raise ValueError("start is after end")
+    lot_id = args.get('lot_id', '').strip()
+    if lot_id:
+        if not lot_id.isdigit():
+            raise ValueError("lot_id must be a number")
+        filters['lot_id'] = int(lot_id)
+    return filters
+
+
+def filename(kind, fmt, start=None, end=None, lot_id=None):
+    parts = [kind]
+    if lot_id is not None:
+        parts.append(f'lot{lot_id}')
+    if start or end:
+        parts.append(f"{start or 'start'}_{end or 'now'}")
+    return f"{'-'.join(parts)}.{fmt}"
+
+
+# ---------------------------- #
+#           Queries            #
+# ---------------------------- #
+RESERVATION_COLUMNS = [
+    'reservation_id', 'lot_id', 'lot_name', 'spot_id', 'spot_label', 'user_id', 'username',
+    'vehicle_number', 'parking_timestamp', 'leaving_timestamp', 'parking_cost',
+]
+
+
+# Queries each sorted by ``key`` over their rows, streamed as one sorted result
+Merged = namedtuple('Merged', 'queries key')
+
+
+def reservations_query(start=None, end=None, lot_id=None):
+    """Hot and archived reservations with their lot, spot and user, oldest check-in first.
+
+    One query per store, each read in its check-in index order with the
+    date and lot filters applied as it goes (left joins, which SQLite does
+    not reorder, keep the store the outer loop; a stay whose spot is gone
+    exports with those columns empty); ``iter_chunks`` merges the two
+    streams. Sorting their union instead would build a temporary b-tree of
+    every row (in memory, under the production pragmas) before the first
+    one could be sent.
+    """
+    queries = []
+    for model, lot_column in ((Reservation, ParkingSpot.lot_id), (ArchivedReservation, ArchivedReservation.lot_id)):
+        query = select(
+            model.id.label('reservation_id'),
+            ParkingLot.id.label('lot_id'),
+            ParkingLot.prime_location_name.label('lot_name'),
+            ParkingSpot.id.label('spot_id'),
+            ParkingSpot.spot_label,
+            User.id.label('user_id'),
+            User.username,
+            func.coalesce(model.vehicle_number, User.vehicle_number).label('vehicle_number'),
+            model.parking_timestamp,
+            model.leaving_timestamp,
+            model.parking_cost,
+        ).outerjoin(ParkingSpot, ParkingSpot.id == model.spot_id) \
+         .outerjoin(ParkingLot, ParkingLot.id == lot_column) \
+         .outerjoin(User, User.id == model.user_id)
+        if start:
+            query = query.where(model.parking_timestamp >= datetime.combine(start, datetime.min.time()))
+        if end:
+            query = query.where(model.parking_timestamp < datetime.combine(end + timedelta(days=1), datetime.min.time()))
+        if lot_id is not None:
+            # ``+ 0`` keeps SQLite off the lot indexes: it would narrow to the
+            # lot through them and then sort, where a check-in order scan
+            # needs no sort at all
+            query = query.where(lot_column + 0 == lot_id)
+        queries.append(query.order_by(model.parking_timestamp, model.id))
+    return Merged(queries, itemgetter(RESERVATION_COLUMNS.index('parking_timestamp'),
+                                      RESERVATION_COLUMNS.index('reservation_id')))
+
+
+REVENUE_COLUMNS = ['date', 'lot_id', 'lot_name', 'bookings', 'revenue']
+
+
+def revenue_query(start=None, end=None, lot_id=None):
+    """Daily bookings and revenue per lot (by check-in day), from the rollups."""
+    day = func.printf('%04d-%02d-%02d', ReservationRollup.year, ReservationRollup.month, ReservationRollup.day)
+    query = select(
+        day.label('date'),
+        ReservationRollup.lot_id,
+        ParkingLot.prime_location_name.label('lot_name'),
+        func.sum(ReservationRollup.bookings).label('bookings'),
+        func.round(func.sum(ReservationRollup.revenue), 2).label('revenue'),
+    ).join(ParkingLot, ParkingLot.id == ReservationRollup.lot_id)
+    if start:
+        query = query.where(day >= start.isoformat())
+    if end:
+        query = query.where(day <= end.isoformat())
+    if lot_id is not None:
+        query = query.where(ReservationRollup.lot_id == lot_id)
+    return query.group_by(ReservationRollup.year, ReservationRollup.month, ReservationRollup.day,
+                          ReservationRollup.lot_id) \
+                .order_by(ReservationRollup.year, ReservationRollup.month, ReservationRollup.day,
+                          ReservationRollup.lot_id)
+
+
+# ---------------------------- #
+#      Streaming Responses     #
+# ---------------------------- #
+def _json_value(value):
+    return value.isoformat(sep=' ') if isinstance(value, datetime) else value
+
+
+def _encode(fmt, columns, rows):
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        return buffer.getvalue()
+    return ''.join(
+        json.dumps(dict(zip(columns, map(_json_value, row))), ensure_ascii=False) + '\n' for row in rows
+    )
+
+
+def iter_chunks(query, columns, fmt, batch_size):
+    """Yield encoded chunks of ``query``'s rows, ``batch_size`` rows at a time.
+
+    Each query (a ``Merged`` has several) is read through a streaming cursor
+    on a connection of its own, so only about a batch per query is ever held
+    in memory, however large the export.
+    """
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        csv.writer(buffer).writerow(columns)
+        yield buffer.getvalue()
+    merged = query if isinstance(query, Merged) else Merged([query], None)
+    with ExitStack() as stack:
+        results = [stack.enter_context(db.engine.connect())
+                   .execution_options(stream_results=True, yield_per=batch_size).execute(part)
+                   for part in merged.queries]
+        rows = results[0] if len(results) == 1 else heapq.merge(*results, key=merged.key)
+        while batch := list(islice(rows, batch_size)):
+            yield _encode(fmt, columns, batch)
+
+
+def stream(query, columns, fmt, download_name):
+    batch_size = current_app.config['EXPORT_BATCH_SIZE']
+    response = current_app.response_class(
+        stream_with_context(iter_chunks(query, columns, fmt, batch_size)),
+        mimetype=FORMATS[fmt],
+    )
+    response.headers['Content-Disposition'] = f'attachment; filename="{download_name}"'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,115 @@
+import threading
+from collections import OrderedDict, defaultdict
+
+from jinja2 import nodes
+from jinja2.ext import Extension
+
+
+# ---------------------------- #
+#   Template Fragment Cache    #
+# ---------------------------- #
+class FragmentCache:
+    """Bounded LRU of rendered template fragments.
+
+    Templates mark a fragment with ``{% cache name, object_id, version %}``
+    ... ``{% endcache %}``. A fragment is re-rendered only when its version
+    moves on; the cached copy for an older version is replaced in place.
+    Routes that change an object also drop its fragments with
+    :meth:`invalidate`, so stale markup does not sit in the LRU until it is
+    evicted. Fragments must not depend on anything outside their key (the
+    session, flashes, request arguments not in the key).
+    """
+
+    def __init__(self, app=None):
+        self._entries = OrderedDict()
+        self._by_object = defaultdict(set)
+        self._lock = threading.Lock()
+        self.max_size = 4096
+        self.enabled = True
+        self.hits = self.misses = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('FRAGMENT_CACHE', True)
+        app.config.setdefault('FRAGMENT_CACHE_SIZE', 4096)
+        self.enabled = app.config['FRAGMENT_CACHE']
+        self.max_size = app.config['FRAGMENT_CACHE_SIZE']
+        app.jinja_env.add_extension(CacheExtension)
+        app.jinja_env.extend(fragment_cache=self)
+        app.extensions['fragment_cache'] = self
+
+    def get(self, key, version):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, version, html):
+        with self._lock:
+            self._entries[key] = (version, html)
+            self._entries.move_to_end(key)
+            self._by_object[key[1]].add(key)
+            while len(self._entries) > self.max_size:
+                old_key, _ = self._entries.popitem(last=False)
+                self._forget(old_key)
+
+    def _forget(self, key):
+        keys = self._by_object.get(key[1])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_object[key[1]]
+
+    def invalidate(self, object_id):
+        """Drop every cached fragment rendered for ``object_id``."""
+        with self._lock:
+            for key in self._by_object.pop(object_id, ()):
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_object.clear()
+
+    def render(self, name, object_id, version, extra, caller):
+        if not self.enabled:
+            return caller()
+        key = (name, object_id) + tuple(extra)
+        html = self.get(key, version)
+        if html is None:
+            html = caller()
+            self.set(key, version, html)
+        return html
+
+
+class CacheExtension(Extension):
+    """``{% cache name, object_id[, version[, *extra]] %}...{% endcache %}``.
+
+    ``extra`` values become part of the key, e.g. the page cursor of a
+    paginated grid.
+    """
+
+    tags = {'cache'}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            args.append(parser.parse_expression())
+        if len(args) < 2:
+            parser.fail("cache needs at least a name and an object id", lineno)
+        name, object_id, version, *extra = args + [nodes.Const(None)] * (3 - len(args))
+        body = parser.parse_statements(['name:endcache'], drop_needle=True)
+        call = self.call_method('_render', [name, object_id, version, nodes.List(extra)])
+        return nodes.CallBlock(call, [], [], body).set_lineno(lineno)
+
+    def _render(self, name, object_id, version, extra, caller):
+        return self.environment.fragment_cache.render(name, object_id, version, extra, caller)
+
+
+fragment_cache = FragmentCache()
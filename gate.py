@@ -0,0 +1,156 @@
+import hmac
+import threading
+import time
+from datetime import datetime, timezone
+
+from flask import current_app
+
+from models import db, normalize_plate, plate_key, Reservation, User
+
+
+# ---------------------------- #
+#     Active-Vehicle Lookup    #
+# ---------------------------- #
+class AlreadyParked(Exception):
+    """Raised by the booking write job for a plate that has an open reservation."""
+
+    def __init__(self, reservation_id):
+        super().__init__(reservation_id)
+        self.reservation_id = reservation_id
+
+
+def open_reservations(plates):
+    """``{plate: reservation_id}`` of the open reservations of ``plates``, from the database.
+
+    One ``IN`` query on the partial index over open reservations' plates.
+    """
+    if not plates:
+        return {}
+    return dict(db.session.query(Reservation.vehicle_number, Reservation.id)
+                .filter(Reservation.vehicle_number.in_(list(plates)), Reservation.leaving_timestamp.is_(None)))
+
+
+class ActivePlates:
+    """Map from normalized plate to its open reservation, held in memory.
+
+    Loaded with one query over the open reservations (a partial index keeps
+    that cheap), kept current by the routes that book and release, and
+    reloaded every GATE_PLATES_RELOAD_SECONDS. Another process's bookings
+    and releases only show up at the reload, so the map is a hint: answers
+    that matter (gate batches, the duplicate-plate check) come from the
+    database, and refresh the map on the way.
+    """
+
+    def __init__(self, app=None):
+        self._plates = {}
+        self._lock = threading.Lock()
+        self._loaded_at = None
+        self.reload_interval = 300
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('GATE_API_KEY', None)
+        app.config.setdefault('GATE_BATCH_LIMIT', 500)
+        app.config.setdefault('GATE_PLATES_RELOAD_SECONDS', 300)
+        self.reload_interval = app.config['GATE_PLATES_RELOAD_SECONDS']
+        app.extensions['active_plates'] = self
+
+    def _ensure_fresh(self):
+        loaded_at = self._loaded_at
+        if loaded_at is not None and time.monotonic() - loaded_at <= self.reload_interval:
+            return
+        rows = db.session.query(Reservation.vehicle_number, Reservation.id) \
+            .filter(Reservation.leaving_timestamp.is_(None), Reservation.vehicle_number.isnot(None)).all()
+        with self._lock:
+            self._plates = dict(rows)
+            self._loaded_at = time.monotonic()
+
+    def get(self, plate):
+        """The plate's open reservation as far as this process knows (a hint, see above)."""
+        self._ensure_fresh()
+        with self._lock:
+            return self._plates.get(plate)
+
+    def lookup(self, plates):
+        """``{plate: reservation_id}`` for those of ``plates`` that are parked, from the database."""
+        found = open_reservations(plates)
+        with self._lock:
+            for plate in plates:
+                if plate in found:
+                    self._plates[plate] = found[plate]
+                else:
+                    self._plates.pop(plate, None)
+        return found
+
+    # ---------- Writes (call after the DB commit) ----------
+    def add(self, plate, reservation_id):
+        if plate:
+            with self._lock:
+                self._plates[plate] = reservation_id
+
+    def discard(self, plate, reservation_id):
+        with self._lock:
+            if plate and self._plates.get(plate) == reservation_id:
+                del self._plates[plate]
+
+
+active_plates = ActivePlates()
+
+
+# ---------------------------- #
+#        Gate Batches          #
+# ---------------------------- #
+def authorized(key):
+    expected = current_app.config['GATE_API_KEY']
+    return bool(expected) and hmac.compare_digest((key or '').encode(), expected.encode())
+
+
+def parse_events(payload):
+    """Validate a gate batch ``{"events": [{"type", "plate", "lot_id", "at"}, ...]}``.
+
+    ``type`` is ``entry`` or ``exit``; entries need a ``lot_id``; ``at`` is an
+    optional ISO timestamp (UTC) of the plate read. Returns a list of
+    ``(type, plate, lot_id, at)`` tuples; raises ``ValueError`` naming the
+    first bad event.
+    """
+    events = payload.get('events') if isinstance(payload, dict) else None
+    if not isinstance(events, list) or not events:
+        raise ValueError('expected {"events": [...]}')
+    limit = current_app.config['GATE_BATCH_LIMIT']
+    if len(events) > limit:
+        raise ValueError(f"at most {limit} events per batch")
+
+    parsed = []
+    for number, event in enumerate(events):
+        if not isinstance(event, dict):
+            raise ValueError(f"event {number}: expected an object")
+        kind = event.get('type')
+        plate = normalize_plate(event.get('plate') if isinstance(event.get('plate'), str) else None)
+        lot_id = event.get('lot_id')
+        if kind not in ('entry', 'exit'):
+            raise ValueError(f"event {number}: type must be entry or exit")
+        if not plate or len(plate) > 20:
+            raise ValueError(f"event {number}: plate is missing or too long")
+        if kind == 'entry' and (not isinstance(lot_id, int) or isinstance(lot_id, bool)):
+            raise ValueError(f"event {number}: entries need a numeric lot_id")
+        at = None
+        if event.get('at') is not None:
+            try:
+                at = datetime.fromisoformat(str(event['at']))
+            except ValueError:
+                raise ValueError(f"event {number}: at must be an ISO timestamp") from None
+            if at.tzinfo is not None:
+                at = at.astimezone(timezone.utc).replace(tzinfo=None)
+        parsed.append((kind, plate, lot_id, at))
+    return parsed
+
+
+def resolve_users(plates):
+    """``{plate: user_id}`` for registered users, matched on their normalized vehicle number."""
+    if not plates:
+        return {}
+    key = plate_key(User.vehicle_number)
+    rows = db.session.query(key, db.func.min(User.id)) \
+        .filter(key.in_(plates), User.role == 'user').group_by(key)
+    return dict(rows)
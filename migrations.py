@@ -0,0 +1,82 @@
+import click
+from flask.cli import AppGroup
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateColumn
+
+from models import db
+
+
+# ---------------------------- #
+#     In-Place Schema Upgrade  #
+# ---------------------------- #
+# db.create_all() only creates missing tables, so indexes and columns added to
+# existing tables have to be applied to databases created before them. Every
+# step here is idempotent and leaves existing rows untouched.
+def missing_columns():
+    inspector = inspect(db.engine)
+    existing_tables = set(inspector.get_table_names())
+    missing = []
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        present = {column['name'] for column in inspector.get_columns(table.name)}
+        missing.extend(column for column in table.columns if column.name not in present)
+    return missing
+
+
+def missing_indexes():
+    inspector = inspect(db.engine)
+    existing_tables = set(inspector.get_table_names())
+    # Read names from sqlite_master: reflection skips indexes on expressions
+    with db.engine.connect() as conn:
+        present = set(conn.scalars(text("SELECT name FROM sqlite_master WHERE type = 'index'")))
+    return [
+        index
+        for table in db.metadata.sorted_tables if table.name in existing_tables
+        for index in table.indexes if index.name not in present
+    ]
+
+
+def upgrade():
+    """Bring an existing database up to the current schema; returns what was applied."""
+    applied = []
+    with db.engine.begin() as conn:
+        # New columns are nullable, so ADD COLUMN leaves existing rows as NULL
+        for column in missing_columns():
+            ddl = CreateColumn(column).compile(dialect=conn.dialect)
+            conn.execute(text(f'ALTER TABLE {column.table.name} ADD COLUMN {ddl}'))
+            applied.append(f"column {column.table.name}.{column.name}")
+    with db.engine.begin() as conn:
+        for index in missing_indexes():
+            index.create(bind=conn)
+            applied.append(f"index {index.name}")
+        if applied:
+            # Refresh planner statistics so the new indexes get picked up
+            conn.execute(text('ANALYZE'))
+    return applied
+
+
+# ---------------------------- #
+#         CLI Commands         #
+# ---------------------------- #
+schema_cli = AppGroup('schema', help="Inspect and upgrade the database schema.")
+
+
+@schema_cli.command('upgrade')
+def upgrade_command():
+    db.create_all()
+    applied = upgrade()
+    for step in applied:
+        click.echo(f"applied {step}")
+    click.echo("Schema is up to date." if not applied else f"{len(applied)} change(s) applied.")
+
+
+@schema_cli.command('status')
+def status_command():
+    columns, indexes = missing_columns(), missing_indexes()
+    for column in columns:
+        click.echo(f"missing column {column.name} on {column.table.name}")
+    for index in indexes:
+        click.echo(f"missing index {index.name} on {index.table.name}")
+    if not columns and not indexes:
+        click.echo("Schema is up to date.")
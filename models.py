@@ -3,11 +3,27 @@ from datetime import datetime
 
 db = SQLAlchemy()
 
+
+def normalize_plate(vehicle_number):
+    """Canonical form of a vehicle number: no spaces, hyphens or dots, upper case."""
+    if not vehicle_number:
+        return None
+    return vehicle_number.replace(' ', '').replace('-', '').replace('.', '').upper() or None
+
+
+def plate_key(column):
+    """SQL twin of :func:`normalize_plate`, for matching stored free-form numbers."""
+    return db.func.upper(db.func.replace(db.func.replace(db.func.replace(column, ' ', ''), '-', ''), '.', ''))
+
+
 # ---------------------- #
 #       User Model       #
 # ---------------------- #
 class User(db.Model):
     __tablename__ = 'users'
+    __table_args__ = (
+        db.Index('ix_users_role', 'role'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), nullable=False, unique=True)
     password = db.Column(db.String(200), nullable=False)  # Plain text
@@ -18,6 +34,11 @@ class User(db.Model):
 
     reservations = db.relationship('Reservation', backref='user', lazy=True)
 
+
+# Plate lookups from the gate match users however they typed their number
+db.Index('ix_users_plate', plate_key(User.vehicle_number))
+
+
 # ---------------------------- #
 #     Parking Lot Model        #
 # ---------------------------- #
@@ -34,12 +55,33 @@ class ParkingLot(db.Model):
     spots = db.relationship('ParkingSpot', backref='lot', lazy=True, cascade='all, delete-orphan')
 
 
+# ---------------------------- #
+#       Lot Tariff Model       #
+# ---------------------------- #
+# Optional time-of-day pricing for a lot, evaluated by tariffs.py. Lots
+# without a row charge price_per_hour around the clock. Peak hours run from
+# peak_start_hour up to peak_end_hour (wrapping past midnight if the end is
+# earlier), on the same clock as the reservation timestamps.
+class LotTariff(db.Model):
+    __tablename__ = 'lot_tariffs'
+    lot_id = db.Column(db.Integer, db.ForeignKey('parking_lots.id'), primary_key=True)
+    peak_start_hour = db.Column(db.Integer, nullable=True)
+    peak_end_hour = db.Column(db.Integer, nullable=True)
+    peak_price_per_hour = db.Column(db.Float, nullable=True)
+    daily_cap = db.Column(db.Float, nullable=True)                   # most charged per calendar day
+    grace_minutes = db.Column(db.Integer, nullable=False, default=0)  # stays this short are free
+
+
 
 # ---------------------------- #
 #     Parking Spot Model       #
 # ---------------------------- #
 class ParkingSpot(db.Model):
     __tablename__ = 'parking_spots'
+    __table_args__ = (
+        db.Index('ix_parking_spots_lot_status', 'lot_id', 'status'),  # occupancy counts, free-spot pool
+        db.Index('ix_parking_spots_lot', 'lot_id'),                   # spot listing / resizing, in id order
+    )
     id = db.Column(db.Integer, primary_key=True)
     lot_id = db.Column(db.Integer, db.ForeignKey('parking_lots.id'), nullable=False)
     status = db.Column(db.String(1), nullable=False, default='A')  # A=Available, O=Occupied
@@ -52,6 +94,17 @@ class ParkingSpot(db.Model):
 # ---------------------------- #
 class Reservation(db.Model):
     __tablename__ = 'reservations'
+    __table_args__ = (
+        # Active reservations only: stays tiny however long the history grows
+        db.Index('ix_reservations_user_active', 'user_id',
+                 sqlite_where=db.text('leaving_timestamp IS NULL')),
+        db.Index('ix_reservations_user_parked', 'user_id', 'parking_timestamp', 'id'),
+        db.Index('ix_reservations_spot', 'spot_id'),
+        db.Index('ix_reservations_parked_at', 'parking_timestamp'),
+        # Gate exits: which open reservation a plate belongs to
+        db.Index('ix_reservations_vehicle_active', 'vehicle_number',
+                 sqlite_where=db.text('leaving_timestamp IS NULL')),
+    )
     id = db.Column(db.Integer, primary_key=True)
     spot_id = db.Column(db.Integer, db.ForeignKey('parking_spots.id'), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -59,13 +112,92 @@ class Reservation(db.Model):
     leaving_timestamp = db.Column(db.DateTime, nullable=True)
     parking_cost = db.Column(db.Float, nullable=True)
     note = db.Column(db.Text, nullable=True)
+    vehicle_number = db.Column(db.String(20), nullable=True)  # normalized, see normalize_plate
+
+# ---------------------------- #
+#   Archived Reservation Model #
+# ---------------------------- #
+# Closed reservations moved out of the hot table by archive.py. Rows keep
+# their original id, so the two tables never collide, and carry lot_id so
+# per-lot history needs no join through spots.
+class ArchivedReservation(db.Model):
+    __tablename__ = 'reservations_archive'
+    __table_args__ = (
+        db.Index('ix_reservations_archive_user_parked', 'user_id', 'parking_timestamp', 'id'),
+        db.Index('ix_reservations_archive_lot', 'lot_id'),
+        db.Index('ix_reservations_archive_spot', 'spot_id'),
+        db.Index('ix_reservations_archive_parked_at', 'parking_timestamp'),
+    )
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    spot_id = db.Column(db.Integer, db.ForeignKey('parking_spots.id'), nullable=False)
+    lot_id = db.Column(db.Integer, db.ForeignKey('parking_lots.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    parking_timestamp = db.Column(db.DateTime, nullable=False)
+    leaving_timestamp = db.Column(db.DateTime, nullable=False)
+    parking_cost = db.Column(db.Float, nullable=True)
+    vehicle_number = db.Column(db.String(20), nullable=True)
+
+    spot = db.relationship('ParkingSpot')
+    user = db.relationship('User')
+
+# ---------------------------- #
+#   Reservation Rollup Model   #
+# ---------------------------- #
+# Bookings and revenue per lot and per hour of check-in, kept current by
+# book_spot/release_spot so the admin summary never scans reservations.
+class ReservationRollup(db.Model):
+    __tablename__ = 'reservation_rollups'
+    lot_id = db.Column(db.Integer, db.ForeignKey('parking_lots.id'), primary_key=True)
+    year = db.Column(db.Integer, primary_key=True)
+    month = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Integer, primary_key=True)
+    hour = db.Column(db.Integer, primary_key=True)
+    bookings = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0)
+
+# ---------------------------- #
+#     Per-User Stat Models     #
+# ---------------------------- #
+# Running totals behind the user summary page. Booking counters move when a
+# spot is booked; time and cost move when it is released.
+class UserStats(db.Model):
+    __tablename__ = 'user_stats'
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    bookings = db.Column(db.Integer, nullable=False, default=0)
+    total_minutes = db.Column(db.Integer, nullable=False, default=0)
+    total_cost = db.Column(db.Float, nullable=False, default=0)
+
+
+class UserLotStat(db.Model):
+    __tablename__ = 'user_lot_stats'
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    lot_id = db.Column(db.Integer, db.ForeignKey('parking_lots.id'), primary_key=True)
+    bookings = db.Column(db.Integer, nullable=False, default=0)
+
+
+class UserMonthStat(db.Model):
+    __tablename__ = 'user_month_stats'
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    year = db.Column(db.Integer, primary_key=True)
+    month = db.Column(db.Integer, primary_key=True)
+    bookings = db.Column(db.Integer, nullable=False, default=0)
+
+# ---------------------------- #
+#     Data Version Model       #
+# ---------------------------- #
+# Counters behind ETags and fragment cache keys, bumped by versions.py in
+# the transactions that change the data, so every process agrees on them.
+class DataVersion(db.Model):
+    __tablename__ = 'data_versions'
+    scope = db.Column(db.String(10), primary_key=True)                    # 'global', 'lot', 'user', ...
+    key = db.Column(db.Integer, primary_key=True, autoincrement=False)     # lot or user id, else 0
+    version = db.Column(db.Integer, nullable=False, default=0)
 
 # ---------------------------- #
 #    Create Fixed Admin        #
 # ---------------------------- #
 def create_admin(app):
     with app.app_context():
-        db.create_all()
         admin_email = 'admin@gmail.com'
         admin_user = User.query.filter_by(email=admin_email).first()
         if not admin_user:
@@ -0,0 +1,274 @@
+import threading
+import time
+
+from flask import current_app
+from sqlalchemy import func
+
+from models import db, ParkingSpot
+from shm_occupancy import SharedOccupancy, StaleTable, default_path
+
+
+# ---------------------------- #
+#   Per-Lot Occupancy Index    #
+# ---------------------------- #
+class OccupancyIndex:
+    """Available/occupied spot counts per lot, held in memory.
+
+    The counts are loaded with a single GROUP BY, adjusted in place by the
+    routes that change spot status, and periodically reconciled against the
+    database so that any drift (e.g. writes from another process) heals.
+    Listeners added with ``add_listener`` are called with ``(lot_id, counts)``
+    after every change, ``counts`` being ``None`` once a lot is removed. They
+    run under the index lock, so they see changes in order and must not call
+    back into the index.
+
+    With ``OCCUPANCY_BACKEND = 'shared'`` the counts live in a memory-mapped
+    table every worker process attaches to (see shm_occupancy.py) instead
+    of in this process: bookings and releases made by any worker show up in
+    every worker's reads, which take no lock. Listeners still only hear of
+    this process's changes and of drift found on reconciling; the
+    availability feed polls the table instead (see events.py).
+    """
+
+    def __init__(self, app=None):
+        self._counts = {}
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._checked_at = 0.0
+        self._mutations = 0
+        self._listeners = []
+        self._shared = None
+        self.backend = 'memory'
+        self.reconcile_interval = 300
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('OCCUPANCY_RECONCILE_SECONDS', 300)
+        app.config.setdefault('OCCUPANCY_BACKEND', 'memory')
+        app.config.setdefault('OCCUPANCY_SHM_PATH', None)
+        self.reconcile_interval = app.config['OCCUPANCY_RECONCILE_SECONDS']
+        self.backend = app.config['OCCUPANCY_BACKEND']
+        if self.backend not in ('memory', 'shared'):
+            raise ValueError(f"Unknown OCCUPANCY_BACKEND {self.backend!r}; expected 'memory' or 'shared'")
+        app.extensions['occupancy'] = self
+
+    # ---------- Loading / Reconciliation ----------
+    def _query_counts(self):
+        rows = db.session.query(
+            ParkingSpot.lot_id,
+            ParkingSpot.status,
+            func.count(ParkingSpot.id)
+        ).group_by(ParkingSpot.lot_id, ParkingSpot.status).all()
+
+        counts = {}
+        for lot_id, status, count in rows:
+            entry = counts.setdefault(lot_id, [0, 0])
+            entry[0 if status == 'A' else 1] += count
+        return counts
+
+    def _query_spots(self):
+        return db.session.query(ParkingSpot.lot_id, ParkingSpot.id, ParkingSpot.status) \
+            .order_by(ParkingSpot.lot_id, ParkingSpot.id).yield_per(10000)
+
+    def _attach(self):
+        """The shared table, opened on first use (the database URL is known by then)."""
+        if self._shared is None:
+            url = db.engine.url
+            path = current_app.config['OCCUPANCY_SHM_PATH'] or default_path(url, current_app.instance_path)
+            with self._lock:
+                if self._shared is None:
+                    self._shared = SharedOccupancy(path, url)
+        return self._shared
+
+    def _rebuild_shared(self):
+        """Rewrite the shared table from the database.
+
+        Returns whether there was a usable table before, the lots whose
+        counts changed, and the new counts.
+        """
+        before, after = self._attach().rebuild(self._query_spots)
+        changed = {}
+        for lot_id in set(before or {}) | set(after):
+            old = tuple((before or {}).get(lot_id, (0, 0)))
+            new = after.get(lot_id)
+            if old != (new or (0, 0)):
+                changed[lot_id] = (old, new)
+        self._loaded = True
+        self._checked_at = time.monotonic()
+        return before is not None, changed, after
+
+    def _shared_read(self, read):
+        try:
+            return read(self._attach())
+        except StaleTable:
+            current_app.logger.warning("Shared occupancy table missing or stale; rebuilding it")
+            self._rebuild_shared()
+            return read(self._shared)
+
+    def _reconcile_shared(self):
+        counts = self._query_counts()
+        table = self._attach()
+        table.reopen_if_replaced()
+        try:
+            live = table.snapshot()
+        except StaleTable:
+            live = None
+        if live is not None and all(tuple(counts.get(lot_id, (0, 0))) == tuple(live.get(lot_id, (0, 0)))
+                                    for lot_id in set(counts) | set(live)):
+            self._loaded = True
+            self._checked_at = time.monotonic()
+            return {}
+
+        # Missing, or out of step (a worker died between its commit and its
+        # table update, or a booking landed mid-comparison): rebuild it from
+        # the database under the table's lock
+        existed, drift, _ = self._rebuild_shared()
+        with self._lock:
+            for lot_id, (_, new) in drift.items():
+                self._notify(lot_id, new)
+        if existed and drift:
+            current_app.logger.warning("Shared occupancy table drifted for lots %s", sorted(drift))
+        return drift if existed else {}
+
+    def reconcile(self):
+        """Reload the counts from the database and return any lots that drifted."""
+        if self.backend == 'shared':
+            return self._reconcile_shared()
+        with self._lock:
+            mutations = self._mutations
+        counts = self._query_counts()
+
+        with self._lock:
+            if self._mutations != mutations:
+                # A route adjusted the counts while we were reading; our snapshot
+                # may predate that commit, so keep the live counts and retry later.
+                return {}
+            drift = {}
+            if self._loaded:
+                for lot_id in set(counts) | set(self._counts):
+                    old = tuple(self._counts.get(lot_id, (0, 0)))
+                    new = tuple(counts.get(lot_id, (0, 0)))
+                    if old != new:
+                        drift[lot_id] = (old, new)
+            self._counts = counts
+            self._loaded = True
+            self._checked_at = time.monotonic()
+            for lot_id, (_, new) in drift.items():
+                self._notify(lot_id, new)
+
+        if drift:
+            current_app.logger.warning("Occupancy index drifted for lots %s", sorted(drift))
+        return drift
+
+    def _ensure_fresh(self):
+        if not self._loaded or time.monotonic() - self._checked_at > self.reconcile_interval:
+            self.reconcile()
+
+    # ---------- Reads ----------
+    def get(self, lot_id):
+        """Return ``(available, occupied)`` for a lot."""
+        self._ensure_fresh()
+        if self.backend == 'shared':
+            return self._shared_read(lambda table: table.get(lot_id))
+        with self._lock:
+            available, occupied = self._counts.get(lot_id, (0, 0))
+        return available, occupied
+
+    def totals(self):
+        """Return ``(available, occupied)`` summed over all lots."""
+        self._ensure_fresh()
+        if self.backend == 'shared':
+            counts = self._shared_read(lambda table: table.snapshot()).values()
+            return sum(entry[0] for entry in counts), sum(entry[1] for entry in counts)
+        with self._lock:
+            available = sum(entry[0] for entry in self._counts.values())
+            occupied = sum(entry[1] for entry in self._counts.values())
+        return available, occupied
+
+    def snapshot(self):
+        """Return ``{lot_id: (available, occupied)}`` for every lot."""
+        self._ensure_fresh()
+        if self.backend == 'shared':
+            return self._shared_read(lambda table: table.snapshot())
+        with self._lock:
+            return {lot_id: tuple(entry) for lot_id, entry in self._counts.items()}
+
+    def available(self, lot_id):
+        return self.get(lot_id)[0]
+
+    def occupied(self, lot_id):
+        return self.get(lot_id)[1]
+
+    # ---------- Listeners ----------
+    def add_listener(self, listener):
+        self._listeners.append(listener)
+
+    def _notify(self, lot_id, counts):
+        for listener in self._listeners:
+            listener(lot_id, counts)
+
+    # ---------- Writes (call after the DB commit) ----------
+    def _mark_shared(self, lot_id, spot_id, occupied):
+        # No reconcile here: the database already holds this change and the
+        # table does not yet, so a comparison now would always see drift
+        try:
+            counts = self._attach().mark(lot_id, spot_id, occupied)
+        except StaleTable:
+            # The rebuild reads the committed status of the spot
+            self._shared_changed(lot_id)
+            return
+        if counts is not None:
+            with self._lock:
+                self._notify(lot_id, counts)
+
+    def _shared_changed(self, lot_id):
+        # Spots were added or removed: lay the table out again from the database
+        _, changed, after = self._rebuild_shared()
+        changed.setdefault(lot_id, (None, after.get(lot_id)))
+        with self._lock:
+            for changed_id, (_, new) in changed.items():
+                self._notify(changed_id, new)
+
+    def adjust(self, lot_id, available=0, occupied=0):
+        if self.backend == 'shared':
+            return self._shared_changed(lot_id)
+        with self._lock:
+            self._mutations += 1
+            if not self._loaded:
+                return
+            entry = self._counts.setdefault(lot_id, [0, 0])
+            entry[0] = max(entry[0] + available, 0)
+            entry[1] = max(entry[1] + occupied, 0)
+            self._notify(lot_id, tuple(entry))
+
+    def book(self, lot_id, count=1, spot_id=None):
+        if self.backend == 'shared' and spot_id is not None:
+            return self._mark_shared(lot_id, spot_id, True)
+        self.adjust(lot_id, available=-count, occupied=count)
+
+    def release(self, lot_id, count=1, spot_id=None):
+        if self.backend == 'shared' and spot_id is not None:
+            return self._mark_shared(lot_id, spot_id, False)
+        self.adjust(lot_id, available=count, occupied=-count)
+
+    def set_lot(self, lot_id, available, occupied=0):
+        if self.backend == 'shared':
+            return self._shared_changed(lot_id)
+        with self._lock:
+            self._mutations += 1
+            if not self._loaded:
+                return
+            self._counts[lot_id] = [available, occupied]
+            self._notify(lot_id, (available, occupied))
+
+    def remove_lot(self, lot_id):
+        if self.backend == 'shared':
+            return self._shared_changed(lot_id)
+        with self._lock:
+            self._mutations += 1
+            self._counts.pop(lot_id, None)
+            self._notify(lot_id, None)
+
+
+occupancy = OccupancyIndex()
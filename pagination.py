@@ -0,0 +1,101 @@
+import base64
+import json
+from datetime import datetime
+
+from flask import current_app, get_flashed_messages, render_template, request, stream_template
+from sqlalchemy import DateTime, tuple_
+
+
+# ---------------------------- #
+#     Keyset Pagination        #
+# ---------------------------- #
+class Page:
+    def __init__(self, items, next_cursor):
+        self.items = items
+        self.next_cursor = next_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def encode_cursor(values):
+    payload = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip('=')
+
+
+def decode_cursor(token, columns):
+    """Turn a cursor back into typed values, or ``None`` if it is malformed."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+        if len(payload) != len(columns):
+            return None
+        return [
+            datetime.fromisoformat(v) if isinstance(col.type, DateTime) and v is not None else v
+            for v, col in zip(payload, columns)
+        ]
+    except (ValueError, TypeError):
+        return None
+
+
+def keyset_page(query, columns, cursor=None, per_page=None, descending=False):
+    """Fetch one page of ``query`` ordered by ``columns``, after ``cursor``.
+
+    ``columns`` must form a unique key (end it with the primary key). Each page
+    costs one indexed range scan no matter how deep into the listing it is,
+    unlike OFFSET which re-reads every skipped row.
+    """
+    return keyset_result(keyset_query(query, columns, cursor, per_page, descending).all(), columns, per_page)
+
+
+def keyset_query(query, columns, cursor=None, per_page=None, descending=False):
+    """``query`` (an ORM query or a ``select()``) narrowed to the page after ``cursor``.
+
+    For callers that run the statement themselves, e.g. on the async engine;
+    pass the rows to :func:`keyset_result`.
+    """
+    per_page = per_page or current_app.config['PAGE_SIZE']
+    values = decode_cursor(cursor, columns) if cursor else None
+    if values is not None:
+        key = tuple_(*columns)
+        query = query.filter(key < tuple_(*values) if descending else key > tuple_(*values))
+
+    query = query.order_by(*(col.desc() if descending else col.asc() for col in columns))
+    return query.limit(per_page + 1)
+
+
+def keyset_result(rows, columns, per_page=None):
+    per_page = per_page or current_app.config['PAGE_SIZE']
+    items = rows[:per_page]
+    next_cursor = None
+    if len(rows) > per_page:
+        last = items[-1]
+        next_cursor = encode_cursor([getattr(last, col.key) for col in columns])
+    return Page(items, next_cursor)
+
+
+# ---------------------------- #
+#      Listing Responses       #
+# ---------------------------- #
+def render_listing(template_name, **context):
+    """Render a listing page, streaming it when asked to.
+
+    Streaming (``?stream=1`` or ``STREAM_LISTINGS``) sends the page head
+    before the rows are rendered so the first byte leaves immediately.
+    """
+    stream = request.args.get('stream', type=int)
+    if stream is None:
+        stream = current_app.config['STREAM_LISTINGS']
+    if stream:
+        # The session cookie goes out with the headers, before the layout
+        # renders: pop the flashes now (the layout's own call gets the same
+        # messages back from the request) so they are not shown twice
+        get_flashed_messages()
+        return current_app.response_class(stream_template(template_name, **context))
+    return render_template(template_name, **context)
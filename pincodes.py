@@ -0,0 +1,92 @@
+import threading
+import time
+from collections import defaultdict, namedtuple
+
+from models import db, ParkingLot
+
+
+LotInfo = namedtuple('LotInfo', 'id name pin_code price_per_hour')
+
+
+# ---------------------------- #
+#    Pin-Code / Prefix Index   #
+# ---------------------------- #
+class PinCodeIndex:
+    """Lot details and a pin-code prefix index, held in memory.
+
+    Loaded with one query and rebuilt after ``invalidate`` (called by the
+    routes that add, edit or delete lots) or every PIN_INDEX_RELOAD_SECONDS.
+    Every prefix of every lot's pin code maps to the lots under it, so a
+    "near" lookup walks from the full pin code to shorter prefixes (the
+    same delivery office, then sorting district, sub-region and region)
+    and stops as soon as it has enough lots, without scanning the table.
+    """
+
+    def __init__(self, app=None):
+        self._lots = {}
+        self._by_prefix = {}
+        self._lock = threading.Lock()
+        self._loaded_at = None
+        self.reload_interval = 300
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('PIN_INDEX_RELOAD_SECONDS', 300)
+        self.reload_interval = app.config['PIN_INDEX_RELOAD_SECONDS']
+        app.extensions['pincodes'] = self
+
+    # ---------- Loading ----------
+    def _load(self):
+        rows = db.session.query(
+            ParkingLot.id, ParkingLot.prime_location_name, ParkingLot.pin_code, ParkingLot.price_per_hour
+        ).all()
+        lots = {row[0]: LotInfo(*row) for row in rows}
+        by_prefix = defaultdict(list)
+        for lot in sorted(lots.values(), key=lambda lot: lot.pin_code):
+            pin_code = lot.pin_code.strip()
+            for length in range(1, len(pin_code) + 1):
+                by_prefix[pin_code[:length]].append(lot.id)
+        with self._lock:
+            self._lots = lots
+            self._by_prefix = dict(by_prefix)
+            self._loaded_at = time.monotonic()
+
+    def _ensure_fresh(self):
+        loaded_at = self._loaded_at
+        if loaded_at is None or time.monotonic() - loaded_at > self.reload_interval:
+            self._load()
+
+    def invalidate(self):
+        self._loaded_at = None
+
+    # ---------- Reads ----------
+    def lot(self, lot_id):
+        self._ensure_fresh()
+        return self._lots.get(lot_id)
+
+    def near(self, pin_code, accept, limit):
+        """Up to ``limit`` lots passing ``accept(lot_id)``, nearest to ``pin_code`` first.
+
+        Lots sharing a longer prefix come first; within a prefix, those whose
+        pin code is numerically closer.
+        """
+        self._ensure_fresh()
+        with self._lock:
+            lots, by_prefix = self._lots, self._by_prefix
+        found, seen = [], set()
+        for length in range(len(pin_code), 0, -1):
+            candidates = [lot_id for lot_id in by_prefix.get(pin_code[:length], ()) if lot_id not in seen]
+            seen.update(candidates)
+            candidates.sort(key=lambda lot_id: _distance(lots[lot_id].pin_code, pin_code))
+            found.extend(lots[lot_id] for lot_id in candidates if accept(lot_id))
+            if len(found) >= limit:
+                break
+        return found[:limit]
+
+
+def _distance(a, b):
+    return abs(int(a) - int(b)) if a.isdigit() and b.isdigit() else 0
+
+
+pincodes = PinCodeIndex()
@@ -0,0 +1,86 @@
+from sqlalchemy import delete, insert, select
+
+from models import db, ArchivedReservation, ParkingSpot, Reservation
+
+
+PROVISION_BATCH_SIZE = 1000
+
+
+def spot_label(number):
+    return f"Spot-{number}"
+
+
+def _label_number(label):
+    # Accepts both "Spot-7" and the older "Spot 7" spelling
+    digits = (label or '').replace('-', ' ').rsplit(' ', 1)[-1]
+    return int(digits) if digits.isdigit() else None
+
+
+# ---------------------------- #
+#     Bulk Spot Provisioning   #
+# ---------------------------- #
+def provision_spots(lot_id, first, last):
+    """Insert available spots numbered ``first``..``last`` for a lot.
+
+    Rows go through executemany in fixed-size batches instead of one ORM object
+    per spot. Returns the number of spots created.
+    """
+    if last < first:
+        return 0
+    for start in range(first, last + 1, PROVISION_BATCH_SIZE):
+        stop = min(start + PROVISION_BATCH_SIZE, last + 1)
+        db.session.execute(insert(ParkingSpot), [
+            {'lot_id': lot_id, 'status': 'A', 'spot_label': spot_label(i)}
+            for i in range(start, stop)
+        ])
+    return last - first + 1
+
+
+def resize_lot(lot_id, new_count):
+    """Grow or shrink a lot to ``new_count`` spots, touching only the delta.
+
+    Growing appends the missing spots. Shrinking removes the newest spots, but
+    only those that are available; occupied ones in that range are kept and
+    reported. Returns ``(added, removed, blocked_labels)``.
+    """
+    new_count = max(new_count, 0)
+    current_count = ParkingSpot.query.filter_by(lot_id=lot_id).count()
+
+    if new_count > current_count:
+        # Number new spots after the newest one so labels stay unique even when
+        # an earlier shrink left occupied spots behind.
+        newest = db.session.query(ParkingSpot.spot_label).filter_by(lot_id=lot_id) \
+            .order_by(ParkingSpot.id.desc()).limit(1).scalar()
+        first = max(_label_number(newest) or 0, current_count) + 1
+        added = provision_spots(lot_id, first, first + new_count - current_count - 1)
+        return added, 0, []
+    if new_count == current_count:
+        return 0, 0, []
+
+    tail = db.session.query(ParkingSpot.id, ParkingSpot.status, ParkingSpot.spot_label) \
+        .filter_by(lot_id=lot_id) \
+        .order_by(ParkingSpot.id.desc()) \
+        .limit(current_count - new_count).all()
+    blocked = [label for _, status, label in reversed(tail) if status != 'A']
+    if not tail or len(blocked) == len(tail):
+        # Spots removed meanwhile, or every one in the way is occupied
+        return 0, 0, blocked
+
+    # The tail is exactly the lot's spots from its smallest id upwards, so a
+    # range predicate selects it without sending every id back to the DB.
+    removable = select(ParkingSpot.id).where(
+        ParkingSpot.lot_id == lot_id,
+        ParkingSpot.id >= tail[-1].id,
+        ParkingSpot.status == 'A'
+    )
+    # Same effect as the ORM delete-orphan cascade from spot to reservation.
+    for model in (Reservation, ArchivedReservation):
+        db.session.execute(
+            delete(model).where(model.spot_id.in_(removable)),
+            execution_options={'synchronize_session': False}
+        )
+    removed = db.session.execute(
+        delete(ParkingSpot).where(ParkingSpot.id.in_(removable)),
+        execution_options={'synchronize_session': False}
+    ).rowcount
+    return 0, removed, blocked
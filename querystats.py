@@ -0,0 +1,94 @@
+import time
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class QueryBudgetExceeded(RuntimeError):
+    pass
+
+
+# ---------------------------- #
+#   Per-Request Query Stats    #
+# ---------------------------- #
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_start'].pop()
+    if has_request_context():
+        log = g.get('_query_log')
+        if log is not None:
+            log.append((elapsed, statement))
+
+
+class QueryStats:
+    """Counts the SQL statements each request runs and how long they take.
+
+    Every response carries ``X-Query-Count`` and ``X-Query-Time-Ms`` headers and
+    a debug log line names the slowest statements. ``QUERY_BUDGETS`` maps
+    endpoints to the most queries they may run; with ``QUERY_BUDGET_STRICT``
+    (meant for tests) going over budget raises :class:`QueryBudgetExceeded`
+    instead of logging a warning.
+    """
+
+    _listening = False
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('QUERY_STATS_HEADERS', True)
+        app.config.setdefault('QUERY_STATS_SLOWEST', 3)
+        app.config.setdefault('QUERY_BUDGETS', {})
+        app.config.setdefault('QUERY_BUDGET_STRICT', False)
+
+        if not QueryStats._listening:
+            event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+            QueryStats._listening = True
+
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        app.extensions['querystats'] = self
+
+    @staticmethod
+    def _start():
+        g._query_log = []
+
+    @staticmethod
+    def current():
+        """Return ``(count, total seconds, log)`` for the current request."""
+        log = g.get('_query_log') or []
+        return len(log), sum(elapsed for elapsed, _ in log), log
+
+    def _finish(self, response):
+        from flask import current_app
+
+        count, total, log = self.current()
+        config = current_app.config
+        if config['QUERY_STATS_HEADERS']:
+            response.headers['X-Query-Count'] = str(count)
+            response.headers['X-Query-Time-Ms'] = f"{total * 1000:.2f}"
+
+        if count:
+            slowest = sorted(log, key=lambda entry: entry[0], reverse=True)[:config['QUERY_STATS_SLOWEST']]
+            current_app.logger.debug(
+                "%s %s: %d queries in %.2f ms; slowest: %s",
+                request.method, request.path, count, total * 1000,
+                "; ".join(f"{elapsed * 1000:.2f} ms {' '.join(sql.split())[:200]}" for elapsed, sql in slowest)
+            )
+
+        budget = config['QUERY_BUDGETS'].get(request.endpoint)
+        if budget is not None and count > budget:
+            message = f"{request.endpoint} ran {count} queries (budget {budget})"
+            if config['QUERY_BUDGET_STRICT']:
+                raise QueryBudgetExceeded(message)
+            current_app.logger.warning(message)
+        return response
+
+
+querystats = QueryStats()
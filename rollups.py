@@ -0,0 +1,154 @@
+from functools import lru_cache
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import Integer, cast, delete, func, insert, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from models import db, Reservation, ReservationRollup
+from storage import executemany
+import archive
+from versions import versions
+
+
+BUCKET_COLUMNS = ('lot_id', 'year', 'month', 'day', 'hour')
+
+
+# ---------------------------- #
+#   Incremental Maintenance    #
+# ---------------------------- #
+@lru_cache(maxsize=None)
+def _upsert():
+    # Built once and reused with new parameters: constructing the ON CONFLICT
+    # clause costs more than running the statement
+    stmt = sqlite_insert(ReservationRollup)
+    return stmt.on_conflict_do_update(
+        index_elements=list(BUCKET_COLUMNS),
+        set_={
+            'bookings': ReservationRollup.bookings + stmt.excluded.bookings,
+            'revenue': ReservationRollup.revenue + stmt.excluded.revenue,
+        }
+    )
+
+
+def record(lot_id, timestamp, bookings=0, revenue=0.0):
+    """Add to the rollup bucket of ``timestamp`` inside the current transaction."""
+    db.session.connection().execute(_upsert(), {
+        'lot_id': lot_id,
+        'year': timestamp.year,
+        'month': timestamp.month,
+        'day': timestamp.day,
+        'hour': timestamp.hour,
+        'bookings': bookings,
+        'revenue': revenue,
+    })
+
+
+def record_many(entries):
+    """Apply ``(lot_id, timestamp, bookings, revenue)`` increments with one executemany."""
+    executemany(_upsert(), [
+        {'lot_id': lot_id, 'year': timestamp.year, 'month': timestamp.month, 'day': timestamp.day,
+         'hour': timestamp.hour, 'bookings': bookings, 'revenue': revenue}
+        for lot_id, timestamp, bookings, revenue in entries
+    ])
+
+
+def record_booking(lot_id, parking_timestamp):
+    record(lot_id, parking_timestamp, bookings=1)
+
+
+def record_release(lot_id, parking_timestamp, parking_cost):
+    # Revenue is bucketed by check-in time, as the summary always reported it
+    record(lot_id, parking_timestamp, revenue=parking_cost or 0.0)
+
+
+def drop_lot(lot_id):
+    db.session.execute(delete(ReservationRollup).where(ReservationRollup.lot_id == lot_id))
+
+
+# ---------------------------- #
+#    Rebuild / Consistency     #
+# ---------------------------- #
+def _aggregate(lot_id=None):
+    reservations = archive.all_reservations()
+    ts = reservations.c.parking_timestamp
+    query = select(
+        reservations.c.lot_id,
+        cast(func.strftime('%Y', ts), Integer).label('year'),
+        cast(func.strftime('%m', ts), Integer).label('month'),
+        cast(func.strftime('%d', ts), Integer).label('day'),
+        cast(func.strftime('%H', ts), Integer).label('hour'),
+        func.count(reservations.c.id).label('bookings'),
+        func.coalesce(func.sum(reservations.c.parking_cost), 0.0).label('revenue'),
+    )
+    if lot_id is not None:
+        query = query.where(reservations.c.lot_id == lot_id)
+    return query.group_by(*BUCKET_COLUMNS)
+
+
+def rebuild(lot_id=None):
+    """Recompute rollups from raw reservations (one lot, or all of them)."""
+    clear = delete(ReservationRollup)
+    if lot_id is not None:
+        clear = clear.where(ReservationRollup.lot_id == lot_id)
+    db.session.execute(clear)
+    db.session.execute(
+        insert(ReservationRollup).from_select(
+            list(BUCKET_COLUMNS) + ['bookings', 'revenue'], _aggregate(lot_id)
+        )
+    )
+
+
+def check(tolerance=0.01):
+    """Compare rollups with raw reservations; return a list of mismatched buckets.
+
+    Each entry is ``(bucket, expected (bookings, revenue), actual (bookings, revenue))``.
+    """
+    expected = {tuple(row[:5]): (row.bookings, row.revenue)
+                for row in db.session.execute(_aggregate())}
+    actual = {
+        (r.lot_id, r.year, r.month, r.day, r.hour): (r.bookings, r.revenue)
+        for r in ReservationRollup.query.all()
+    }
+
+    drift = []
+    for bucket in sorted(set(expected) | set(actual)):
+        want = expected.get(bucket, (0, 0.0))
+        got = actual.get(bucket, (0, 0.0))
+        if want[0] != got[0] or abs(want[1] - got[1]) > tolerance:
+            drift.append((bucket, want, got))
+    return drift
+
+
+def backfill_if_empty():
+    """Populate the rollups once for a database created before they existed."""
+    if db.session.query(ReservationRollup.lot_id).first() is None \
+            and db.session.query(Reservation.id).first() is not None:
+        rebuild()
+        db.session.commit()
+
+
+# ---------------------------- #
+#         CLI Commands         #
+# ---------------------------- #
+rollups_cli = AppGroup('rollups', help="Maintain the admin summary rollup tables.")
+
+
+@rollups_cli.command('rebuild')
+@click.option('--lot', 'lot_id', type=int, default=None, help="Only rebuild this lot.")
+def rebuild_command(lot_id):
+    rebuild(lot_id)
+    versions.bump()
+    db.session.commit()
+    click.echo("Rollups rebuilt.")
+
+
+@rollups_cli.command('check')
+def check_command():
+    drift = check()
+    for bucket, want, got in drift:
+        click.echo(f"lot={bucket[0]} {bucket[1]:04d}-{bucket[2]:02d}-{bucket[3]:02d} {bucket[4]:02d}h: "
+                   f"expected {want[0]} bookings / {want[1]:.2f}, found {got[0]} / {got[1]:.2f}")
+    if drift:
+        raise SystemExit(f"{len(drift)} rollup bucket(s) out of date; run 'flask rollups rebuild'.")
+    click.echo("Rollups are consistent.")
@@ -0,0 +1,145 @@
+import difflib
+import re
+
+from flask import current_app
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from models import db, ParkingLot, User
+
+
+# ---------------------------- #
+#     FTS5 Search Indexes      #
+# ---------------------------- #
+# External-content FTS5 tables mirror the searchable columns of parking_lots
+# and users. Triggers keep them in step with every insert, update and delete,
+# whether it comes from the ORM or from raw SQL.
+INDEXES = {
+    'lots_fts': ('parking_lots', ('prime_location_name', 'address', 'pin_code')),
+    'users_fts': ('users', ('username', 'email', 'vehicle_number')),
+}
+
+
+def _schema(fts, table, columns):
+    cols = ', '.join(columns)
+    new_values = ', '.join(f'new.{c}' for c in columns)
+    old_values = ', '.join(f'old.{c}' for c in columns)
+    return [
+        f"CREATE VIRTUAL TABLE {fts} USING fts5({cols}, content='{table}', content_rowid='id', prefix='2 3')",
+        f"CREATE VIRTUAL TABLE {fts}_vocab USING fts5vocab({fts}, 'row')",
+        f"CREATE TRIGGER {fts}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_values}); END",
+        f"CREATE TRIGGER {fts}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_values}); END",
+        f"CREATE TRIGGER {fts}_au AFTER UPDATE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_values}); "
+        f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_values}); END",
+        f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+    ]
+
+
+def ensure_schema():
+    """Create missing FTS tables and triggers; returns False if FTS5 is unavailable."""
+    if db.engine.dialect.name != 'sqlite':
+        return False
+    try:
+        with db.engine.begin() as conn:
+            existing = {name for name, in conn.execute(
+                text("SELECT name FROM sqlite_master WHERE type = 'table'"))}
+            for fts, (table, columns) in INDEXES.items():
+                if fts not in existing:
+                    for statement in _schema(fts, table, columns):
+                        conn.execute(text(statement))
+    except OperationalError:
+        current_app.logger.warning("SQLite was built without FTS5; admin search falls back to LIKE")
+        return False
+    return True
+
+
+def enabled():
+    """Whether the FTS tables exist, checked on the first search when bootstrap ran elsewhere."""
+    fts = current_app.config.get('SEARCH_FTS')
+    if fts is None:
+        existing = {name for name, in db.session.execute(
+            text("SELECT name FROM sqlite_master WHERE type = 'table'"))} \
+            if db.engine.dialect.name == 'sqlite' else set()
+        fts = current_app.config['SEARCH_FTS'] = set(INDEXES) <= existing
+    return fts
+
+
+def rebuild():
+    with db.engine.begin() as conn:
+        for fts in INDEXES:
+            conn.execute(text(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')"))
+
+
+# ---------------------------- #
+#           Queries            #
+# ---------------------------- #
+def _tokens(query):
+    return re.findall(r'\w+', query.lower())[:8]
+
+
+def _corrections(fts, token, limit=3):
+    """Vocabulary terms close to ``token`` that share its first two characters."""
+    if len(token) < 4:
+        return []
+    candidates = [term for term, in db.session.execute(
+        text(f"SELECT term FROM {fts}_vocab WHERE term >= :lo AND term < :hi "
+             f"AND length(term) BETWEEN :shortest AND :longest LIMIT 5000"),
+        {'lo': token[:2], 'hi': token[:2] + '\uffff',
+         'shortest': len(token) - 2, 'longest': len(token) + 2}
+    )]
+    return difflib.get_close_matches(token, candidates, n=limit, cutoff=0.75)
+
+
+def _match(fts, match_expr, limit):
+    # Rank within a bounded window of matches so a very common prefix cannot
+    # make a keystroke score every row in the table.
+    window = current_app.config['SEARCH_RANK_WINDOW']
+    return [rowid for rowid, in db.session.execute(
+        text(f"SELECT rowid FROM (SELECT rowid, rank FROM {fts} WHERE {fts} MATCH :q LIMIT :window) "
+             f"ORDER BY rank LIMIT :limit"),
+        {'q': match_expr, 'window': window, 'limit': limit}
+    )]
+
+
+def _search_ids(fts, query, limit):
+    tokens = _tokens(query)
+    if not tokens:
+        return []
+    # Every token must match; each one may be the start of a longer word
+    ids = _match(fts, ' AND '.join(f'"{t}"*' for t in tokens), limit)
+    if ids:
+        return ids
+
+    # Nothing matched: allow each token to be a near miss of an indexed word
+    groups = []
+    for token in tokens:
+        alternatives = [f'"{t}"' for t in _corrections(fts, token)] + [f'"{token}"*']
+        groups.append('(' + ' OR '.join(alternatives) + ')')
+    return _match(fts, ' AND '.join(groups), limit)
+
+
+def _load_in_order(model, ids):
+    rows = {row.id: row for row in model.query.filter(model.id.in_(ids))}
+    return [rows[i] for i in ids if i in rows]
+
+
+def search_lots(query, limit=None):
+    limit = limit or current_app.config['SEARCH_LIMIT']
+    if not enabled():
+        return ParkingLot.query.filter(
+            ParkingLot.prime_location_name.ilike(f"%{query}%")
+        ).limit(limit).all()
+    return _load_in_order(ParkingLot, _search_ids('lots_fts', query, limit))
+
+
+def search_users(query, limit=None):
+    limit = limit or current_app.config['SEARCH_LIMIT']
+    if not enabled():
+        return User.query.filter(
+            (User.username.ilike(f"%{query}%")) |
+            (User.email.ilike(f"%{query}%"))
+        ).limit(limit).all()
+    return _load_in_order(User, _search_ids('users_fts', query, limit))
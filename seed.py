@@ -0,0 +1,305 @@
+import math
+import random
+import time
+from datetime import datetime, timedelta
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import text
+
+from models import db, normalize_plate, ParkingSpot, Reservation
+import migrations
+import rollups
+import search
+import user_stats
+from versions import versions
+
+
+# ---------------------------- #
+#      Shape of the Data       #
+# ---------------------------- #
+# Share of arrivals per hour of the day: a morning commute peak, a lunch
+# bump and a longer evening peak, with little traffic overnight.
+HOUR_WEIGHTS = [
+    0.3, 0.2, 0.1, 0.1, 0.2, 0.6, 1.8, 4.5, 7.5, 8.0, 6.0, 5.0,
+    5.5, 5.0, 4.5, 4.5, 5.5, 7.0, 7.5, 6.5, 4.5, 3.0, 1.6, 0.8,
+]
+# Weekends (Saturday, Sunday) see fewer commuters
+WEEKDAY_WEIGHTS = [1.0, 1.0, 1.0, 1.0, 1.05, 0.75, 0.6]
+# Stays are log-normal around ~1.5 hours, clipped to 10 minutes .. 1 day
+STAY_MEDIAN_MINUTES = 90
+STAY_SIGMA = 0.8
+STAY_MIN_SECONDS = 10 * 60
+STAY_MAX_SECONDS = 24 * 3600
+# Minimum time a spot stays empty between two cars
+TURNOVER_SECONDS = 5 * 60
+
+PRICE_TIERS = [20, 30, 40, 50, 60, 80, 100]
+CITIES = [
+    ('Mumbai', '400', ['Gateway of India', 'Bandra Kurla Complex', 'Andheri Station', 'Marine Drive', 'Lower Parel']),
+    ('Delhi', '110', ['Connaught Place', 'Karol Bagh', 'Saket Mall', 'Qutub Minar', 'Chandni Chowk']),
+    ('Chennai', '600', ['T Nagar', 'Marina Beach', 'Guindy', 'Anna Nagar', 'Velachery']),
+    ('Bengaluru', '560', ['MG Road', 'Koramangala', 'Whitefield', 'Indiranagar', 'Electronic City']),
+    ('Kolkata', '700', ['Park Street', 'Salt Lake', 'Howrah Station', 'New Market', 'Esplanade']),
+    ('Hyderabad', '500', ['HITEC City', 'Charminar', 'Banjara Hills', 'Secunderabad', 'Gachibowli']),
+    ('Pune', '411', ['Shivajinagar', 'Hinjewadi', 'Koregaon Park', 'Swargate', 'Viman Nagar']),
+]
+STATE_CODES = ['MH', 'DL', 'TN', 'KA', 'WB', 'TS', 'GJ', 'RJ', 'UP', 'KL']
+FIRST_NAMES = ['arjun', 'priya', 'rahul', 'sneha', 'vikram', 'ananya', 'rohan', 'kavya', 'aditya', 'meera',
+               'karthik', 'divya', 'sanjay', 'pooja', 'nikhil', 'lakshmi', 'amit', 'neha', 'suresh', 'isha']
+
+CHUNK_SIZE = 50000
+
+
+def _timestamp(epoch_day_prefix, seconds_of_day):
+    hours, rest = divmod(seconds_of_day, 3600)
+    minutes, seconds = divmod(rest, 60)
+    # Same text layout SQLAlchemy's DateTime writes, so values sort correctly
+    return f"{epoch_day_prefix} {hours:02d}:{minutes:02d}:{seconds:02d}.000000"
+
+
+# ---------------------------- #
+#          Generators          #
+# ---------------------------- #
+def _users(rng, first_id, count):
+    for user_id in range(first_id, first_id + count):
+        city, pin_prefix, _ = CITIES[user_id % len(CITIES)]
+        plate = (f"{rng.choice(STATE_CODES)}{rng.randrange(1, 100):02d}"
+                 f"{chr(65 + rng.randrange(26))}{chr(65 + rng.randrange(26))}{rng.randrange(10000):04d}")
+        yield (user_id, f"{rng.choice(FIRST_NAMES)}{user_id}", 'password', f"user{user_id}@example.com",
+               'user', plate, f"{pin_prefix}{rng.randrange(1000):03d}")
+
+
+def _lots(rng, first_id, count, spots_per_lot):
+    """Lots with a popularity weight each; busier lots charge more."""
+    lots = []
+    for lot_id in range(first_id, first_id + count):
+        city, pin_prefix, landmarks = CITIES[lot_id % len(CITIES)]
+        popularity = rng.lognormvariate(0, 0.6)
+        tier = min(len(PRICE_TIERS) - 1, max(0, int(popularity * 3 + rng.uniform(-1, 1))))
+        lots.append({
+            'id': lot_id,
+            'name': f"{rng.choice(landmarks)}, {city} #{lot_id}",
+            'address': f"{rng.randrange(1, 400)} {rng.choice(landmarks)} Road, {city}",
+            'pin_code': f"{pin_prefix}{rng.randrange(1000):03d}",
+            'price': PRICE_TIERS[tier],
+            'spots': max(1, int(spots_per_lot * rng.uniform(0.5, 1.5))),
+            'popularity': popularity,
+        })
+    return lots
+
+
+def _day_weights(start, days):
+    # Weekday pattern plus gentle growth, so later months earn a bit more
+    return [WEEKDAY_WEIGHTS[(start + timedelta(days=d)).weekday()] * (0.8 + 0.4 * d / max(days, 1))
+            for d in range(days)]
+
+
+def _spot_reservations(rng, quota, day_cum, hour_cum, end):
+    """Yield ``(arrival, leaving or None, seconds)`` for one spot, in time order.
+
+    Times are seconds from the start of the window, which closes at ``end``.
+
+    Arrivals follow the day and hour weights; a car that would arrive while
+    the spot is still taken waits for it to turn over, so stays never overlap.
+    """
+    days = rng.choices(range(len(day_cum)), cum_weights=day_cum, k=quota)
+    hours = rng.choices(range(24), cum_weights=hour_cum, k=quota)
+    arrivals = sorted(d * 86400 + h * 3600 + rng.randrange(3600) for d, h in zip(days, hours))
+
+    free_at = 0
+    mu = math.log(STAY_MEDIAN_MINUTES * 60)
+    for arrival in arrivals:
+        arrival = max(arrival, free_at)
+        if arrival >= end:
+            return
+        stay = int(min(STAY_MAX_SECONDS, max(STAY_MIN_SECONDS, rng.lognormvariate(mu, STAY_SIGMA))))
+        leaving = arrival + stay
+        free_at = leaving + TURNOVER_SECONDS
+        if leaving > end:
+            # Still parked: the spot is occupied and the stay is open
+            yield arrival, None, stay
+            return
+        yield arrival, leaving, stay
+
+
+def _day_prefixes(start, days):
+    return [(start + timedelta(days=d)).strftime('%Y-%m-%d') for d in range(days + 2)]
+
+
+# ---------------------------- #
+#         Bulk Loading         #
+# ---------------------------- #
+def _next_id(cursor, table):
+    return (cursor.execute(f"SELECT coalesce(max(id), 0) FROM {table}").fetchone()[0]) + 1
+
+
+def _insert(cursor, sql, rows):
+    """executemany in fixed-size chunks so memory stays flat at any row count."""
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= CHUNK_SIZE:
+            cursor.executemany(sql, chunk)
+            chunk.clear()
+    if chunk:
+        cursor.executemany(sql, chunk)
+
+
+def generate(users=10000, lots=50, spots_per_lot=100, reservations=1000000, days=365,
+             end=None, seed=None, echo=print):
+    """Bulk-load synthetic users, lots, spots and reservations.
+
+    Rows are appended after whatever the database already holds. Reservation
+    indexes are dropped during the load and rebuilt once at the end, then the
+    rollups and per-user stats are rebuilt so every page shows the new data;
+    the search indexes follow along through their triggers. Returns the row
+    counts loaded.
+    """
+    rng = random.Random(seed)
+    end = end or datetime.utcnow().replace(microsecond=0)
+    start = (end - timedelta(days=days)).replace(hour=0, minute=0, second=0)
+    window = int((end - start).total_seconds())
+    days += 1  # the window runs up to now, part way through today
+    prefixes = _day_prefixes(start, days)
+
+    def day_prefix(offset):
+        return prefixes[offset // 86400]
+
+    hour_cum = [sum(HOUR_WEIGHTS[:h + 1]) for h in range(24)]
+    day_weights = _day_weights(start, days)
+    day_cum = [sum(day_weights[:d + 1]) for d in range(days)]
+
+    # Secondary indexes on reservations cost far more to maintain row by row
+    # than to build once; migrations.upgrade() puts them back afterwards.
+    for index in Reservation.__table__.indexes | ParkingSpot.__table__.indexes:
+        db.session.execute(text(f"DROP INDEX IF EXISTS {index.name}"))
+    db.session.commit()
+
+    raw = db.engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        cursor.execute('PRAGMA synchronous=OFF')
+        first_user = _next_id(cursor, 'users')
+        first_lot = _next_id(cursor, 'parking_lots')
+        first_spot = _next_id(cursor, 'parking_spots')
+        first_reservation = _next_id(cursor, 'reservations')
+
+        # Stays carry their user's plate, as bookings do
+        plates = []
+
+        def user_rows():
+            for row in _users(rng, first_user, users):
+                plates.append(normalize_plate(row[5]))
+                yield row
+
+        started = time.perf_counter()
+        _insert(cursor,
+                "INSERT INTO users (id, username, password, email, role, vehicle_number, pin_code) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                user_rows())
+        echo(f"users: {users:,} in {time.perf_counter() - started:.1f}s")
+
+        lot_rows = _lots(rng, first_lot, lots, spots_per_lot)
+        cursor.executemany(
+            "INSERT INTO parking_lots (id, prime_location_name, price_per_hour, address, pin_code, max_spots) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [(lot['id'], lot['name'], lot['price'], lot['address'], lot['pin_code'], lot['spots'])
+             for lot in lot_rows])
+
+        # Spot ids are assigned here so reservations can reference them directly
+        spots = []
+        spot_id = first_spot
+        for lot in lot_rows:
+            for n in range(1, lot['spots'] + 1):
+                spots.append((spot_id, lot, n))
+                spot_id += 1
+        demand = sum(lot['popularity'] for _, lot, _ in spots)
+
+        counts = {'users': users, 'lots': lots, 'spots': len(spots), 'reservations': 0, 'active': 0}
+        occupied = set()
+        parked_plates = set()
+
+        def reservation_rows():
+            reservation_id = first_reservation
+            quota_carry = 0.0
+            for spot_id, lot, _ in spots:
+                quota_carry += reservations * lot['popularity'] / demand
+                quota = int(quota_carry)
+                quota_carry -= quota
+                for arrival, leaving, stay in _spot_reservations(
+                        rng, quota, day_cum, hour_cum, window):
+                    user_id = first_user + min(users - 1, int(users * rng.random() ** 2))
+                    parked = _timestamp(day_prefix(arrival), arrival % 86400)
+                    if leaving is None:
+                        # A car is parked in one place at a time
+                        for _ in range(100):
+                            if plates[user_id - first_user] not in parked_plates:
+                                break
+                            user_id = first_user + rng.randrange(users)
+                        plate = plates[user_id - first_user]
+                        if plate in parked_plates:
+                            plate = None
+                        else:
+                            parked_plates.add(plate)
+                        occupied.add(spot_id)
+                        counts['active'] += 1
+                        yield reservation_id, spot_id, user_id, plate, parked, None, None
+                    else:
+                        cost = round(stay / 3600 * lot['price'], 2)
+                        yield (reservation_id, spot_id, user_id, plates[user_id - first_user], parked,
+                               _timestamp(day_prefix(leaving), leaving % 86400), cost)
+                    reservation_id += 1
+                    counts['reservations'] += 1
+                    if counts['reservations'] % 1000000 == 0:
+                        echo(f"reservations: {counts['reservations']:,} "
+                             f"({time.perf_counter() - started:.0f}s)")
+
+        started = time.perf_counter()
+        _insert(cursor,
+                "INSERT INTO parking_spots (id, lot_id, status, spot_label) VALUES (?, ?, ?, ?)",
+                ((spot_id, lot['id'], 'A', f"Spot-{n}") for spot_id, lot, n in spots))
+        _insert(cursor,
+                "INSERT INTO reservations (id, spot_id, user_id, vehicle_number, parking_timestamp, "
+                "leaving_timestamp, parking_cost) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                reservation_rows())
+        _insert(cursor, "UPDATE parking_spots SET status = 'O' WHERE id = ?",
+                ((spot_id,) for spot_id in sorted(occupied)))
+        raw.commit()
+        echo(f"reservations: {counts['reservations']:,} ({counts['active']:,} still parked) "
+             f"in {time.perf_counter() - started:.1f}s")
+    finally:
+        raw.close()
+
+    started = time.perf_counter()
+    migrations.upgrade()
+    echo(f"indexes rebuilt in {time.perf_counter() - started:.1f}s")
+
+    started = time.perf_counter()
+    rollups.rebuild()
+    user_stats.rebuild()
+    # Lot ids freed by deleted lots can come back; bump them so no page keeps the old lot
+    versions.bump(('users',), *(('lot', lot['id']) for lot in lot_rows))
+    db.session.commit()
+    search.ensure_schema()
+    echo(f"rollups and user stats rebuilt in {time.perf_counter() - started:.1f}s")
+    return counts
+
+
+# ---------------------------- #
+#         CLI Command          #
+# ---------------------------- #
+@click.command('seed', help="Bulk-load synthetic users, lots, spots and reservations.")
+@click.option('--users', type=int, default=10000, show_default=True)
+@click.option('--lots', type=int, default=50, show_default=True)
+@click.option('--spots-per-lot', type=int, default=100, show_default=True, help="Average; each lot varies ±50%.")
+@click.option('--reservations', type=int, default=1000000, show_default=True)
+@click.option('--days', type=int, default=365, show_default=True, help="History length, ending now.")
+@click.option('--seed', 'random_seed', type=int, default=None, help="Random seed, for repeatable data.")
+@with_appcontext
+def seed_command(users, lots, spots_per_lot, reservations, days, random_seed):
+    started = time.perf_counter()
+    counts = generate(users=users, lots=lots, spots_per_lot=spots_per_lot, reservations=reservations,
+                      days=days, seed=random_seed, echo=click.echo)
+    click.echo(f"Seeded {counts['users']:,} users, {counts['lots']:,} lots, {counts['spots']:,} spots and "
+               f"{counts['reservations']:,} reservations in {time.perf_counter() - started:.1f}s.")
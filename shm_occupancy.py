@@ -0,0 +1,327 @@
+"""Occupancy table shared by every worker process through a memory-mapped file.
+
+Used by the occupancy index when ``OCCUPANCY_BACKEND`` is ``'shared'``.
+The file holds, per lot, its available/occupied counters and one bit per
+spot (set while the spot is occupied), so memory stays at a bit per spot
+plus a few dozen bytes per lot:
+
+    header   magic, seq, lot count, run count, generation, size, source
+    lots     lot_id, seq, available, occupied, first run, run count
+    runs     first spot id, spot count, first bit    (spot ids are handed
+             out in contiguous blocks, so a lot has one run per resize)
+    bitmap
+
+Writers (one booking or release at a time, or a rebuild from the
+database) hold an exclusive ``flock`` on the file. Readers take no lock:
+each lot's counters sit behind a sequence counter the writer makes odd
+while it changes them, and the header's sequence counter does the same for
+rebuilds, so a reader retries the rare read that overlapped a write. A
+table left half-written by a crashed writer, or built from another
+database, raises ``StaleTable`` and is rebuilt from the database.
+
+Needs ``fcntl`` (Linux, macOS); the default in-memory backend does not.
+"""
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+MAGIC = b'PKOCC\x00\x00\x01'
+HEADER = struct.Struct('<8sIIIIQQQ')   # magic, seq, lots, runs, (pad), generation, size, source
+HEADER_SIZE = 64
+LOT = struct.Struct('<IIIIII')         # lot_id, seq, available, occupied, first_run, runs
+RUN = struct.Struct('<IIQ')            # first spot id, spots, first bit
+SEQ = struct.Struct('<I')
+GENERATION = struct.Struct('<Q')
+COUNTS = struct.Struct('<II')
+
+# A sequence counter still odd after this many retries is checked under
+# the writers' lock: if it is odd there too, its writer died mid-update
+SPIN_CHECK = 100
+SPIN_LIMIT = 10000
+
+
+# Bumped in forked children, whose inherited handle would share the parent's flock
+_forks = 0
+
+
+def _forked():
+    global _forks
+    _forks += 1
+
+
+os.register_at_fork(after_in_child=_forked)
+
+
+class StaleTable(Exception):
+    """The shared table is missing, half-written or out of step with the database."""
+
+
+def default_path(database_url, instance_path):
+    """Table file for a database: in ``/dev/shm`` where there is one, else the instance folder."""
+    key = hashlib.sha1(str(database_url).encode()).hexdigest()[:12]
+    directory = '/dev/shm' if os.path.isdir('/dev/shm') else instance_path
+    return os.path.join(directory, f'parking-occupancy-{key}')
+
+
+def _source(database_url):
+    return int.from_bytes(hashlib.sha1(str(database_url).encode()).digest()[:8], 'little')
+
+
+def _layout(rows):
+    """Lot entries, runs and bitmap for ``(lot_id, spot_id, status)`` rows ordered by lot and spot."""
+    lots, runs, bits = [], [], bytearray()
+    nbits = 0
+    for lot_id, spot_id, status in rows:
+        if not lots or lots[-1][0] != lot_id:
+            lots.append([lot_id, 0, 0, 0, len(runs), 0])
+        lot = lots[-1]
+        run = runs[-1] if lot[5] else None
+        if run is not None and run[0] + run[1] == spot_id:
+            run[1] += 1
+        else:
+            runs.append([spot_id, 1, nbits])
+            lot[5] += 1
+        if nbits % 8 == 0:
+            bits.append(0)
+        if status == 'A':
+            lot[2] += 1
+        else:
+            lot[3] += 1
+            bits[-1] |= 1 << (nbits % 8)
+        nbits += 1
+    return lots, runs, bytes(bits)
+
+
+class SharedOccupancy:
+    """One process's handle on the shared occupancy table at ``path``."""
+
+    def __init__(self, path, database_url):
+        if fcntl is None:
+            raise RuntimeError("OCCUPANCY_BACKEND = 'shared' needs fcntl, which this platform lacks")
+        self.path = path
+        self.source = _source(database_url)
+        self._fd = None
+        self._forks = None
+        self._map = None
+        self._generation = None
+        self._lots = {}
+        self._bitmap = 0
+        self._lock = threading.Lock()
+
+    # ---------- File ----------
+    def _open(self):
+        if self._fd is not None and self._forks == _forks:
+            return
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        self._forks = _forks
+        self._map = None
+        self._generation = None
+        if os.fstat(self._fd).st_size >= HEADER_SIZE:
+            self._remap()
+
+    def reopen_if_replaced(self):
+        """Follow the path to a new file if the table file was deleted or replaced."""
+        with self._lock:
+            if self._fd is None:
+                return
+            try:
+                replaced = os.stat(self.path).st_ino != os.fstat(self._fd).st_ino
+            except FileNotFoundError:
+                replaced = True
+            if replaced:
+                os.close(self._fd)
+                self._fd = None
+                self._open()
+
+    def _remap(self):
+        # Readers on other threads keep the old mapping until they finish
+        self._map = mmap.mmap(self._fd, os.fstat(self._fd).st_size)
+
+    @contextmanager
+    def _locked(self):
+        with self._lock:
+            self._open()
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _header(self, view):
+        magic, seq, lots, runs, _, generation, size, source = HEADER.unpack_from(view, 0)
+        if magic != MAGIC or source != self.source:
+            raise StaleTable(self.path)
+        return seq, lots, runs, generation, size
+
+    def _load_directory(self, view, lots, runs, generation):
+        run_base = HEADER_SIZE + lots * LOT.size
+        directory = {}
+        for n in range(lots):
+            offset = HEADER_SIZE + n * LOT.size
+            lot_id, _, _, _, first_run, count = LOT.unpack_from(view, offset)
+            directory[lot_id] = (offset, [RUN.unpack_from(view, run_base + (first_run + r) * RUN.size)
+                                          for r in range(count)])
+        self._lots = directory
+        self._bitmap = run_base + runs * RUN.size
+        self._generation = generation
+
+    def _sync(self):
+        """Writer side (under the file lock): follow a rebuild made by another process."""
+        if self._map is None:
+            if os.fstat(self._fd).st_size < HEADER_SIZE:
+                raise StaleTable(self.path)
+            self._remap()
+        seq, lots, runs, generation, size = self._header(self._map)
+        if seq & 1:
+            raise StaleTable(self.path)
+        if size > len(self._map):
+            self._remap()
+        if generation != self._generation:
+            self._load_directory(self._map, lots, runs, generation)
+
+    # ---------- Lock-free Reads ----------
+    def _read(self, read):
+        """Run ``read(view)`` against a table no rebuild changed in the meantime."""
+        for spins in range(SPIN_LIMIT):
+            view = self._map
+            if view is None or self._forks != _forks:
+                with self._locked():
+                    self._sync()
+                continue
+            seq = SEQ.unpack_from(view, 8)[0]
+            if seq & 1:
+                if spins > SPIN_CHECK:
+                    with self._locked():
+                        self._sync()
+                time.sleep(0)
+                continue
+            try:
+                # Sizes and the lot directory only change with the generation
+                if GENERATION.unpack_from(view, 24)[0] != self._generation:
+                    _, lots, runs, generation, size = self._header(view)
+                    if size > len(view):
+                        with self._lock:
+                            self._remap()
+                        continue
+                    self._load_directory(view, lots, runs, generation)
+                value = read(view)
+            except (struct.error, IndexError):
+                # Read across a rebuild in progress; the check below retries it
+                value = None
+            if SEQ.unpack_from(view, 8)[0] == seq and value is not None:
+                return value
+        raise StaleTable(self.path)
+
+    def _counts(self, view, offset):
+        for spins in range(SPIN_LIMIT):
+            seq = SEQ.unpack_from(view, offset + 4)[0]
+            if seq & 1:
+                if spins > SPIN_CHECK:
+                    with self._locked():
+                        if SEQ.unpack_from(view, offset + 4)[0] & 1:
+                            raise StaleTable(self.path)
+                time.sleep(0)
+                continue
+            counts = COUNTS.unpack_from(view, offset + 8)
+            if SEQ.unpack_from(view, offset + 4)[0] == seq:
+                return counts
+        raise StaleTable(self.path)
+
+    def get(self, lot_id):
+        """Return ``(available, occupied)`` for a lot (``(0, 0)`` if unknown)."""
+        def read(view):
+            entry = self._lots.get(lot_id)
+            return (0, 0) if entry is None else self._counts(view, entry[0])
+        return self._read(read)
+
+    def snapshot(self):
+        """Return ``{lot_id: (available, occupied)}`` for every lot."""
+        def read(view):
+            return {lot_id: self._counts(view, offset) for lot_id, (offset, _) in self._lots.items()}
+        return self._read(read)
+
+    # ---------- Writes ----------
+    def mark(self, lot_id, spot_id, occupied):
+        """Set a spot's bit and adjust its lot's counters.
+
+        Returns the lot's new ``(available, occupied)``, or ``None`` if the
+        spot already had that status (e.g. a rebuild that ran after the
+        commit already counted it), which keeps replays harmless.
+        """
+        with self._locked():
+            self._sync()
+            entry = self._lots.get(lot_id)
+            bit = None
+            if entry is not None:
+                for first, count, first_bit in entry[1]:
+                    if first <= spot_id < first + count:
+                        bit = first_bit + spot_id - first
+                        break
+            if bit is None:
+                raise StaleTable(f"{self.path}: no spot {spot_id} in lot {lot_id}")
+
+            view, offset = self._map, entry[0]
+            position, mask = self._bitmap + bit // 8, 1 << (bit % 8)
+            if bool(view[position] & mask) == occupied:
+                return None
+            seq = SEQ.unpack_from(view, offset + 4)[0]
+            available, taken = COUNTS.unpack_from(view, offset + 8)
+            change = 1 if occupied else -1
+            counts = (available - change, taken + change)
+            SEQ.pack_into(view, offset + 4, (seq + 1) & 0xFFFFFFFF)
+            view[position] ^= mask
+            COUNTS.pack_into(view, offset + 8, *counts)
+            SEQ.pack_into(view, offset + 4, (seq + 2) & 0xFFFFFFFF)
+            return counts
+
+    def rebuild(self, load_rows):
+        """Rewrite the table from ``load_rows()`` (``(lot_id, spot_id, status)`` by lot and spot).
+
+        The rows are read under the file lock, so no booking or release can
+        be applied to the table between the read and the write. Returns the
+        counts before (``None`` if there was no usable table) and after.
+        """
+        with self._locked():
+            try:
+                self._sync()
+                before = {lot_id: COUNTS.unpack_from(self._map, offset + 8)
+                          for lot_id, (offset, _) in self._lots.items()}
+                seq, _, _, generation, size = self._header(self._map)
+            except StaleTable:
+                before, seq, generation, size = None, 0, 0, 0
+
+            lots, runs, bitmap = _layout(load_rows())
+            needed = HEADER_SIZE + len(lots) * LOT.size + len(runs) * RUN.size + len(bitmap)
+            # Never shrink: other processes may still have the longer mapping
+            size = max(size, needed, os.fstat(self._fd).st_size)
+            if os.fstat(self._fd).st_size < size:
+                os.ftruncate(self._fd, size)
+            if self._map is None or len(self._map) < size:
+                self._remap()
+
+            view = self._map
+            # Odd while rewriting; a crashed rebuild left it odd already
+            seq = (seq + 2 if seq & 1 else seq + 1) & 0xFFFFFFFF
+            HEADER.pack_into(view, 0, MAGIC, seq, len(lots), len(runs), 0, generation, size, self.source)
+            offset = HEADER_SIZE
+            for lot in lots:
+                LOT.pack_into(view, offset, *lot)
+                offset += LOT.size
+            for run in runs:
+                RUN.pack_into(view, offset, *run)
+                offset += RUN.size
+            view[offset:offset + len(bitmap)] = bitmap
+            HEADER.pack_into(view, 0, MAGIC, (seq + 1) & 0xFFFFFFFF, len(lots), len(runs), 0,
+                             generation + 1, size, self.source)
+            self._load_directory(view, len(lots), len(runs), generation + 1)
+            after = {lot[0]: (lot[2], lot[3]) for lot in lots}
+        return before, after
@@ -0,0 +1,221 @@
+import queue
+import sqlite3
+import threading
+from concurrent.futures import Future
+from operator import itemgetter
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from models import db
+
+
+# ---------------------------- #
+#    SQLite Production Mode    #
+# ---------------------------- #
+def _apply_pragmas(dbapi_connection, connection_record):
+    pragmas = storage.pragmas
+    if not pragmas or not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    for pragma in pragmas:
+        cursor.execute(pragma)
+    cursor.close()
+
+
+def _begin(conn):
+    if not storage.pragmas or conn.dialect.name != 'sqlite':
+        return
+    dbapi_connection = conn.connection.driver_connection
+    if threading.current_thread() is not storage._writer:
+        # Request sessions keep pysqlite's implicit BEGIN before the first
+        # write, so their reads never pin a WAL snapshot that a later write
+        # would have to upgrade (which fails with SQLITE_BUSY, no retry).
+        dbapi_connection.isolation_level = ''
+        return
+    # The writer begins explicitly: pysqlite's implicit transactions would
+    # turn its first SAVEPOINT into a commit. BEGIN IMMEDIATE takes the write
+    # lock up front, so the batch waits on busy_timeout when another process
+    # is writing. Issued on the DBAPI connection to stay out of query counts.
+    dbapi_connection.isolation_level = None
+    dbapi_connection.execute('BEGIN IMMEDIATE')
+
+
+class Storage:
+    """Database tuning and a serialized write path, selected by ``STORAGE_MODE``.
+
+    In the default ``'simple'`` mode nothing changes: SQLite runs with its
+    stock settings and writes commit on the request's own session. The
+    ``'production'`` mode is meant for multi-threaded or multi-worker servers:
+
+    * every connection runs in WAL mode with ``synchronous=NORMAL``, a busy
+      timeout and a larger page cache and mmap window, so readers keep
+      reading while a booking commits;
+    * the connection pool is sized from ``DB_POOL_SIZE``/``DB_POOL_OVERFLOW``;
+    * writes submitted through :meth:`run_write` are executed by a single
+      writer thread, which groups whatever jobs are waiting into one
+      transaction (each job inside its own savepoint) and commits once.
+
+    Must be initialised before ``db.init_app`` so the engine picks up the
+    pool settings.
+    """
+
+    _listening = False
+
+    def __init__(self, app=None):
+        self.app = None
+        self.pragmas = []
+        self.queue_writes = False
+        self._jobs = None
+        self._writer = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('STORAGE_MODE', 'simple')
+        app.config.setdefault('SQLITE_BUSY_TIMEOUT_MS', 5000)
+        app.config.setdefault('SQLITE_CACHE_SIZE_KIB', 64 * 1024)
+        app.config.setdefault('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)
+        app.config.setdefault('DB_POOL_SIZE', 10)
+        app.config.setdefault('DB_POOL_OVERFLOW', 20)
+        app.config.setdefault('WRITE_QUEUE', app.config['STORAGE_MODE'] == 'production')
+        app.config.setdefault('WRITE_BATCH_SIZE', 64)
+        app.config.setdefault('WRITE_BATCH_WAIT_MS', 2)
+        app.config.setdefault('WRITE_TIMEOUT_SECONDS', 30)
+
+        mode = app.config['STORAGE_MODE']
+        if mode not in ('simple', 'production'):
+            raise ValueError(f"Unknown STORAGE_MODE {mode!r}; expected 'simple' or 'production'")
+
+        if mode == 'production':
+            busy_timeout = app.config['SQLITE_BUSY_TIMEOUT_MS']
+            self.pragmas = [
+                'PRAGMA journal_mode=WAL',
+                'PRAGMA synchronous=NORMAL',
+                f'PRAGMA busy_timeout={int(busy_timeout)}',
+                f"PRAGMA cache_size=-{int(app.config['SQLITE_CACHE_SIZE_KIB'])}",
+                f"PRAGMA mmap_size={int(app.config['SQLITE_MMAP_SIZE'])}",
+                'PRAGMA temp_store=MEMORY',
+            ]
+            options = app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {})
+            options.setdefault('pool_size', app.config['DB_POOL_SIZE'])
+            options.setdefault('max_overflow', app.config['DB_POOL_OVERFLOW'])
+            options.setdefault('pool_pre_ping', False)
+            options.setdefault('connect_args', {}).setdefault('timeout', busy_timeout / 1000)
+
+            if not Storage._listening:
+                event.listen(Engine, 'connect', _apply_pragmas)
+                event.listen(Engine, 'begin', _begin)
+                Storage._listening = True
+
+        self.queue_writes = bool(app.config['WRITE_QUEUE'])
+        self.app = app
+        app.extensions['storage'] = self
+
+    # ---------- Write Path ----------
+    def run_write(self, fn, *args):
+        """Run ``fn(*args)`` in a committed transaction and return its result.
+
+        ``fn`` must only touch ``db.session`` and take plain values rather than
+        ORM objects, since with the write queue it runs on the writer thread
+        in a session of its own. Post-commit work (in-memory indexes, flashes)
+        belongs to the caller, after this returns. Exceptions raised by ``fn``
+        or by the commit are re-raised here with nothing written.
+        """
+        if not self.queue_writes:
+            try:
+                result = fn(*args)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+            return result
+
+        # Hand the caller's connection back to the pool while it waits, so a
+        # burst of waiting requests cannot starve the writer of connections.
+        # Its objects are expired and reload with what the writer committed,
+        # just as after an inline commit.
+        db.session.commit()
+        future = Future()
+        self._ensure_writer()
+        self._jobs.put((fn, args, future))
+        return future.result(timeout=self.app.config['WRITE_TIMEOUT_SECONDS'])
+
+    def _ensure_writer(self):
+        # Started on first use rather than at import, so that servers which
+        # fork their workers get one writer per worker process.
+        with self._lock:
+            if self._jobs is None:
+                self._jobs = queue.Queue()
+            if self._writer is None or not self._writer.is_alive():
+                self._writer = threading.Thread(target=self._write_loop, name='db-writer', daemon=True)
+                self._writer.start()
+
+    def _next_batch(self):
+        batch = [self._jobs.get()]
+        size = self.app.config['WRITE_BATCH_SIZE']
+        wait = self.app.config['WRITE_BATCH_WAIT_MS'] / 1000
+        while len(batch) < size:
+            try:
+                batch.append(self._jobs.get(timeout=wait) if wait else self._jobs.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write_loop(self):
+        while True:
+            batch = self._next_batch()
+            try:
+                with self.app.app_context():
+                    self._write_batch(batch)
+            except Exception as exc:
+                self.app.logger.exception("Write batch failed")
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(exc)
+
+    @staticmethod
+    def _write_batch(batch):
+        done = []
+        for fn, args, future in batch:
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                # A savepoint per job: one failing booking rolls back alone
+                with db.session.begin_nested():
+                    result = fn(*args)
+            except Exception as exc:
+                future.set_exception(exc)
+            else:
+                done.append((future, result))
+
+        try:
+            db.session.commit()
+        except Exception as exc:
+            db.session.rollback()
+            for future, _ in done:
+                future.set_exception(exc)
+            return
+        for future, result in done:
+            future.set_result(result)
+
+
+storage = Storage()
+
+
+def executemany(statement, rows):
+    """Run ``statement`` once per parameter dict in ``rows``, in one DBAPI executemany.
+
+    The statement is compiled once and each row goes to the driver as a
+    plain tuple, skipping SQLAlchemy's per-row parameter processing; for
+    the tens of thousands of rows of a bulk job that is most of the cost.
+    Every row must carry every parameter (column defaults are not applied).
+    """
+    if not rows:
+        return
+    conn = db.session.connection()
+    compiled = statement.compile(dialect=conn.dialect, column_keys=list(rows[0]))
+    names = compiled.positiontup
+    values = itemgetter(*names) if len(names) > 1 else lambda row: (row[names[0]],)
+    conn.exec_driver_sql(compiled.string, [values(row) for row in rows])
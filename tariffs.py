@@ -0,0 +1,327 @@
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import Integer, bindparam, cast, delete, func, select, update
+
+from models import db, ArchivedReservation, LotTariff, ParkingLot, ParkingSpot, Reservation
+from storage import executemany, storage
+from versions import versions
+import rollups
+import user_stats
+
+
+MS_PER_MINUTE = 60_000
+MS_PER_HOUR = 3_600_000
+MS_PER_DAY = 86_400_000
+EPOCH = datetime(1970, 1, 1)
+EPOCH_JULIAN_DAY = 2440587.5
+
+# ``cost[k]`` is what the first ``minutes[k]`` minutes of a day cost; np.interp
+# between the hourly knots gives the cost up to any time of day.
+Schedule = namedtuple('Schedule', 'minutes cost full_day daily_cap grace_ms')
+
+# numpy is imported inside the functions that use it: it takes longer to
+# import than the rest of the app, and a worker needs it at its first release.
+
+
+def schedule(price_per_hour, peak_start_hour=None, peak_end_hour=None, peak_price_per_hour=None,
+             daily_cap=None, grace_minutes=0):
+    """Build the daily cost curve of a lot from its flat price and optional tariff."""
+    import numpy as np
+    rates = np.full(24, float(price_per_hour))
+    if None not in (peak_start_hour, peak_end_hour, peak_price_per_hour) and peak_start_hour != peak_end_hour:
+        hours = np.arange(peak_start_hour, peak_start_hour + (peak_end_hour - peak_start_hour) % 24) % 24
+        rates[hours] = peak_price_per_hour
+    cost = np.concatenate(([0.0], np.cumsum(rates)))
+    return Schedule(np.arange(25, dtype=np.float64) * 60, cost, cost[-1], np.inf if daily_cap is None else float(daily_cap),
+                    int(grace_minutes or 0) * MS_PER_MINUTE)
+
+
+def evaluate(sched, start_ms, end_ms):
+    """Unrounded costs of stays ``[start_ms, end_ms]`` (int64 ms since the epoch) under one schedule.
+
+    Each calendar day of a stay is charged along the curve and capped at the
+    daily cap on its own; stays no longer than the grace period are free.
+    """
+    import numpy as np
+    start_day, start_of_day = np.divmod(start_ms, MS_PER_DAY)
+    end_day, end_of_day = np.divmod(end_ms, MS_PER_DAY)
+    before_start = np.interp(start_of_day / MS_PER_MINUTE, sched.minutes, sched.cost)
+    before_end = np.interp(end_of_day / MS_PER_MINUTE, sched.minutes, sched.cost)
+    cap = sched.daily_cap
+
+    same_day = np.minimum(before_end - before_start, cap)
+    spanning = (np.minimum(sched.full_day - before_start, cap) + np.minimum(before_end, cap)
+                + (end_day - start_day - 1) * min(sched.full_day, cap))
+    cost = np.where(start_day == end_day, same_day, spanning)
+    return np.where(end_ms - start_ms <= sched.grace_ms, 0.0, cost)
+
+
+def price(schedules, lot_ids, start_ms, end_ms):
+    """Costs in rupees, rounded to paise, of stays in ``lot_ids``; NaN for unknown lots.
+
+    Rows are grouped by lot so each schedule is evaluated once over all of
+    its stays.
+    """
+    import numpy as np
+    costs = np.full(len(lot_ids), np.nan)
+    if not len(lot_ids):
+        return costs
+    order = np.argsort(lot_ids, kind='stable')
+    for group in np.split(order, np.flatnonzero(np.diff(lot_ids[order])) + 1):
+        sched = schedules.get(int(lot_ids[group[0]]))
+        if sched is not None:
+            costs[group] = evaluate(sched, start_ms[group], end_ms[group])
+    return np.round(costs, 2)
+
+
+def to_ms(timestamp):
+    return round((timestamp - EPOCH).total_seconds() * 1000)
+
+
+def _ms_column(column):
+    # Milliseconds since the epoch, computed by SQLite: no datetime parsing per row
+    return cast(func.round((func.julianday(column) - EPOCH_JULIAN_DAY) * MS_PER_DAY), Integer)
+
+
+# ---------------------------- #
+#        Tariff Schedules      #
+# ---------------------------- #
+class Tariffs:
+    """Every lot's cost curve, held in memory.
+
+    Loaded with one query over lots and their tariffs, rebuilt after
+    ``invalidate`` (called by the routes that add, edit or delete lots) or
+    every TARIFF_RELOAD_SECONDS, which is how a ``flask tariffs set`` reaches
+    a running server.
+    """
+
+    def __init__(self, app=None):
+        self._schedules = {}
+        self._lock = threading.Lock()
+        self._loaded_at = None
+        self.reload_interval = 300
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('TARIFF_RELOAD_SECONDS', 300)
+        app.config.setdefault('REBILL_BATCH_SIZE', 50000)
+        app.config.setdefault('REBILL_PAUSE_SECONDS', 0)
+        self.reload_interval = app.config['TARIFF_RELOAD_SECONDS']
+        app.extensions['tariffs'] = self
+
+    def _load(self):
+        rows = db.session.query(
+            ParkingLot.id, ParkingLot.price_per_hour, LotTariff.peak_start_hour, LotTariff.peak_end_hour,
+            LotTariff.peak_price_per_hour, LotTariff.daily_cap, LotTariff.grace_minutes,
+        ).outerjoin(LotTariff, LotTariff.lot_id == ParkingLot.id).all()
+        schedules = {row[0]: schedule(*row[1:]) for row in rows}
+        with self._lock:
+            self._schedules = schedules
+            self._loaded_at = time.monotonic()
+
+    def schedules(self):
+        loaded_at = self._loaded_at
+        if loaded_at is None or time.monotonic() - loaded_at > self.reload_interval:
+            self._load()
+        return self._schedules
+
+    def invalidate(self):
+        self._loaded_at = None
+
+    def quote(self, lot_id, parked_at, left_at):
+        """Cost of one stay, as the bulk re-billing would compute it."""
+        import numpy as np
+        schedules = self.schedules()
+        if lot_id not in schedules:
+            # A lot added by another process since the last load
+            self._load()
+            schedules = self._schedules
+        return float(price(schedules, np.array([lot_id]), np.array([to_ms(parked_at)]),
+                           np.array([to_ms(left_at)]))[0])
+
+    def drop_lot(self, lot_id):
+        """Delete the lot's tariff inside the current transaction."""
+        db.session.execute(delete(LotTariff).where(LotTariff.lot_id == lot_id))
+        self.invalidate()
+
+
+tariffs = Tariffs()
+
+
+# ---------------------------- #
+#         Re-billing           #
+# ---------------------------- #
+def _closed_stays(model, after_id, batch_size, lot_id=None, since=None):
+    if model is Reservation:
+        lot_column = ParkingSpot.lot_id
+        query = select(Reservation.id).join(ParkingSpot, ParkingSpot.id == Reservation.spot_id)
+    else:
+        lot_column = ArchivedReservation.lot_id
+        query = select(ArchivedReservation.id)
+    query = query.add_columns(
+        lot_column, model.user_id, _ms_column(model.parking_timestamp), _ms_column(model.leaving_timestamp),
+        model.parking_cost,
+    ).where(model.id > after_id, model.leaving_timestamp.isnot(None), model.parking_timestamp.isnot(None))
+    if lot_id is not None:
+        query = query.where(lot_column == lot_id)
+    if since is not None:
+        query = query.where(model.parking_timestamp >= since)
+    return query.order_by(model.id).limit(batch_size)
+
+
+def rebill_batch(model, schedules, after_id, batch_size, lot_id=None, since=None, dry_run=False):
+    """Re-price up to ``batch_size`` closed stays of ``model`` with ids above ``after_id``.
+
+    Costs that changed are written back with one executemany, and the
+    difference is added to the rollup and per-user totals so neither needs
+    a rebuild. Returns ``(last id, stays scanned, stays changed, revenue change)``.
+    """
+    import numpy as np
+    rows = db.session.connection().execute(_closed_stays(model, after_id, batch_size, lot_id, since)).all()
+    if not rows:
+        return after_id, 0, 0, 0.0
+    *columns, old = zip(*rows)
+    ids, lot_ids, user_ids, start_ms, end_ms = (np.array(column) for column in columns)
+    old = np.array(old, dtype=np.float64)  # NULL costs become NaN and always count as changed
+
+    new = price(schedules, lot_ids, start_ms, end_ms)
+    changed = ~np.isnan(new) & ~(np.abs(new - old) < 0.005)
+    delta = new[changed] - np.nan_to_num(old[changed])
+    if changed.any() and not dry_run:
+        table = model.__table__
+        executemany(
+            update(table).where(table.c.id == bindparam('reservation_id')).values(parking_cost=bindparam('cost')),
+            [{'reservation_id': i, 'cost': c} for i, c in zip(ids[changed].tolist(), new[changed].tolist())]
+        )
+        _apply_deltas(lot_ids[changed], user_ids[changed], start_ms[changed], delta)
+        versions.bump(('users',))
+    return int(ids[-1]), len(rows), int(changed.sum()), float(delta.sum())
+
+
+def _apply_deltas(lot_ids, user_ids, start_ms, delta):
+    import numpy as np
+    # Rollup revenue is bucketed by check-in hour, as rollups.record_release does
+    buckets, where = np.unique(np.stack([lot_ids, start_ms // MS_PER_HOUR]), axis=1, return_inverse=True)
+    revenue = np.bincount(where.ravel(), weights=delta)
+    hours = buckets[1].astype('datetime64[h]').astype(datetime)
+    rollups.record_many((lot, hour, 0, amount)
+                        for lot, hour, amount in zip(buckets[0].tolist(), hours, revenue.tolist()))
+
+    users, where = np.unique(user_ids, return_inverse=True)
+    costs = np.bincount(where.ravel(), weights=delta)
+    user_stats.record_cost_changes(zip(users.tolist(), costs.tolist()))
+
+
+def rebill(lot_id=None, since=None, batch_size=None, pause=None, dry_run=False):
+    """Re-price every closed stay (hot and archived) with the current tariffs.
+
+    Each batch is a write job of its own, so with the write queue bookings
+    keep flowing between batches. Returns ``(scanned, changed, revenue change)``.
+    """
+    config = current_app.config
+    batch_size = batch_size or config['REBILL_BATCH_SIZE']
+    pause = config['REBILL_PAUSE_SECONDS'] if pause is None else pause
+    tariffs.invalidate()
+    schedules = tariffs.schedules()
+
+    scanned = changed = 0
+    revenue = 0.0
+    for model in (Reservation, ArchivedReservation):
+        after_id = 0
+        while True:
+            args = (model, schedules, after_id, batch_size, lot_id, since, dry_run)
+            after_id, count, moved, delta = rebill_batch(*args) if dry_run else storage.run_write(rebill_batch, *args)
+            scanned += count
+            changed += moved
+            revenue += delta
+            if count < batch_size:
+                break
+            if pause:
+                time.sleep(pause)
+    return scanned, changed, revenue
+
+
+# ---------------------------- #
+#         CLI Commands         #
+# ---------------------------- #
+tariffs_cli = AppGroup('tariffs', help="Time-of-day tariffs and re-billing.")
+
+
+def _hours(value):
+    if value is None:
+        return None, None
+    try:
+        start, end = (int(part) for part in value.split('-'))
+    except ValueError:
+        raise click.BadParameter("expected START-END hours, e.g. 8-20") from None
+    if not (0 <= start < 24 and 0 <= end < 24):
+        raise click.BadParameter("hours must be between 0 and 23")
+    return start, end
+
+
+@tariffs_cli.command('set')
+@click.argument('lot_id', type=int)
+@click.option('--peak', default=None, help="Peak hours as START-END, e.g. 8-20 or 22-6.")
+@click.option('--peak-price', type=float, default=None, help="Price per hour during peak hours.")
+@click.option('--daily-cap', type=float, default=None, help="Most charged per calendar day.")
+@click.option('--grace', 'grace_minutes', type=int, default=0, help="Stays up to this many minutes are free.")
+def set_command(lot_id, peak, peak_price, daily_cap, grace_minutes):
+    if db.session.get(ParkingLot, lot_id) is None:
+        raise click.BadParameter(f"no lot {lot_id}", param_hint='LOT_ID')
+    start, end = _hours(peak)
+    if (start is None) != (peak_price is None):
+        raise click.UsageError("--peak and --peak-price go together")
+    tariff = db.session.get(LotTariff, lot_id) or LotTariff(lot_id=lot_id)
+    tariff.peak_start_hour, tariff.peak_end_hour, tariff.peak_price_per_hour = start, end, peak_price
+    tariff.daily_cap = daily_cap
+    tariff.grace_minutes = grace_minutes
+    db.session.add(tariff)
+    db.session.commit()
+    click.echo(f"Tariff saved for lot {lot_id}; run 'flask tariffs rebill --lot {lot_id}' to re-price past stays.")
+
+
+@tariffs_cli.command('clear')
+@click.argument('lot_id', type=int)
+def clear_command(lot_id):
+    tariffs.drop_lot(lot_id)
+    db.session.commit()
+    click.echo(f"Lot {lot_id} is back to its flat hourly price.")
+
+
+@tariffs_cli.command('show')
+def show_command():
+    rows = db.session.query(ParkingLot, LotTariff).outerjoin(LotTariff, LotTariff.lot_id == ParkingLot.id) \
+        .order_by(ParkingLot.id)
+    for lot, tariff in rows:
+        line = f"lot {lot.id} {lot.prime_location_name}: {lot.price_per_hour:.2f}/h"
+        if tariff is not None:
+            if tariff.peak_price_per_hour is not None:
+                line += (f", {tariff.peak_price_per_hour:.2f}/h from {tariff.peak_start_hour:02d}:00"
+                         f" to {tariff.peak_end_hour:02d}:00")
+            if tariff.daily_cap is not None:
+                line += f", capped at {tariff.daily_cap:.2f}/day"
+            if tariff.grace_minutes:
+                line += f", first {tariff.grace_minutes} min free"
+        click.echo(line)
+
+
+@tariffs_cli.command('rebill')
+@click.option('--lot', 'lot_id', type=int, default=None, help="Only re-bill this lot.")
+@click.option('--since', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+              help="Only stays checked in on or after this date.")
+@click.option('--batch-size', type=int, default=None, help="Reservations re-priced per transaction.")
+@click.option('--pause', type=float, default=None, help="Seconds to wait between batches.")
+@click.option('--dry-run', is_flag=True, help="Count what would change without writing.")
+def rebill_command(lot_id, since, batch_size, pause, dry_run):
+    started = time.perf_counter()
+    scanned, changed, revenue = rebill(lot_id, since, batch_size, pause, dry_run)
+    verb = "Would change" if dry_run else "Changed"
+    click.echo(f"Re-priced {scanned:,} stay(s) in {time.perf_counter() - started:.1f}s. "
+               f"{verb} {changed:,} cost(s), revenue {revenue:+,.2f}.")
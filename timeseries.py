@@ -0,0 +1,601 @@
+import atexit
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import Integer, cast, func, or_, select, union_all
+
+import api
+from models import db, ArchivedReservation, ParkingSpot, Reservation
+from occupancy import occupancy
+from pincodes import pincodes
+
+try:
+    import fcntl
+except ImportError:  # Windows: one process, always the sampler
+    fcntl = None
+
+# numpy is imported inside the functions that use it, as in tariffs.py
+
+EPOCH = datetime(1970, 1, 1)
+EPOCH_JULIAN_DAY = 2440587.5
+RESOLUTIONS = {'minute': 60, 'hour': 3600, 'day': 86400}
+# An hour rolls up 60 minutes and a day 24 hours, so keep at least those
+MIN_SLOTS = {'minute': 60, 'hour': 24, 'day': 1}
+# Finest resolution picked for a range keeps it under this many points
+AUTO_POINTS = 2000
+MAX_POINTS = 50000
+
+
+def to_epoch(timestamp):
+    """Seconds since the epoch of a naive UTC datetime, as stored in the database."""
+    return (timestamp - EPOCH).total_seconds()
+
+
+def from_epoch(seconds):
+    return EPOCH + timedelta(seconds=seconds)
+
+
+def _mean(values, axis):
+    """Mean over ``axis`` ignoring NaN, NaN where a slice has no values (without warning)."""
+    import numpy as np
+    counts = np.sum(~np.isnan(values), axis=axis)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (np.nansum(values, axis=axis) / counts).astype(np.float32)
+
+
+# ---------------------------- #
+#         Ring Buffers         #
+# ---------------------------- #
+class Ring:
+    """One resolution of the history: ``slots`` columns of ``step`` seconds per lot row.
+
+    Column ``i % slots`` holds step ``i`` (seconds since the epoch divided
+    by ``step``) when ``stamps`` says so; any other step in the window is a
+    gap, read as NaN. Values are mean occupied spots and mean spots over
+    the step, as float32.
+    """
+
+    def __init__(self, step, slots, rows=0):
+        import numpy as np
+        self.step = step
+        self.slots = slots
+        self.stamps = np.full(slots, -1, dtype=np.int64)
+        self.occupied = np.full((rows, slots), np.nan, dtype=np.float32)
+        self.spots = np.full((rows, slots), np.nan, dtype=np.float32)
+
+    def grow(self, rows):
+        import numpy as np
+        extra = rows - len(self.occupied)
+        if extra > 0:
+            self.occupied = np.vstack([self.occupied, np.full((extra, self.slots), np.nan, dtype=np.float32)])
+            self.spots = np.vstack([self.spots, np.full((extra, self.slots), np.nan, dtype=np.float32)])
+
+    def columns(self, first, last):
+        """Columns of steps ``first..last`` and which of them hold those steps."""
+        import numpy as np
+        indexes = np.arange(first, last + 1)
+        columns = indexes % self.slots
+        return columns, self.stamps[columns] == indexes
+
+    def put(self, index, occupied, spots):
+        column = index % self.slots
+        self.stamps[column] = index
+        self.occupied[:, column] = occupied
+        self.spots[:, column] = spots
+
+    def mean(self, first, last):
+        """Per-row means over steps ``first..last``, ignoring gaps."""
+        columns, valid = self.columns(first, last)
+        columns = columns[valid]
+        return _mean(self.occupied[:, columns], 1), _mean(self.spots[:, columns], 1)
+
+    def read(self, rows, first, last):
+        """``rows × steps`` arrays of occupied and spots for steps ``first..last``, NaN in gaps."""
+        import numpy as np
+        columns, valid = self.columns(first, last)
+        occupied = self.occupied[np.ix_(rows, columns)]
+        spots = self.spots[np.ix_(rows, columns)]
+        occupied[:, ~valid] = np.nan
+        spots[:, ~valid] = np.nan
+        return occupied, spots
+
+    def relaid(self, slots, rows):
+        """This ring with ``slots`` columns, keeping the newest steps that fit."""
+        import numpy as np
+        ring = Ring(self.step, slots, rows)
+        held = np.flatnonzero(self.stamps >= 0)
+        held = held[np.argsort(self.stamps[held])][-slots:]
+        columns = self.stamps[held] % slots
+        ring.stamps[columns] = self.stamps[held]
+        ring.occupied[:len(self.occupied), columns] = self.occupied[:, held]
+        ring.spots[:len(self.spots), columns] = self.spots[:, held]
+        return ring
+
+
+# ---------------------------- #
+#     Utilization History      #
+# ---------------------------- #
+class UtilizationHistory:
+    """Per-lot occupancy over time, sampled from the occupancy index.
+
+    A sampler thread, started by the first request, records every lot's
+    occupied and total spots each ``UTILIZATION_SAMPLE_SECONDS`` into a
+    minute ring and rolls it up into hour and day rings on the spot, each
+    kept for ``UTILIZATION_RETENTION_DAYS``. The rings are saved to
+    ``UTILIZATION_PATH`` (``instance/utilization.npz``) every
+    ``UTILIZATION_PERSIST_SECONDS`` and loaded back on start, so history
+    survives restarts. With several worker processes only the one holding
+    the file's lock samples; the others read the saved file. Run them with
+    the shared occupancy backend so the sampler sees every worker's
+    bookings.
+
+    Range queries read the rings only: how full a lot was last month costs
+    the same however many reservations it had.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._lock = threading.Lock()
+        self._rows = {}
+        self._rings = None
+        self._pending = None
+        self._thread = None
+        self._leader = None
+        self._loaded_mtime = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('UTILIZATION_SAMPLING', True)
+        app.config.setdefault('UTILIZATION_SAMPLE_SECONDS', 60)
+        app.config.setdefault('UTILIZATION_PERSIST_SECONDS', 300)
+        app.config.setdefault('UTILIZATION_RETENTION_DAYS', {'minute': 2, 'hour': 100, 'day': 3660})
+        app.config.setdefault('UTILIZATION_PATH', None)
+        app.config.setdefault('UTILIZATION_CHART_LOTS', 5)
+        self.app = app
+        if app.config['UTILIZATION_SAMPLING']:
+            app.before_request(self._ensure_sampling)
+        app.extensions['utilization'] = self
+
+    @property
+    def path(self):
+        return self.app.config['UTILIZATION_PATH'] or os.path.join(self.app.instance_path, 'utilization.npz')
+
+    def _slots(self):
+        retention = self.app.config['UTILIZATION_RETENTION_DAYS']
+        return {name: max(int(retention[name] * 86400 // step), MIN_SLOTS[name])
+                for name, step in RESOLUTIONS.items()}
+
+    # ---------- Storage ----------
+    def _ensure_rings(self):
+        if self._rings is None:
+            slots = self._slots()
+            self._rings = {name: Ring(step, slots[name]) for name, step in RESOLUTIONS.items()}
+
+    def _row(self, lot_id):
+        row = self._rows.get(lot_id)
+        if row is None:
+            row = self._rows[lot_id] = len(self._rows)
+            for ring in self._rings.values():
+                ring.grow(len(self._rows))
+        return row
+
+    def save(self):
+        """Write the rings to ``path`` (atomically: a reader never sees half a file)."""
+        import numpy as np
+        with self._lock:
+            if self._rings is None:
+                return
+            arrays = {'lot_ids': np.array(sorted(self._rows, key=self._rows.get), dtype=np.int64)}
+            for name, ring in self._rings.items():
+                arrays[f'{name}_stamps'] = ring.stamps.copy()
+                arrays[f'{name}_occupied'] = ring.occupied.copy()
+                arrays[f'{name}_spots'] = ring.spots.copy()
+        directory = os.path.dirname(self.path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        fd, temporary = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as file:
+            np.savez(file, **arrays)
+        os.replace(temporary, self.path)
+
+    def load(self):
+        """Replace the rings with the saved file, if there is one; returns whether there was."""
+        import numpy as np
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+            saved = np.load(self.path)
+        except FileNotFoundError:
+            return False
+        with saved, self._lock:
+            lot_ids = saved['lot_ids'].tolist()
+            rings = {}
+            for name, step in RESOLUTIONS.items():
+                slots = self._slots()[name]
+                ring = Ring(step, len(saved[f'{name}_stamps']))
+                ring.stamps = saved[f'{name}_stamps']
+                ring.occupied = saved[f'{name}_occupied']
+                ring.spots = saved[f'{name}_spots']
+                # Retention may have changed since the file was written
+                rings[name] = ring if ring.slots == slots else ring.relaid(slots, len(lot_ids))
+            self._rows = {lot_id: row for row, lot_id in enumerate(lot_ids)}
+            self._rings = rings
+            self._pending = None
+            self._loaded_mtime = mtime
+        return True
+
+    def _refresh(self):
+        # Workers that do not sample follow the sampler through its file
+        if self._leader is not None:
+            return
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime != self._loaded_mtime:
+            self.load()
+
+    # ---------- Sampling ----------
+    def _lead(self):
+        """Take the sampler's lock if it is free; the first success also loads the history."""
+        if self._leader is not None:
+            return True
+        if fcntl is not None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            fd = os.open(self.path + '.lock', os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                return False
+            self._leader = fd
+        else:
+            self._leader = True
+        self.load()
+        # Keep the samples since the last periodic save when the process exits
+        atexit.register(self.save)
+        return True
+
+    def _ensure_sampling(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='utilization-sampler', daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        interval = self.app.config['UTILIZATION_SAMPLE_SECONDS']
+        persist = self.app.config['UTILIZATION_PERSIST_SECONDS']
+        saved_at = time.monotonic()
+        while True:
+            # On the interval's wall-clock boundaries, so samples line up across
+            # restarts (and the first does not compete with starting up)
+            time.sleep(interval - time.time() % interval)
+            try:
+                with self.app.app_context():
+                    if self._lead():
+                        self.sample()
+                        if time.monotonic() - saved_at >= persist:
+                            self.save()
+                            saved_at = time.monotonic()
+            except Exception:
+                self.app.logger.exception("Utilization sample failed")
+
+    def sample(self, at=None):
+        """Record every lot's occupancy now (or at ``at``, seconds since the epoch)."""
+        import numpy as np
+        at = time.time() if at is None else at
+        counts = occupancy.snapshot()
+        minute = int(at // RESOLUTIONS['minute'])
+        with self._lock:
+            self._ensure_rings()
+            for lot_id in counts:
+                self._row(lot_id)
+            occupied = np.full(len(self._rows), np.nan, dtype=np.float32)
+            spots = np.full(len(self._rows), np.nan, dtype=np.float32)
+            for lot_id, (available, taken) in counts.items():
+                occupied[self._rows[lot_id]] = taken
+                spots[self._rows[lot_id]] = available + taken
+
+            # Several samples in a minute are averaged into it
+            pending = self._pending
+            if pending is None or pending[0] != minute or len(pending[1]) != len(occupied):
+                pending = self._pending = [minute, np.zeros_like(occupied), np.zeros_like(spots), 0]
+            pending[1] += occupied
+            pending[2] += spots
+            pending[3] += 1
+            self._rings['minute'].put(minute, pending[1] / pending[3], pending[2] / pending[3])
+
+            # Roll the minute up into its hour and day, so the open ones read too
+            hour = minute // 60
+            self._rings['hour'].put(hour, *self._rings['minute'].mean(hour * 60, hour * 60 + 59))
+            day = hour // 24
+            self._rings['day'].put(day, *self._rings['hour'].mean(day * 24, day * 24 + 23))
+
+    # ---------- Queries ----------
+    def _pick(self, first_second, last_second, now):
+        for name, step in RESOLUTIONS.items():
+            points = last_second // step - first_second // step + 1
+            oldest = now // step - self._rings[name].slots + 1
+            if points <= AUTO_POINTS and first_second // step >= oldest:
+                return name
+        return 'day'
+
+    def _window(self, lot_ids, start, end, resolution):
+        import numpy as np
+        self._refresh()
+        first_second, last_second = int(to_epoch(start)), int(to_epoch(end))
+        if last_second < first_second:
+            raise ValueError("end is before start")
+        with self._lock:
+            self._ensure_rings()
+            resolution = resolution or self._pick(first_second, last_second, int(time.time()))
+            step = RESOLUTIONS[resolution]
+            first, last = first_second // step, last_second // step
+            if last - first + 1 > MAX_POINTS:
+                raise ValueError(f"more than {MAX_POINTS} points; use a coarser resolution")
+            # Lots never sampled read as gaps
+            shape = (len(lot_ids), last - first + 1)
+            occupied, spots = np.full(shape, np.nan, np.float32), np.full(shape, np.nan, np.float32)
+            where = [n for n, lot_id in enumerate(lot_ids) if lot_id in self._rows]
+            rows = [self._rows[lot_ids[n]] for n in where]
+            occupied[where], spots[where] = self._rings[resolution].read(rows, first, last)
+        return resolution, first, last, occupied, spots
+
+    def series(self, lot_ids, start, end, resolution=None):
+        """Occupancy of ``lot_ids`` between ``start`` and ``end`` (naive UTC datetimes).
+
+        Returns ``(resolution, times, occupied, spots)``: the start of each
+        step, and ``len(lot_ids) × len(times)`` arrays of mean occupied spots
+        and spots, NaN where nothing was sampled (a lot that did not exist
+        yet, no sampler running, or older than that resolution keeps).
+        ``resolution`` defaults to the finest that keeps the range under
+        ``AUTO_POINTS`` points within its retention.
+        """
+        resolution, first, last, occupied, spots = self._window(lot_ids, start, end, resolution)
+        step = RESOLUTIONS[resolution]
+        return resolution, [from_epoch(index * step) for index in range(first, last + 1)], occupied, spots
+
+    def lot_ids(self):
+        self._refresh()
+        with self._lock:
+            return list(self._rows)
+
+    def summary(self, lot_id, start, end, resolution=None):
+        """``(mean utilization, peak utilization, coverage)`` of a lot over a range.
+
+        Utilization is occupied over total spots; the mean is time-weighted
+        over the sampled steps, the peak is the fullest step's mean, and
+        coverage is the share of steps that were sampled. ``None`` for all
+        three if none were.
+        """
+        import numpy as np
+        _, _, _, occupied, spots = self._window([lot_id], start, end, resolution)
+        occupied, spots = occupied[0], spots[0]
+        sampled = ~np.isnan(occupied) & (spots > 0)
+        if not sampled.any():
+            return None, None, 0.0
+        return (float(occupied[sampled].sum() / spots[sampled].sum()),
+                float((occupied[sampled] / spots[sampled]).max()),
+                float(sampled.mean()))
+
+
+utilization = UtilizationHistory()
+
+
+def _percent(occupied, spots):
+    import numpy as np
+    with np.errstate(invalid='ignore', divide='ignore'):
+        values = occupied.astype(np.float64) / spots * 100
+    return [None if np.isnan(value) else round(float(value), 1) for value in values]
+
+
+def chart_feed(lot_ids, start, end, resolution=None):
+    """Utilization percentages for the admin summary chart.
+
+    ``lot_ids=None`` gives every lot combined plus the busiest
+    ``UTILIZATION_CHART_LOTS`` lots of the range.
+    """
+    import numpy as np
+    chosen = lot_ids
+    if chosen is None:
+        chosen = utilization.lot_ids()
+    resolution, times, occupied, spots = utilization.series(chosen, start, end, resolution)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = np.nansum(occupied, axis=1) / np.nansum(np.where(np.isnan(occupied), np.nan, spots), axis=1)
+    rows = range(len(chosen))
+    if lot_ids is None:
+        rows = sorted((row for row in rows if not np.isnan(means[row])), key=lambda row: -means[row])
+        rows = rows[:current_app.config['UTILIZATION_CHART_LOTS']]
+
+    def name(lot_id):
+        lot = pincodes.lot(lot_id)
+        return lot.name if lot is not None else f"Lot {lot_id}"
+
+    feed = {
+        'resolution': resolution,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'times': [moment.isoformat() for moment in times],
+        'lots': [{'id': chosen[row], 'name': name(chosen[row]),
+                  'mean': None if np.isnan(means[row]) else round(float(means[row]) * 100, 1),
+                  'utilization': _percent(occupied[row], spots[row])} for row in rows],
+    }
+    if lot_ids is None:
+        # Lots not sampled at a step count as neither occupied nor free there
+        totals = np.nansum(np.where(np.isnan(occupied), np.nan, spots), axis=0)
+        overall = _percent(np.nansum(occupied, axis=0), np.where(totals > 0, totals, np.nan))
+        feed['overall'] = overall
+    return feed
+
+
+def _parse_time(value):
+    """An ISO timestamp as naive UTC, the clock the rings and reservations use."""
+    at = datetime.fromisoformat(value)
+    if at.tzinfo is not None:
+        at = at.astimezone(timezone.utc).replace(tzinfo=None)
+    return at
+
+
+def parse_query(args, now=None):
+    """Read ``ids``, ``days`` or ``start``/``end`` (YYYY-MM-DD[THH:MM]) and ``resolution``.
+
+    Times are UTC; ones with an offset are converted to it.
+    """
+    lot_ids = None
+    if args.get('ids', '').strip():
+        lot_ids = api.parse_ids(args)
+    resolution = args.get('resolution') or None
+    if resolution is not None and resolution not in RESOLUTIONS:
+        raise ValueError(f"resolution must be one of {', '.join(RESOLUTIONS)}")
+    now = now or datetime.utcnow()
+    try:
+        end = _parse_time(args['end']) if args.get('end') else now
+        if args.get('start'):
+            start = _parse_time(args['start'])
+        else:
+            days = float(args.get('days', 7))
+            if not 0 < days <= 3660:
+                raise ValueError
+            start = end - timedelta(days=days)
+    except ValueError:
+        raise ValueError("days must be between 0 and 3660, start/end dates as YYYY-MM-DD[THH:MM]") from None
+    if start >= end:
+        raise ValueError("start must be before end")
+    return lot_ids, start, end, resolution
+
+
+# ---------------------------- #
+#      Backfill From Stays     #
+# ---------------------------- #
+def _minute_column(column):
+    return cast((func.julianday(column) - EPOCH_JULIAN_DAY) * 1440, Integer)
+
+
+def _stays(first_minute, now_minute):
+    """``(lot_id, first minute, last minute)`` of every stay overlapping the window, by lot."""
+    start, end = from_epoch(first_minute * 60), from_epoch((now_minute + 1) * 60)
+    hot = select(ParkingSpot.lot_id, _minute_column(Reservation.parking_timestamp),
+                 _minute_column(func.coalesce(Reservation.leaving_timestamp, end))) \
+        .join(ParkingSpot, ParkingSpot.id == Reservation.spot_id) \
+        .where(Reservation.parking_timestamp < end,
+               or_(Reservation.leaving_timestamp.is_(None), Reservation.leaving_timestamp > start))
+    archived = select(ArchivedReservation.lot_id, _minute_column(ArchivedReservation.parking_timestamp),
+                      _minute_column(ArchivedReservation.leaving_timestamp)) \
+        .where(ArchivedReservation.parking_timestamp < end, ArchivedReservation.leaving_timestamp > start)
+    both = union_all(hot, archived).subquery()
+    return select(both).order_by(both.c[0])
+
+
+def backfill(days, now=None):
+    """Rebuild the last ``days`` days of history by replaying reservations, once.
+
+    For a database that has reservations from before sampling began. One
+    lot's minutes are in memory at a time; spots per lot are today's
+    counts. Returns the number of lots filled.
+    """
+    import numpy as np
+    now_minute = int((time.time() if now is None else now) // 60)
+    first_minute = (now_minute // 1440 - days + 1) * 1440
+    length = days * 1440
+    spots = dict(db.session.query(ParkingSpot.lot_id, func.count(ParkingSpot.id)).group_by(ParkingSpot.lot_id))
+
+    history = utilization
+    with history._lock:
+        history._ensure_rings()
+        for lot_id in spots:
+            history._row(lot_id)
+        rings = history._rings
+        windows = {}
+        for name, ring in rings.items():
+            per_step = ring.step // 60
+            first, last = first_minute // per_step, now_minute // per_step
+            first = max(first, last - ring.slots + 1)
+            windows[name] = (first, last, per_step)
+            for index in range(first, last + 1):
+                ring.put(index, np.nan, np.nan)
+
+    filled = set()
+
+    def fill(lot_id, changes):
+        filled.add(lot_id)
+        minutes = np.cumsum(changes[:length]).astype(np.float32)
+        minutes[now_minute - first_minute + 1:] = np.nan
+        row = history._rows[lot_id]
+        for name, (first, last, per_step) in windows.items():
+            ring = rings[name]
+            means = _mean(minutes.reshape(-1, per_step), 1)
+            offset = first - first_minute // per_step
+            taken = means[offset:offset + last - first + 1]
+            columns = np.arange(first, last + 1) % ring.slots
+            ring.occupied[row, columns] = taken
+            ring.spots[row, columns] = np.where(np.isnan(taken), np.nan, spots.get(lot_id, 0))
+
+    with history._lock:
+        current, changes = None, None
+        for partition in db.session.execute(_stays(first_minute, now_minute)).partitions(50000):
+            lots, arrived, left = (np.array(column, dtype=np.int64) for column in zip(*partition))
+            arrived = np.clip(arrived - first_minute, 0, length)
+            left = np.clip(left - first_minute, 0, length)
+            for group in np.split(np.arange(len(lots)), np.flatnonzero(np.diff(lots)) + 1):
+                lot_id = int(lots[group[0]])
+                if lot_id != current:
+                    if current is not None:
+                        fill(current, changes)
+                    current, changes = lot_id, np.zeros(length + 1, dtype=np.int32)
+                    history._row(lot_id)
+                np.add.at(changes, arrived[group], 1)
+                np.add.at(changes, left[group], -1)
+        if current is not None:
+            fill(current, changes)
+        # Lots without stays in the window were empty all along
+        for lot_id in spots:
+            if lot_id not in filled:
+                fill(lot_id, np.zeros(length + 1, dtype=np.int32))
+        history._pending = None
+    return len(spots)
+
+
+# ---------------------------- #
+#         CLI Commands         #
+# ---------------------------- #
+utilization_cli = AppGroup('utilization', help="Lot utilization history.")
+
+
+@utilization_cli.command('backfill')
+@click.option('--days', type=int, default=35, show_default=True, help="How far back to replay reservations.")
+def backfill_command(days):
+    if not utilization._lead():
+        raise click.ClickException("a running server is sampling; stop it before backfilling")
+    started = time.perf_counter()
+    lots = backfill(days)
+    utilization.save()
+    click.echo(f"Backfilled {days} day(s) of {lots} lot(s) in {time.perf_counter() - started:.1f}s "
+               f"into {utilization.path}.")
+
+
+@utilization_cli.command('sample')
+def sample_command():
+    if not utilization._lead():
+        raise click.ClickException("a running server is sampling already")
+    utilization.sample()
+    utilization.save()
+    click.echo(f"Sampled {len(utilization.lot_ids())} lot(s).")
+
+
+@utilization_cli.command('show')
+@click.argument('lot_id', type=int)
+@click.option('--days', type=float, default=30, show_default=True)
+def show_command(lot_id, days):
+    end = datetime.utcnow()
+    mean, peak, coverage = utilization.summary(lot_id, end - timedelta(days=days), end)
+    if mean is None:
+        click.echo(f"No samples for lot {lot_id} in the last {days:g} day(s).")
+        return
+    click.echo(f"Lot {lot_id}, last {days:g} day(s): {mean:.1%} full on average, "
+               f"{peak:.1%} at the busiest, {coverage:.0%} of the time sampled.")
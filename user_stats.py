@@ -0,0 +1,177 @@
+from functools import lru_cache
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import Integer, cast, delete, func, insert, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from models import db, Reservation, UserLotStat, UserMonthStat, UserStats
+from storage import executemany
+import archive
+from versions import versions
+
+
+# ---------------------------- #
+#   Incremental Maintenance    #
+# ---------------------------- #
+@lru_cache(maxsize=None)
+def _upsert(model, key_names, increment_names):
+    # Built once per shape and reused with new parameters (see rollups._upsert)
+    stmt = sqlite_insert(model)
+    return stmt.on_conflict_do_update(
+        index_elements=list(key_names),
+        set_={name: getattr(model, name) + getattr(stmt.excluded, name) for name in increment_names}
+    )
+
+
+def _bump(model, keys, **increments):
+    stmt = _upsert(model, tuple(keys), tuple(increments))
+    db.session.connection().execute(stmt, {**keys, **increments})
+
+
+def record_booking(user_id, lot_id, parking_timestamp):
+    _bump(UserStats, {'user_id': user_id}, bookings=1)
+    _bump(UserLotStat, {'user_id': user_id, 'lot_id': lot_id}, bookings=1)
+    _bump(UserMonthStat, {'user_id': user_id, 'year': parking_timestamp.year,
+                          'month': parking_timestamp.month}, bookings=1)
+
+
+def record_release(user_id, duration, parking_cost):
+    _bump(UserStats, {'user_id': user_id},
+          total_minutes=int(duration.total_seconds() // 60),
+          total_cost=parking_cost or 0.0)
+
+
+def record_cost_changes(changes):
+    """Add ``(user_id, cost change)`` pairs to the users' total cost, e.g. after a re-bill."""
+    executemany(_upsert(UserStats, ('user_id',), ('total_cost',)), [
+        {'user_id': user_id, 'bookings': 0, 'total_minutes': 0, 'total_cost': change}
+        for user_id, change in changes
+    ])
+
+
+# ---------------------------- #
+#    Rebuild / Verification    #
+# ---------------------------- #
+def _minutes(reservation):
+    # Whole minutes per reservation, as release_spot computes them; the
+    # millisecond rounding keeps julianday's float error from losing a minute.
+    return cast(func.round(
+        (func.julianday(reservation.leaving_timestamp) - func.julianday(reservation.parking_timestamp))
+        * 86400000
+    ), Integer) // 60000
+
+
+def _aggregates(user_ids=None):
+    r = archive.all_reservations().c
+    totals = select(
+        r.user_id,
+        func.count(r.id).label('bookings'),
+        func.coalesce(func.sum(_minutes(r)), 0).label('total_minutes'),
+        func.coalesce(func.sum(r.parking_cost), 0.0).label('total_cost'),
+    ).group_by(r.user_id)
+    per_lot = select(
+        r.user_id,
+        r.lot_id,
+        func.count(r.id).label('bookings'),
+    ).group_by(r.user_id, r.lot_id)
+    per_month = select(
+        r.user_id,
+        cast(func.strftime('%Y', r.parking_timestamp), Integer).label('year'),
+        cast(func.strftime('%m', r.parking_timestamp), Integer).label('month'),
+        func.count(r.id).label('bookings'),
+    ).group_by(r.user_id, 'year', 'month')
+
+    if user_ids is not None:
+        totals = totals.where(r.user_id.in_(user_ids))
+        per_lot = per_lot.where(r.user_id.in_(user_ids))
+        per_month = per_month.where(r.user_id.in_(user_ids))
+    return {UserStats: totals, UserLotStat: per_lot, UserMonthStat: per_month}
+
+
+def rebuild(user_ids=None):
+    """Recompute stats from raw reservations for some users, or for everyone."""
+    for model, query in _aggregates(user_ids).items():
+        clear = delete(model)
+        if user_ids is not None:
+            clear = clear.where(model.user_id.in_(user_ids))
+        db.session.execute(clear)
+        db.session.execute(
+            insert(model).from_select([c.name for c in query.selected_columns], query)
+        )
+
+
+def rebuild_lot_users(lot_id):
+    """Rebuild everyone who ever parked in a lot whose reservations were removed.
+
+    Call after the removal has been flushed.
+    """
+    user_ids = [user_id for user_id, in
+                db.session.query(UserLotStat.user_id).filter_by(lot_id=lot_id)]
+    if user_ids:
+        rebuild(user_ids)
+
+
+def verify(user_ids=None, tolerance=0.01):
+    """Recompute stats from raw reservations and report any drift.
+
+    Returns a list of ``(table, key, expected, actual)`` tuples.
+    """
+    drift = []
+    for model, query in _aggregates(user_ids).items():
+        key_names = [c.name for c in model.__table__.primary_key.columns]
+        value_names = [c.name for c in model.__table__.columns if c.name not in key_names]
+
+        expected = {}
+        for row in db.session.execute(query):
+            row = row._mapping
+            expected[tuple(row[k] for k in key_names)] = tuple(row[v] for v in value_names)
+
+        stored = db.session.query(model)
+        if user_ids is not None:
+            stored = stored.filter(model.user_id.in_(user_ids))
+        actual = {
+            tuple(getattr(r, k) for k in key_names): tuple(getattr(r, v) for v in value_names)
+            for r in stored
+        }
+
+        for key in sorted(set(expected) | set(actual)):
+            want = expected.get(key, (0,) * len(value_names))
+            got = actual.get(key, (0,) * len(value_names))
+            if any(abs((w or 0) - (g or 0)) > tolerance for w, g in zip(want, got)):
+                drift.append((model.__tablename__, key, want, got))
+    return drift
+
+
+def backfill_if_empty():
+    """Populate the stats once for a database created before they existed."""
+    if db.session.query(UserStats.user_id).first() is None \
+            and db.session.query(Reservation.id).first() is not None:
+        rebuild()
+        db.session.commit()
+
+
+# ---------------------------- #
+#         CLI Commands         #
+# ---------------------------- #
+user_stats_cli = AppGroup('user-stats', help="Maintain the per-user summary statistics.")
+
+
+@user_stats_cli.command('rebuild')
+@click.option('--user', 'user_ids', type=int, multiple=True, help="Only rebuild these users.")
+def rebuild_command(user_ids):
+    rebuild(list(user_ids) or None)
+    versions.bump(*[('user', user_id) for user_id in user_ids] or [('users',)])
+    db.session.commit()
+    click.echo("User stats rebuilt.")
+
+
+@user_stats_cli.command('verify')
+@click.option('--user', 'user_ids', type=int, multiple=True, help="Only verify these users.")
+def verify_command(user_ids):
+    drift = verify(list(user_ids) or None)
+    for table, key, want, got in drift:
+        click.echo(f"{table} {key}: expected {want}, found {got}")
+    if drift:
+        raise SystemExit(f"{len(drift)} stat row(s) drifted; run 'flask user-stats rebuild'.")
+    click.echo("User stats are consistent.")
@@ -0,0 +1,120 @@
+import functools
+import random
+
+from flask import current_app, g, request, session
+from sqlalchemy import tuple_
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from models import db, DataVersion
+from storage import executemany
+
+
+EPOCH = ('epoch', 0)
+
+
+def _key(scope):
+    return scope[0], scope[1] if len(scope) > 1 else 0
+
+
+# ---------------------------- #
+#   Data Versions / ETags      #
+# ---------------------------- #
+class DataVersions:
+    """Monotonic version counters for the data behind read-heavy pages.
+
+    Counters are rows of the ``data_versions`` table, keyed by scope:
+    ``('global',)`` moves on every change, ``('lot', id)`` when a lot's
+    details, spots or occupancy change, and ``('user', id)`` when a user's
+    reservations or profile change; ``('users',)`` invalidates every user's
+    pages at once (e.g. when a lot and its history are deleted, or stays
+    are re-billed). Writers bump the scopes they touch in the transaction
+    that makes the change, so every worker process, and the CLI commands,
+    see the same versions. Views wrapped in :meth:`conditional` send an
+    ETag made of their scopes' versions and answer a matching
+    ``If-None-Match`` with 304 before running.
+
+    The ETag also carries a random epoch stored with the counters, so tags
+    never outlive a database that is recreated from scratch.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('CONDITIONAL_GET', True)
+        app.add_template_global(self.version, 'data_version')
+        app.extensions['versions'] = self
+
+    def ensure_epoch(self):
+        """Give a new database its epoch; part of the bootstrap."""
+        stmt = sqlite_insert(DataVersion).values(scope=EPOCH[0], key=EPOCH[1], version=random.getrandbits(31))
+        db.session.execute(stmt.on_conflict_do_nothing())
+        db.session.commit()
+
+    # ---------- Counters ----------
+    def bump(self, *scopes):
+        """Advance each scope, plus the global version, in the current transaction.
+
+        Call before the change commits: inside the ``storage.run_write`` job
+        or ahead of ``db.session.commit()``.
+        """
+        stmt = sqlite_insert(DataVersion)
+        executemany(stmt.on_conflict_do_update(index_elements=['scope', 'key'],
+                                               set_={'version': DataVersion.version + stmt.excluded.version}),
+                    [{'scope': scope, 'key': key, 'version': 1}
+                     for scope, key in dict.fromkeys(map(_key, (('global',),) + scopes))])
+
+    def _read(self, condition):
+        return {(scope, key): version for scope, key, version in
+                db.session.query(DataVersion.scope, DataVersion.key, DataVersion.version).filter(condition)}
+
+    def preload(self, kind):
+        """Read every version of ``kind`` (e.g. ``'lot'``) for the rest of the request, in one query."""
+        loaded = g.setdefault('data_versions', {})
+        if kind not in loaded:
+            loaded[kind] = self._read(DataVersion.scope == kind)
+        return loaded[kind]
+
+    def version(self, *scope):
+        """``data_version('lot', lot.id)`` in templates, e.g. as a fragment cache version."""
+        key = _key(scope)
+        return self.preload(key[0]).get(key, 0)
+
+    def etag(self, scopes):
+        keys = [_key(scope) for scope in scopes]
+        found = self._read(tuple_(DataVersion.scope, DataVersion.key).in_(keys + [EPOCH]))
+        user_id = session.get('user_id')
+        return f"{found.get(EPOCH, 0):x}-{user_id}-" + '.'.join(str(found.get(key, 0)) for key in keys)
+
+    # ---------- Conditional GETs ----------
+    def conditional(self, role, scopes):
+        """Make a GET view conditional on the versions of ``scopes(**view_args)``.
+
+        Only requests from a ``role`` session are eligible, so the view's own
+        access checks still run for everyone else. Pages rendered with flash
+        messages, or that leave new ones behind, get no ETag, so a 304 never
+        brings back a message that was already shown.
+        """
+        def decorator(view):
+            @functools.wraps(view)
+            def wrapper(**view_args):
+                if (request.method != 'GET' or session.get('role') != role or '_flashes' in session
+                        or not current_app.config['CONDITIONAL_GET']):
+                    return view(**view_args)
+
+                tag = self.etag(scopes(**view_args))
+                if request.if_none_match.contains_weak(tag):
+                    response = current_app.response_class(status=304)
+                else:
+                    response = current_app.make_response(view(**view_args))
+                    if response.status_code != 200 or '_flashes' in session:
+                        return response
+                response.set_etag(tag, weak=True)
+                response.headers['Cache-Control'] = 'private, no-cache'
+                return response
+            return wrapper
+        return decorator
+
+
+versions = DataVersions()